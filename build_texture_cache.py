@@ -0,0 +1,35 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+
+Command line tool to decode all textures once and store them in the texture cache, so the
+application can load them without decoding. See :class:`util.texturecache.TextureCache`.
+"""
+
+import argparse
+import os
+
+import pyglet
+from util.texturecache import TextureCache
+
+image_extensions = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode all textures and store them in the texture cache")
+    parser.add_argument("--source", default="resource/texture", help="directory to load the textures from")
+    parser.add_argument("--cache", default="cache/texture", help="directory of the texture cache")
+    args = parser.parse_args()
+
+    pyglet.resource.path = [args.source]
+    pyglet.resource.reindex()
+    cache = TextureCache(args.cache)
+    for filename in sorted(os.listdir(args.source)):
+        if os.path.splitext(filename)[1].lower() in image_extensions:
+            print("Caching texture " + filename)
+            cache.load(filename)
+
+
+if __name__ == "__main__":
+    main()
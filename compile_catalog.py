@@ -0,0 +1,28 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+
+Command line tool to compile bodies from a directory of JSON files, a CSV file or a JSONL file into a catalog
+the bodies can be loaded from quickly. See :func:`solarsystem.catalog.compile_catalog` and
+:func:`solarsystem.loader.load_catalog`.
+"""
+
+import argparse
+
+from solarsystem.catalog import compile_catalog, read_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile bodies into a catalog that is loaded quickly")
+    parser.add_argument("output", help=".npy file to write the catalog to")
+    parser.add_argument("--source", default="bodies", help="directory of JSON files, .csv or .jsonl file to read the bodies from")
+    args = parser.parse_args()
+
+    bodies = read_source(args.source)
+    print("Compiling %d bodies into %s" % (len(bodies), args.output))
+    compile_catalog(bodies, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,12 @@ Created on 08.12.2015
 :author: Rene Hollander
 """
 
+import numpy
 from euclid import Vector3
 from pyglet import window
 from pyglet.event import EVENT_HANDLED
 from pyglet.window import key
+from util.ray import intersect_spheres
 
 
 class Controls:
@@ -15,10 +17,12 @@ class Controls:
     Class managing the controls of the application
     """
 
-    def __init__(self, window, camera, bodies, callbacks=None, mouse_sensitivity=0.0025):
+    def __init__(self, window, camera, bodies, callbacks=None, mouse_sensitivity=0.0025, bvh=None):
         self.window = window
         self.camera = camera
         self.bodies = bodies
+        # tree over the bodies in the same order, refitted by the owner after every update
+        self.bvh = bvh
         self.callbacks = callbacks
         if not self.callbacks:
             self.callbacks = {}
@@ -35,6 +39,7 @@ class Controls:
         self.draw_help_label = True
         self.toggled_help_label = False
         self.selected_body = None
+        self.hovered_body = None
         self.camera_offset = Vector3()
 
         window.push_handlers(self.on_mouse_press, self.on_mouse_motion, self.on_key_press, self.on_key_release)
@@ -125,6 +130,11 @@ class Controls:
             if cb is not None:
                 cb()
             return EVENT_HANDLED
+        if symbol == key.R:
+            cb = self.callbacks['refine_orbits']
+            if cb is not None:
+                cb()
+            return EVENT_HANDLED
         if symbol == key.T:
             cb = self.callbacks['toggle_draw_textures']
             if cb is not None:
@@ -164,16 +174,52 @@ class Controls:
                 self.mouse_locked = True
                 return EVENT_HANDLED
             else:
-                ray = self.camera.create_ray()
-                for body in self.bodies:
-                    if body.intersects(ray):
-                        print(body.name + " hit!")
-                        self.selected_body = body
-                        self.camera_offset = self.selected_body.xyz - self.camera.position
-                        break
+                hit = self.pick(self.camera.create_ray())
+                if hit is not None:
+                    body, distance = hit
+                    print(body.name + " hit!")
+                    self.selected_body = body
+                    self.camera_offset = self.selected_body.xyz - self.camera.position
                 else:
                     self.selected_body = None
 
+    def pick(self, ray):
+        """
+        Finds the nearest body hit by the ray. Without a bounding volume hierarchy all bodies are tested at once.
+
+        :param ray: Ray to check
+        :type ray: :class:`util.ray.Ray`
+        :return: The body and the distance to it, None if no body is hit
+        :rtype: tuple, None
+        """
+
+        if self.bvh is not None:
+            hit = self.bvh.intersect(ray)
+            if hit is None:
+                return None
+            index, distance = hit
+            return self.bodies[index], distance
+
+        if not self.bodies:
+            return None
+        centers = numpy.array([(body.xyz.x, body.xyz.y, body.xyz.z) for body in self.bodies], dtype=numpy.float64)
+        distances = intersect_spheres(ray, centers, numpy.array([body.radius for body in self.bodies]))
+        index = int(numpy.argmin(distances))
+        if distances[index] == numpy.inf:
+            return None
+        return self.bodies[index], float(distances[index])
+
+    def update_hover(self):
+        """
+        Finds the body under the crosshair, has to be called after the positions of the bodies changed
+        """
+
+        if self.mouse_locked:
+            hit = self.pick(self.camera.create_ray())
+            self.hovered_body = None if hit is None else hit[0]
+        else:
+            self.hovered_body = None
+
     def get_dx(self):
         """
         gets delta x and resets it to 0
@@ -0,0 +1,32 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+
+Command line tool to precompute the positions of all bodies over a time range.
+See :func:`solarsystem.ephemeris.generate_ephemeris` for the output format.
+"""
+
+import argparse
+
+from solarsystem.ephemeris import generate_ephemeris
+from util import dts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the positions of all bodies over a time range")
+    parser.add_argument("output", help=".npy file to write the positions to")
+    parser.add_argument("--bodies", default="bodies", help="directory or catalog to load the bodies from")
+    parser.add_argument("--start", type=float, default=0, help="first day since J.2000")
+    parser.add_argument("--stop", type=float, required=True, help="end of the time range in days since J.2000 (exclusive)")
+    parser.add_argument("--step", type=float, default=1, help="days between two positions")
+    parser.add_argument("--chunk-size", type=int, default=None, help="number of times calculated at once, default as many as fit into --memory")
+    parser.add_argument("--memory", type=float, default=64, help="megabytes every process may use for calculating a chunk")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes, default all cores")
+    args = parser.parse_args()
+
+    generate_ephemeris(args.bodies, args.output, args.start * dts, args.stop * dts, args.step * dts, chunk_size=args.chunk_size, processes=args.processes, memory_budget=int(args.memory * 1024 * 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,21 @@ from controls import Controls
 from euclid import *
 from gui import GUI
 from pyglet.gl import *
+from solarsystem.ephemeris import EphemerisCache
 from solarsystem.loader import load_bodies
+from solarsystem.orbitlines import OrbitLines
+from solarsystem.propagator import Propagator
+from solarsystem.renderer import set_projection, set_residency_manager, set_texture_atlas, set_texture_loader
 from util import toGlMatrix
+from util.atlas import TextureAtlas
+from util.bvh import BoundingVolumeHierarchy
 from util.camera import Camera, halfpi
+from util.frustum import Frustum
+from util.residency import ResidencyManager
 from util.skybox import SkySphere
+from util.spatialindex import SpatialGrid
+from util.texture import TextureLoader, reset_texture_binding
+from util.texturecache import TextureCache
 
 # Register resource locations in pyglet resource loader
 pyglet.resource.path = ['resource/texture', 'resource/text']
@@ -26,8 +37,28 @@ window = pyglet.window.Window(1280, 720, config=config, caption='Solarsystem', r
 fullscreen = False
 draw_skybox = True
 
+# decode the textures in the background, bodies are drawn in their base color until their texture is ready.
+# decoded textures are cached on disk, so they only have to be decoded on the first start
+texture_loader = TextureLoader(cache=TextureCache())
+set_texture_loader(texture_loader)
+# only the mipmap levels needed for the size of the textures on screen are kept on the GPU
+residency = ResidencyManager(budget=256 * 1024 * 1024)
+set_residency_manager(residency)
+# small textures share one atlas, so the bodies using them are drawn without binding another texture
+set_texture_atlas(TextureAtlas())
+
 # looad the bodies from the json files
 bodies = load_bodies("bodies")
+propagator = Propagator(bodies, cache=EphemerisCache())
+# instanced bodies are all drawn at once by the renderer they share,
+# bodies with their texture in the atlas are drawn one after another
+drawn_bodies = sorted((body for body in bodies if not body.instanced), key=lambda body: body.atlas)
+instanced_renderer = next((body.renderer for body in bodies if body.instanced), None)
+orbit_lines = OrbitLines(bodies)
+# tree over the bodies to pick the nearest one with the mouse, refitted after every update
+picking = BoundingVolumeHierarchy([body.radius for body in bodies])
+# grid over the bodies for proximity queries, updated after every update
+proximity = SpatialGrid()
 
 # Create a new camera
 camera = Camera(position=Vector3(0, 420, 0), pitch=-halfpi)
@@ -43,7 +74,7 @@ solarsystem_time = 0
 time = solarsystem_time
 
 # create the skyshpere
-skybox = SkySphere("milkyway.jpg", 5500)
+skybox = SkySphere("milkyway.jpg", 5500, loader=texture_loader)
 
 
 def toggle_draw_orbits():
@@ -55,6 +86,14 @@ def toggle_draw_orbits():
         cur.draw_orbit = not cur.draw_orbit
 
 
+def refine_orbits():
+    """
+    Plots the orbits again, so they are sharp from the current point of view
+    """
+
+    orbit_lines.refine(mvp, propagator.positions)
+
+
 def toggle_draw_textures():
     """
     Toggles the drawing of the textures
@@ -77,9 +116,11 @@ def toggle_fullscreen(override):
 
 controls = Controls(window, camera, bodies, callbacks={'toggle_draw_orbits': toggle_draw_orbits,
                                                        'toggle_draw_textures': toggle_draw_textures,
-                                                       'toggle_fullscreen': toggle_fullscreen})
+                                                       'refine_orbits': refine_orbits,
+                                                       'toggle_fullscreen': toggle_fullscreen},
+                    bvh=picking)
 
-gui = GUI(window, controls, bodies)
+gui = GUI(window, controls, bodies, spatial_index=proximity)
 
 
 @window.event
@@ -94,6 +135,7 @@ def on_resize(width, height):
     global proj_matrix
     # recalculate projection matrix
     proj_matrix = Matrix4.new_perspective(45, float(width) / float(height), 0.1, 64000.0)
+    set_projection(proj_matrix, height)
     # set new viewport
     glViewport(0, 0, width, height)
     glMatrixMode(GL_MODELVIEW)
@@ -122,14 +164,24 @@ def on_draw():
         skybox_matrix.translate(camera.position.x, camera.position.y, camera.position.z)
         skybox_matrix.rotate_axis(math.radians(-90), Vector3(1, 0, 0))
         glLoadMatrixd(toGlMatrix(skybox_matrix))
+        if skybox.texture.ready:
+            # the width of the texture wraps once around the view, which is 45 degrees high
+            residency.request(skybox.texture, window.height * 360.0 / 45.0)
         skybox.draw()
         glPopAttrib()
 
-    # loop through bodies and draw
-    for planet in bodies:
+    # loop through bodies and draw the ones in the view frustum
+    frustum = Frustum(mvp)
+    orbit_lines.draw(mvp, propagator.positions, frustum)
+    for planet in drawn_bodies:
+        if not planet.visible(frustum):
+            continue
         glPushAttrib(GL_ENABLE_BIT)
         planet.draw(mvp.__copy__())
         glPopAttrib()
+    if instanced_renderer is not None:
+        instanced_renderer.draw_instances(mvp, propagator.positions)
+    reset_texture_binding()
 
     glPopAttrib()
 
@@ -144,7 +196,12 @@ def on_draw():
 
     gui.draw()
 
-    glColor3f(1, 1, 0)
+    # the crosshair takes on the color of the body under it
+    if controls.hovered_body is not None:
+        color = controls.hovered_body.color
+        glColor3f(color["r"] / 255.0, color["g"] / 255.0, color["b"] / 255.0)
+    else:
+        glColor3f(1, 1, 0)
     glLineWidth(1.0)
     glBegin(GL_LINES)
     cross_len = 10
@@ -184,8 +241,14 @@ def update(dt):
     mvp = proj_matrix * camera.view_matrix()
 
     # update every bodies
-    for planet in bodies:
-        planet.update(solarsystem_time)
+    propagator.update(solarsystem_time)
+    picking.refit(propagator.positions)
+    proximity.update(propagator.positions)
+    controls.update_hover()
+
+    # upload the textures that finished decoding and stream the levels needed on screen
+    texture_loader.update()
+    residency.update()
 
 
 # starts the application
@@ -27,10 +27,12 @@ class GUI:
     Controls the GUI (HUD) of this application
     """
 
-    def __init__(self, window, controls, bodies):
+    def __init__(self, window, controls, bodies, spatial_index=None):
         self.window = window
         self.controls = controls
         self.bodies = bodies
+        # grid over the positions of the bodies in the same order, used to show the nearest body
+        self.spatial_index = spatial_index
 
         self.fps_counter = FPSCounter(window, self.fps_update)
 
@@ -70,6 +72,13 @@ class GUI:
             text += "Name: " + body.name + "\n"
             text += "Position: " + str(round(body.xyz.x, 2)) + " " + str(round(body.xyz.y, 2)) + " " + str(round(body.xyz.z, 2)) + "\n"
             text += "Rotation Period: " + str(round(body.sidereal_rotation_period / 60 / 60 / 24, 2)) + "days\n"
+            if self.spatial_index is not None:
+                indices, distances = self.spatial_index.query_nearest((body.xyz.x, body.xyz.y, body.xyz.z), 2)
+                # the nearest one is the body itself
+                for index, distance in zip(indices.tolist(), distances.tolist()):
+                    if self.bodies[index] is not body:
+                        text += "Nearest Body: " + self.bodies[index].name + " (" + str(round(distance, 2)) + ")\n"
+                        break
             self.label_planet_info.set_text(text)
             self.label_planet_info_manager.draw()
 
@@ -3,26 +3,38 @@ Created on 03.11.2015
 
 :author: Rene Hollander
 """
-from math import sqrt
+from math import inf
 
+import numpy
 from abc import ABCMeta
 from euclid import Vector3
-from pyglet.gl import *
-from pyglet.graphics import Batch
-from solarsystem.renderer import BodyRenderer, OrbitingBodyRenderer
+from solarsystem.bodystore import BodyStore
+from solarsystem.orbit import Orbit, TabulatedOrbit
 from util import auto_str
-from util.texture import Texture
+from util.ray import intersect_sphere
 
-plot_steps = 1024
+# maximum distance between the plotted orbits and the real orbits relative to their size
+plot_tolerance = 0.0005
 
 
 @auto_str
 class Body(object, metaclass=ABCMeta):
     """
     An abstract class defining an body in the solarsystem
+
+    Bodies do not need OpenGL. The renderer creates the textures and other resources it needs
+    the first time the body is drawn, a body without a renderer is not drawn at all.
+
+    The position, radius, color and the other numbers are stored in a :class:`solarsystem.bodystore.BodyStore`
+    together with the ones of the other bodies, the body only has slots for the rest. A body is always in the store
+    of its parent, it is moved there together with its children when it gets a parent from another store.
     """
 
-    def __init__(self, parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, renderer=BodyRenderer()):
+    __slots__ = ("_store", "_index", "children", "name", "texturename", "renderer", "draw_orbit", "draw_texture",
+                 "instanced", "atlas", "renderer_attached", "texture", "sphere", "lod_level", "parent_internal_name")
+
+    def __init__(self, parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, renderer=None,
+                 store=None):
         """
         Creates a new body with the given parameters
 
@@ -42,11 +54,19 @@ class Body(object, metaclass=ABCMeta):
         :type sidereal_rotation_period: float
         :param mass: Mass of the body in kilograms
         :type mass: float
+        :param renderer: Renderer of the body, None to not draw it
+        :type renderer: :class:`solarsystem.renderer.Renderer`, None
+        :param store: Store that holds the state of the body, None for the store of the parent or a new store
+        :type store: :class:`solarsystem.bodystore.BodyStore`, None
         """
 
-        self.xyz = Vector3()
-        self.parent = parent
+        if store is None:
+            store = parent.store if parent is not None else BodyStore(1)
+        self._store = store
+        self._index = self._store.add(self)
         self.name = name
+        self.parent = parent
+        self.children = []
         self.texturename = texturename
         self.color = color
         self.radius = radius
@@ -58,11 +78,168 @@ class Body(object, metaclass=ABCMeta):
         self.timefactor = 0
         self.draw_orbit = True
         self.draw_texture = True
+        # drawn together with the other instanced bodies, see solarsystem.renderer.InstancedBodyRenderer
+        self.instanced = False
+        # the texture is packed into the texture atlas together with other small textures, see util.atlas
+        self.atlas = False
+
+        # created by the renderer when the body is drawn the first time
+        self.renderer_attached = False
+        self.texture = None
+        self.sphere = None
+        self.lod_level = 0
+
+    @property
+    def store(self):
+        """
+        Store that holds the state of the body
+
+        :rtype: :class:`solarsystem.bodystore.BodyStore`
+        """
+
+        return self._store
+
+    @property
+    def store_index(self):
+        """
+        Index of the body in the arrays of its store
+
+        :rtype: int
+        """
+
+        return self._index
+
+    @property
+    def xyz(self):
+        """
+        Position of the body in the system, a copy of the stored position
+
+        :rtype: :class:`euclid.Vector3`
+        """
+
+        return Vector3(*self._store.positions[self._index].tolist())
+
+    @xyz.setter
+    def xyz(self, value):
+        self._store.positions[self._index] = (value.x, value.y, value.z)
+
+    @property
+    def parent(self):
+        """
+        Parent body in the system, None if it doesn't have one
+
+        :rtype: :class:`Body`, None
+        """
+
+        parent = self._store.parents[self._index]
+        return None if parent < 0 else self._store.bodies[parent]
+
+    @parent.setter
+    def parent(self, value):
+        if value is not None and value._store is not self._store:
+            self._move(value._store)
+        self._store.parents[self._index] = -1 if value is None else value._index
+
+    def _move(self, store):
+        """
+        Moves the body and all bodies below it into another store, the parent of the body is not kept
+
+        :param store: Store to move the bodies into
+        :type store: :class:`solarsystem.bodystore.BodyStore`
+        """
+
+        children = [self._store.bodies[index] for index in numpy.flatnonzero(self._store.parents == self._index)]
+        self._index = self._store.transfer(self._index, store)
+        self._store = store
+        for child in children:
+            child._move(store)
+            store.parents[child._index] = self._index
+
+    @property
+    def color(self):
+        """
+        Dictionary with r, g and b values
+
+        :rtype: dict
+        """
+
+        # whole numbers are given back as int, like they are in the JSON files
+        return {key: int(value) if value.is_integer() else value
+                for key, value in zip("rgb", self._store.colors[self._index].tolist())}
+
+    @color.setter
+    def color(self, value):
+        self._store.colors[self._index] = (value["r"], value["g"], value["b"])
+
+    @property
+    def radius(self):
+        """
+        Radius of the body
+
+        :rtype: float
+        """
+
+        return self._store.radii.item(self._index)
+
+    @radius.setter
+    def radius(self, value):
+        self._store.radii[self._index] = value
+
+    @property
+    def axial_tilt(self):
+        """
+        Axial Tilt in degrees
+
+        :rtype: float
+        """
+
+        return self._store.axial_tilts.item(self._index)
+
+    @axial_tilt.setter
+    def axial_tilt(self, value):
+        self._store.axial_tilts[self._index] = value
+
+    @property
+    def sidereal_rotation_period(self):
+        """
+        Rotation period (siderial) around its own axis
+
+        :rtype: float
+        """
+
+        return self._store.periods.item(self._index)
+
+    @sidereal_rotation_period.setter
+    def sidereal_rotation_period(self, value):
+        self._store.periods[self._index] = value
+
+    @property
+    def mass(self):
+        """
+        Mass of the body in kilograms
+
+        :rtype: float
+        """
+
+        return self._store.masses.item(self._index)
+
+    @mass.setter
+    def mass(self, value):
+        self._store.masses[self._index] = value
+
+    @property
+    def timefactor(self):
+        """
+        Rotation of the body around its axis as fraction of a full rotation
+
+        :rtype: float
+        """
 
-        self.texture = Texture(texturename)
-        self.sphere = gluNewQuadric()
-        gluQuadricNormals(self.sphere, GLU_SMOOTH)
-        gluQuadricTexture(self.sphere, GL_TRUE)
+        return self._store.rotations.item(self._index)
+
+    @timefactor.setter
+    def timefactor(self, value):
+        self._store.rotations[self._index] = value
 
     def post_init(self):
         """
@@ -81,14 +258,46 @@ class Body(object, metaclass=ABCMeta):
 
         self.timefactor = (time % self.sidereal_rotation_period) / self.sidereal_rotation_period
 
+    def bounding_radius(self):
+        """
+        Get the radius of a sphere around the position of the body that contains everything drawn for the body itself
+
+        :return: Radius of the bounding sphere
+        :rtype: float
+        """
+
+        return self.radius
+
+    def visible(self, frustum):
+        """
+        Checks if anything of the body would be drawn inside the view frustum
+
+        :param frustum: View frustum
+        :type frustum: :class:`util.frustum.Frustum`
+        :return: True if the body has to be drawn, otherwise False
+        :rtype: bool
+        """
+
+        if self.renderer is None:
+            return False
+        if not self.renderer_attached:
+            self.renderer.attach(self)
+            self.renderer_attached = True
+        return self.renderer.visible(self, frustum)
+
     def draw(self, matrix):
         """
-        Draw the body
+        Draw the body, bodies outside of the view frustum are skipped by the caller with :meth:`visible`
 
         :param matrix: Current Model-View-Projection matrix
         :type matrix: :class:`euclid.Matrix4`
         """
 
+        if self.renderer is None:
+            return
+        if not self.renderer_attached:
+            self.renderer.attach(self)
+            self.renderer_attached = True
         self.renderer.draw(self, matrix)
 
     def intersects(self, ray):
@@ -101,19 +310,19 @@ class Body(object, metaclass=ABCMeta):
         :rtype: bool
         """
 
-        q = ray.direction.dot(ray.origin - self.xyz) ** 2 - (ray.origin - self.xyz).dot(ray.origin - self.xyz) + self.radius ** 2
-        if q < 0:
-            return False
-        else:
-            d = -ray.direction.dot(ray.origin - self.xyz)
-            d1 = d - sqrt(q)
-            d2 = d + sqrt(q)
-            if 0 < d1 and (d1 < d2 or d2 < 0):
-                return True
-            elif 0 < d2 and (d2 < d1 or d1 < 0):
-                return True
-            else:
-                return False
+        return self.intersection(ray) != inf
+
+    def intersection(self, ray):
+        """
+        Calculates where the ray hits this body first, see :func:`util.ray.intersect_spheres` for many bodies at once
+
+        :param ray: Ray to check
+        :type ray: :class:`util.ray.Ray`
+        :return: Distance from the origin of the ray to the hit, inf if the ray misses this body
+        :rtype: float
+        """
+
+        return intersect_sphere(ray, self.xyz, self.radius)
 
 
 class StationaryBody(Body, metaclass=ABCMeta):
@@ -121,7 +330,10 @@ class StationaryBody(Body, metaclass=ABCMeta):
     A stationary body in the solarsystem (Body without an orbit)
     """
 
-    def __init__(self, parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, xyz=Vector3()):
+    __slots__ = ()
+
+    def __init__(self, parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, xyz=Vector3(),
+                 store=None):
         """
         Creates a new body with the given parameters
 
@@ -141,9 +353,11 @@ class StationaryBody(Body, metaclass=ABCMeta):
         :type sidereal_rotation_period: float
         :param xyz: Position of the object, default 0, 0, 0
         :type xyz: :class:`euclid.Vector3`
+        :param store: Store that holds the state of the body, None for the store of the parent or a new store
+        :type store: :class:`solarsystem.bodystore.BodyStore`, None
         """
 
-        super().__init__(parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass)
+        super().__init__(parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, store=store)
         self.xyz = xyz
 
 
@@ -152,7 +366,11 @@ class OrbitingBody(Body, metaclass=ABCMeta):
     An orbiting body in the solarsystem
     """
 
-    def __init__(self, parent, name, texturename, color, radius, orbit, axial_tilt, sidereal_rotation_period, mass, renderer=OrbitingBodyRenderer()):
+    __slots__ = ("orbit", "ring_texture_name", "ring_inner_radius", "ring_outer_radius", "ring_texture", "ring_disk",
+                 "ring_lod_level")
+
+    def __init__(self, parent, name, texturename, color, radius, orbit, axial_tilt, sidereal_rotation_period, mass, renderer=None,
+                 store=None):
         """
         Creates a new body with the given parameters
 
@@ -172,33 +390,107 @@ class OrbitingBody(Body, metaclass=ABCMeta):
         :type axial_tilt: float
         :param sidereal_rotation_period: Rotation period (siderial) around its own axis
         :type sidereal_rotation_period: float
+        :param renderer: Renderer of the body, None to not draw it
+        :type renderer: :class:`solarsystem.renderer.Renderer`, None
+        :param store: Store that holds the state of the body, None for the store of the parent or a new store
+        :type store: :class:`solarsystem.bodystore.BodyStore`, None
         """
 
-        super().__init__(parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, renderer=renderer)
+        super().__init__(parent, name, texturename, color, radius, axial_tilt, sidereal_rotation_period, mass, renderer=renderer,
+                         store=store)
         self.orbit = orbit
         self.orbit.body = self
-        self.orbit_line_batch = Batch()
+
+        self.ring_texture_name = None
+        self.ring_inner_radius = None
+        self.ring_outer_radius = None
+        self.ring_texture = None
+        self.ring_disk = None
+        self.ring_lod_level = 0
 
     def post_init(self):
         self.orbit.post_init()
 
-        # Plot the orbit to a pyglet batch for faster drawing
+    def set_ring(self, ring_texture_name, ring_inner_radius, ring_outer_radius):
+        """
+        Gives the body a ring. It is drawn by the :class:`solarsystem.renderer.OrbitingBodyWithRingRenderer`
+
+        :param ring_texture_name: Name of the texture
+        :type ring_texture_name: str
+        :param ring_inner_radius: Inner radius of the rings
+        :type ring_inner_radius: float
+        :param ring_outer_radius: Outer radius of the rings
+        :type ring_outer_radius: float
+        """
+
+        self.ring_texture_name = ring_texture_name
+        self.ring_inner_radius = ring_inner_radius
+        self.ring_outer_radius = ring_outer_radius
+
+    def bounding_radius(self):
+        if self.ring_outer_radius is not None:
+            return max(self.radius, self.ring_outer_radius)
+        return self.radius
+
+    def plot_orbit(self, tolerance=plot_tolerance, scale=None):
+        """
+        Plots the orbit relative to the parent, see :meth:`solarsystem.orbit.Orbit.plot_adaptive`
+
+        :param tolerance: Maximum distance between the plotted line and the orbit relative to the size of the orbit,
+                          or in the units of scale if it is given
+        :type tolerance: float
+        :param scale: Function that gives a factor for the distance at a position relative to the parent
+        :type scale: function
+        :return: x, y and z of the points along the orbit
+        :rtype: tuple
+        """
+
         orbit_line = []
-        for pos in self.orbit.plot(plot_steps):
+        for pos in self.orbit.plot_adaptive(tolerance, scale=scale):
             orbit_line.append(pos.x)
             orbit_line.append(pos.y)
             orbit_line.append(pos.z)
-        self.orbit_line_batch.add(int(len(orbit_line) / 3), GL_LINE_LOOP, None, ('v3f', tuple(orbit_line)))
+        return tuple(orbit_line)
 
-    def update(self, time):
+    def update(self, time, position=None):
         """
         Update the body (Calculate current orbit position)
 
         :param time: Delta Time
         :type time: float
+        :param position: Already calculated position in the system, calculated from the orbit and parent if None
+        :type position: :class:`euclid.Vector3`, None
         """
 
         super().update(time)
-        self.xyz = self.orbit.calculate(time)
-        if self.parent:
-            self.xyz += self.parent.xyz
+        if position is None:
+            position = self.orbit.calculate(time)
+            if self.parent:
+                position += self.parent.xyz
+        self.xyz = position
+
+
+def post_init_bodies(bodies):
+    """
+    Calls post_init of the bodies. Bodies that do not do anything in post_init are skipped and the orbits of orbiting
+    bodies are compiled together with :meth:`solarsystem.orbit.Orbit.compile_many`, one call per orbit type.
+
+    :param bodies: Bodies to prepare
+    :type bodies: list
+    """
+
+    orbits = {}
+    for body in bodies:
+        post_init = type(body).post_init
+        if post_init is Body.post_init:
+            continue
+        orbit = body.orbit if post_init is OrbitingBody.post_init else None
+        # tables of tabulated orbits are built when they are used, only the orbit they tabulate is compiled
+        if isinstance(orbit, TabulatedOrbit) and type(orbit).post_init is TabulatedOrbit.post_init:
+            orbit = orbit.orbit
+        if orbit is None or type(orbit).post_init is not Orbit.post_init:
+            body.post_init()
+        elif not orbit.compiled:
+            orbits.setdefault(type(orbit), []).append(orbit)
+    for orbit_type, group in orbits.items():
+        orbit_type.compile_many(group)
@@ -0,0 +1,149 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+from util import auto_str
+
+# name, type and shape of every entry of the arrays of a store
+_fields = (("positions", numpy.float64, (3,)),
+           ("radii", numpy.float64, ()),
+           ("colors", numpy.float64, (3,)),
+           ("axial_tilts", numpy.float64, ()),
+           ("periods", numpy.float64, ()),
+           ("masses", numpy.float64, ()),
+           ("rotations", numpy.float64, ()),
+           ("parents", numpy.int64, ()))
+
+
+@auto_str
+class BodyStore(object):
+    """
+    Holds the numerical state of many bodies in one array per attribute, the bodies themselves only keep their index.
+    This keeps the bodies small and lets their state be updated for all of them at once. The store belongs to whoever
+    creates the bodies, e.g. one store per call of :func:`solarsystem.loader.load_bodies`, so it is released together
+    with them. Slots of removed bodies are reused by the next bodies that are added.
+
+    :var bodies: The bodies in the order of the arrays, None for free slots
+    :type bodies: list
+    :var positions: Position of every body in the system as (N, 3) array
+    :type positions: :class:`numpy.ndarray`
+    :var radii: Radius of every body
+    :type radii: :class:`numpy.ndarray`
+    :var colors: Base color of every body as (N, 3) array of r, g and b, usually from 0 to 255
+    :type colors: :class:`numpy.ndarray`
+    :var axial_tilts: Axial tilt of every body
+    :type axial_tilts: :class:`numpy.ndarray`
+    :var periods: Sidereal rotation period of every body
+    :type periods: :class:`numpy.ndarray`
+    :var masses: Mass of every body in kilograms
+    :type masses: :class:`numpy.ndarray`
+    :var rotations: Rotation of every body around its axis as fraction of a full rotation
+    :type rotations: :class:`numpy.ndarray`
+    :var parents: Index of the parent of every body, -1 if it has none
+    :type parents: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, capacity=16):
+        """
+        Creates an empty store
+
+        :param capacity: Number of bodies the arrays have room for at first, they grow when more are added
+        :type capacity: int
+        """
+
+        self.bodies = []
+        self._free = []
+        self._capacity = max(1, capacity)
+        self._arrays = {name: numpy.zeros((self._capacity,) + shape, dtype=dtype) for name, dtype, shape in _fields}
+        self._arrays["parents"][:] = -1
+
+    def __len__(self):
+        return len(self.bodies) - len(self._free)
+
+    def __getattr__(self, name):
+        # the arrays are views of the used part of the allocated arrays
+        arrays = self.__dict__.get("_arrays")
+        if arrays is None or name not in arrays:
+            raise AttributeError(name)
+        return arrays[name][:len(self.bodies)]
+
+    def add(self, body):
+        """
+        Adds a body, its state starts out as zero and without a parent. A free slot is used if there is one.
+
+        :param body: The body
+        :type body: :class:`solarsystem.body.Body`
+        :return: Index of the body in the arrays
+        :rtype: int
+        """
+
+        if self._free:
+            index = self._free.pop()
+            self.bodies[index] = body
+            return index
+        if len(self.bodies) == self._capacity:
+            self._capacity *= 2
+            for name, dtype, shape in _fields:
+                array = numpy.zeros((self._capacity,) + shape, dtype=dtype)
+                array[:len(self.bodies)] = self._arrays[name][:len(self.bodies)]
+                self._arrays[name] = array
+            self._arrays["parents"][len(self.bodies):] = -1
+        self.bodies.append(body)
+        return len(self.bodies) - 1
+
+    def remove(self, index):
+        """
+        Removes a body, its slot is cleared and reused by the next body that is added.
+        Bodies that still have the removed body as parent are left without a parent.
+
+        :param index: Index of the body in the arrays
+        :type index: int
+        """
+
+        for name, _, _ in _fields:
+            self._arrays[name][index] = 0
+        parents = self.parents
+        parents[parents == index] = -1
+        parents[index] = -1
+        self.bodies[index] = None
+        self._free.append(index)
+
+    def transfer(self, index, store):
+        """
+        Moves a body with its state into another store, the parent is not kept as it is an index into this store
+
+        :param index: Index of the body in the arrays of this store
+        :type index: int
+        :param store: Store to move the body into
+        :type store: :class:`BodyStore`
+        :return: Index of the body in the other store
+        :rtype: int
+        """
+
+        target = store.add(self.bodies[index])
+        for name, _, _ in _fields:
+            if name != "parents":
+                store._arrays[name][target] = self._arrays[name][index]
+        self.remove(index)
+        return target
+
+    def update_rotations(self, time, indices=None):
+        """
+        Calculates the rotation of the bodies around their axis
+
+        :param time: Delta Time
+        :type time: float
+        :param indices: Indices of the bodies to update, None for all bodies
+        :type indices: :class:`numpy.ndarray`, None
+        """
+
+        periods = self.periods if indices is None else self.periods[indices]
+        rotations = numpy.mod(time, periods) / periods
+        if indices is None:
+            self.rotations[:] = rotations
+        else:
+            self.rotations[indices] = rotations
+
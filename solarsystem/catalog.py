@@ -0,0 +1,339 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import csv
+import glob
+import json
+
+import numpy
+import os
+from os.path import basename, splitext
+from util import auto_str
+
+# orbit types by their code in the catalog, 0 is a body without orbit
+orbit_types = (None, "circular", "elliptic")
+
+# elements of every orbit type in the order they are stored in the catalog
+orbit_elements = {
+    "circular": ("radius", "orbital_period", "inclination"),
+    "elliptic": ("apoapsis", "periapsis", "longtitude_ascending_node", "argument_of_periapsis", "inclination",
+                 "initial_mean_anomaly", "multiplier")
+}
+
+# defaults of the lookup table, see :class:`solarsystem.orbit.TabulatedOrbit`
+lookup_table_defaults = {"tolerance": 0.001, "min_steps": 64, "max_steps": 65536}
+
+
+def catalog_dtype(id_length, name_length, texture_length):
+    """
+    Get the type of the records of a catalog
+
+    :param id_length: Length of the longest internal name in bytes
+    :type id_length: int
+    :param name_length: Length of the longest name in bytes
+    :type name_length: int
+    :param texture_length: Length of the longest texture filename in bytes
+    :type texture_length: int
+    :return: Type of the records
+    :rtype: :class:`numpy.dtype`
+    """
+
+    return numpy.dtype([("id", "S%d" % max(1, id_length)),
+                        ("name", "S%d" % max(1, name_length)),
+                        ("parent", numpy.int32),
+                        ("texture", "S%d" % max(1, texture_length)),
+                        ("color", numpy.float64, (3,)),
+                        ("radius", numpy.float64),
+                        ("axial_tilt", numpy.float64),
+                        ("sidereal_rotation_period", numpy.float64),
+                        ("mass", numpy.float64),
+                        ("instanced", numpy.bool_),
+                        ("atlas", numpy.bool_),
+                        ("orbit", numpy.uint8),
+                        ("elements", numpy.float64, (max(len(names) for names in orbit_elements.values()),)),
+                        ("tabulated", numpy.bool_),
+                        ("tolerance", numpy.float64),
+                        ("min_steps", numpy.int32),
+                        ("max_steps", numpy.int32),
+                        ("ring_texture", "S%d" % max(1, texture_length)),
+                        ("ring_radius", numpy.float64, (2,))])
+
+
+def read_directory(directory):
+    """
+    Reads the bodies from the JSON files in a directory, like :func:`solarsystem.loader.load_bodies`
+
+    :param directory: Directory to read the bodies from
+    :type directory: str
+    :return: JSON data of the bodies by their internal name, the filename without extension
+    :rtype: dict
+    """
+
+    bodies = {}
+    for file in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(file) as data_file:
+            bodies[splitext(basename(file))[0]] = json.load(data_file)
+    return bodies
+
+
+def read_jsonl(filename):
+    """
+    Reads the bodies from a file with the JSON data of one body per line. The internal name of a body is its "id",
+    the lower case name if it has none.
+
+    :param filename: Filename of the file
+    :type filename: str
+    :return: JSON data of the bodies by their internal name
+    :rtype: dict
+    """
+
+    bodies = {}
+    with open(filename) as data_file:
+        for line in data_file:
+            if line.strip():
+                data = json.loads(line)
+                bodies[data.pop("id", data["name"].lower())] = data
+    return bodies
+
+
+def read_csv(filename):
+    """
+    Reads the bodies from a CSV file with one body per row. The columns are the keys of the JSON data, keys of
+    nested objects are joined with dots, e.g. "basecolor.r" or "orbit.type". Empty cells are left out.
+    The internal name of a body is in the column "id", the lower case name if there is none.
+
+    :param filename: Filename of the file
+    :type filename: str
+    :return: JSON data of the bodies by their internal name
+    :rtype: dict
+    """
+
+    bodies = {}
+    with open(filename, newline="") as data_file:
+        for row in csv.DictReader(data_file):
+            data = {}
+            for column, value in row.items():
+                if column is None or value is None or value == "":
+                    continue
+                *path, key = column.strip().split(".")
+                target = data
+                for part in path:
+                    target = target.setdefault(part, {})
+                target[key] = _csv_value(value.strip())
+            internal_name = str(data.pop("id")) if "id" in data else str(data["name"]).lower()
+            bodies[internal_name] = data
+    return bodies
+
+
+def _csv_value(value):
+    """
+    Converts a cell of a CSV file to the type it would have in JSON
+
+    :param value: Content of the cell
+    :type value: str
+    :return: Number, bool or the string itself
+    """
+
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for type in (int, float):
+        try:
+            return type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def read_source(path):
+    """
+    Reads the bodies from a directory of JSON files, a CSV file or a JSONL file
+
+    :param path: Directory or filename ending with .csv or .jsonl
+    :type path: str
+    :return: JSON data of the bodies by their internal name
+    :rtype: dict
+    :raise ValueError: The path is neither a directory nor a CSV or JSONL file
+    """
+
+    if os.path.isdir(path):
+        return read_directory(path)
+    extension = splitext(path)[1].lower()
+    if extension == ".csv":
+        return read_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return read_jsonl(path)
+    raise ValueError("can not read bodies from " + path)
+
+
+def compile_catalog(bodies, filename):
+    """
+    Writes the bodies into a catalog file. The records are sorted by internal name, so a body is found by a binary
+    search, and the parents are stored as index of their record.
+
+    :param bodies: JSON data of the bodies by their internal name, the same data :func:`solarsystem.loader.load_body` takes
+    :type bodies: dict
+    :param filename: Filename of the catalog, a .npy file
+    :type filename: str
+    :raise ValueError: The parent of a body is not in the catalog or an orbit type is invalid
+    """
+
+    ids = sorted(bodies)
+    indices = {internal_name: index for index, internal_name in enumerate(ids)}
+    element_count = max(len(elements) for elements in orbit_elements.values())
+    rows = []
+    for internal_name in ids:
+        data = bodies[internal_name]
+        # values read from CSV files may be numbers where strings are expected
+        parent = str(data["parent"]) if "parent" in data else None
+        if parent is not None and parent not in indices:
+            raise ValueError("parent " + parent + " of " + internal_name + " is not in the catalog")
+        basecolor = data["basecolor"]
+        orbit_type = 0
+        elements = [0.0] * element_count
+        tabulated = False
+        lookup_table = lookup_table_defaults
+        if "orbit" in data:
+            orbit = data["orbit"]
+            if orbit["type"] not in orbit_elements:
+                raise ValueError("type " + orbit["type"] + " of " + internal_name + " is invalid")
+            orbit_type = orbit_types.index(orbit["type"])
+            elements[:len(orbit_elements[orbit["type"]])] = [orbit[element] for element in orbit_elements[orbit["type"]]]
+            if "lookup_table" in orbit:
+                tabulated = True
+                lookup_table = dict(lookup_table_defaults, **orbit["lookup_table"])
+        ring = data.get("ring", {"texture": "", "radius": {"inner": 0.0, "outer": 0.0}})
+        rows.append((internal_name.encode("utf-8"), str(data["name"]).encode("utf-8"),
+                     -1 if parent is None else indices[parent], str(data["texture"]).encode("utf-8"),
+                     (basecolor["r"], basecolor["g"], basecolor["b"]),
+                     data["radius"], data["axial_tilt"], data["sidereal_rotation_period"], data["mass"],
+                     data.get("instanced", False), data.get("atlas", False), orbit_type, elements,
+                     tabulated, lookup_table["tolerance"], lookup_table["min_steps"], lookup_table["max_steps"],
+                     str(ring["texture"]).encode("utf-8"), (ring["radius"]["inner"], ring["radius"]["outer"])))
+
+    # the strings are as long as the longest one, so no space is wasted
+    lengths = [max((len(row[column]) for row in rows), default=1) for column in (0, 1, 3, 17)]
+    records = numpy.array(rows, dtype=catalog_dtype(lengths[0], lengths[1], max(lengths[2], lengths[3])))
+
+    # written next to the catalog first, so a catalog that is open is never seen half written
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as catalog_file:
+        numpy.save(catalog_file, records)
+    os.replace(temporary, filename)
+
+
+@auto_str
+class Catalog(object):
+    """
+    A compiled catalog of bodies, see :func:`compile_catalog`. The file is memory mapped, so opening it does not read
+    the records, only the records of the bodies that are loaded are read from disk.
+
+    :var filename: Filename of the catalog
+    :type filename: str
+    :var records: Records of all bodies, sorted by internal name
+    :type records: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, filename):
+        """
+        Opens a catalog
+
+        :param filename: Filename of the catalog
+        :type filename: str
+        :raise ValueError: The file is not a catalog
+        """
+
+        self.filename = filename
+        self.records = numpy.load(filename, mmap_mode="r")
+        if self.records.dtype.names is None or "id" not in self.records.dtype.names:
+            raise ValueError(filename + " is not a body catalog")
+
+    def __len__(self):
+        return len(self.records)
+
+    def find(self, internal_name):
+        """
+        Finds a body by a binary search for its internal name
+
+        :param internal_name: Internal name of the body
+        :type internal_name: str
+        :return: Index of the record of the body
+        :rtype: int
+        :raise KeyError: There is no body with the internal name
+        """
+
+        key = internal_name.encode("utf-8")
+        ids = self.records["id"]
+        index = int(numpy.searchsorted(ids, key))
+        if index == len(ids) or ids[index] != key:
+            raise KeyError(internal_name)
+        return index
+
+    def select(self, selection=None):
+        """
+        Get the records that have to be loaded for the selected bodies, these are the bodies and all their parents
+
+        :param selection: Internal names or indices of the bodies or a boolean mask over the records, None for all
+        :type selection: list, :class:`numpy.ndarray`, None
+        :return: Sorted indices of the records
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        if selection is None:
+            return numpy.arange(len(self.records))
+        selection = list(selection) if not isinstance(selection, numpy.ndarray) else selection
+        if len(selection) and isinstance(selection[0], str):
+            selection = [self.find(internal_name) for internal_name in selection]
+        selection = numpy.asarray(selection)
+        if selection.dtype == numpy.bool_:
+            selection = numpy.flatnonzero(selection)
+        selected = set(int(index) for index in selection)
+        parents = self.records["parent"]
+        for index in list(selected):
+            parent = int(parents[index])
+            while parent >= 0 and parent not in selected:
+                selected.add(parent)
+                parent = int(parents[parent])
+        return numpy.array(sorted(selected), dtype=numpy.int64)
+
+    def body_data(self, index):
+        """
+        Get a body as JSON data like in its JSON file
+
+        :param index: Index of the record
+        :type index: int
+        :return: Internal name and JSON data of the body, the parent is given by its internal name
+        :rtype: tuple
+        """
+
+        record = self.records[index]
+        color = record["color"]
+        data = {
+            "name": record["name"].decode("utf-8"),
+            "texture": record["texture"].decode("utf-8"),
+            "basecolor": {key: int(value) if value.is_integer() else value for key, value in zip("rgb", color.tolist())},
+            "radius": float(record["radius"]),
+            "axial_tilt": float(record["axial_tilt"]),
+            "sidereal_rotation_period": float(record["sidereal_rotation_period"]),
+            "mass": float(record["mass"]),
+            "instanced": bool(record["instanced"]),
+            "atlas": bool(record["atlas"])
+        }
+        if record["parent"] >= 0:
+            data["parent"] = self.records["id"][record["parent"]].decode("utf-8")
+        if record["orbit"]:
+            type = orbit_types[record["orbit"]]
+            orbit = dict(zip(orbit_elements[type], (float(element) for element in record["elements"])))
+            orbit["type"] = type
+            if record["tabulated"]:
+                orbit["lookup_table"] = {"tolerance": float(record["tolerance"]),
+                                         "min_steps": int(record["min_steps"]),
+                                         "max_steps": int(record["max_steps"])}
+            data["orbit"] = orbit
+        if record["ring_texture"]:
+            data["ring"] = {"texture": record["ring_texture"].decode("utf-8"),
+                            "radius": {"inner": float(record["ring_radius"][0]),
+                                       "outer": float(record["ring_radius"][1])}}
+        return record["id"].decode("utf-8"), data
@@ -0,0 +1,321 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict
+
+import numpy
+from numpy.lib.format import open_memmap
+from solarsystem.loader import load_bodies
+from solarsystem.propagator import Propagator
+from util import auto_str
+
+# propagator and output of a worker process, every worker loads the bodies and opens the output once
+_worker_propagator = None
+_worker_positions = None
+
+# approximate bytes of the entry of a snapshot in the dict and the linked list of an OrderedDict
+_entry_overhead = 104
+
+# approximate bytes needed per body and time while calculating a chunk: the positions of the chunk, their
+# transposed copy and the temporaries of the Kepler solver, which all have one entry per body and time
+_chunk_bytes_per_position = 320
+
+
+@auto_str
+class EphemerisCache(object):
+    """
+    Caches the positions of all bodies by time. The time is quantized, so revisiting roughly the same
+    instant while scrubbing or pausing hits the same snapshot. The least recently used snapshots are
+    evicted once the memory budget is exceeded. The cache is only used while time moves by at most
+    max_step time slots between two updates, during playback every update is a new time anyway.
+
+    :var memory_budget: Maximum number of bytes used by the snapshots including their arrays, keys and entries
+    :type memory_budget: int
+    :var quantum: Length of one time slot in seconds
+    :type quantum: float
+    :var max_step: Largest number of time slots between two updates for which the cache is used
+    :type max_step: int
+    :var dtype: Data type the snapshots are stored with
+    :type dtype: :class:`numpy.dtype`
+    :var memory: Number of bytes currently used by the snapshots
+    :type memory: int
+    :var hits: Number of lookups that found a snapshot
+    :type hits: int
+    :var misses: Number of lookups that did not find a snapshot
+    :type misses: int
+    """
+
+    def __init__(self, memory_budget=16 * 1024 * 1024, quantum=600, max_step=1, dtype=numpy.float64):
+        """
+        Creates a new empty cache
+
+        :param memory_budget: Maximum number of bytes used by the snapshots including their arrays, keys and entries
+        :type memory_budget: int
+        :param quantum: Length of one time slot in seconds
+        :type quantum: float
+        :param max_step: Largest number of time slots between two updates for which the cache is used
+        :type max_step: int
+        :param dtype: Data type the snapshots are stored with
+        :type dtype: :class:`numpy.dtype`
+        """
+
+        self.memory_budget = memory_budget
+        self.quantum = quantum
+        self.max_step = max_step
+        self.dtype = numpy.dtype(dtype)
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = OrderedDict()
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def key(self, time):
+        """
+        Get the time slot of the given time
+
+        :param time: Delta Time
+        :type time: float
+        :return: Time slot
+        :rtype: int
+        """
+
+        return int(round(time / self.quantum))
+
+    def time(self, key):
+        """
+        Get the time the snapshots of the given time slot are calculated for
+
+        :param key: Time slot
+        :type key: int
+        :return: Delta Time
+        :rtype: float
+        """
+
+        return key * self.quantum
+
+    def usable(self, key, last_key):
+        """
+        Check if the cache should be used for an update, that is while time is paused or moves slowly
+
+        :param key: Time slot of the update
+        :type key: int
+        :param last_key: Time slot of the previous update, None if there was none
+        :type last_key: int, None
+        :return: True if the time slot is close to the previous one
+        :rtype: bool
+        """
+
+        return last_key is not None and abs(key - last_key) <= self.max_step
+
+    @staticmethod
+    def entry_memory(key, snapshot):
+        """
+        Get the memory a snapshot takes in the cache
+
+        :param key: Time slot
+        :type key: int
+        :param snapshot: Positions of all bodies
+        :type snapshot: :class:`numpy.ndarray`
+        :return: Bytes of the array with its header, the key and the entry in the cache
+        :rtype: int
+        """
+
+        return sys.getsizeof(snapshot) + sys.getsizeof(key) + _entry_overhead
+
+    def get(self, key):
+        """
+        Get the snapshot of the given time slot and mark it as recently used
+
+        :param key: Time slot
+        :type key: int
+        :return: Positions of all bodies, None if there is no snapshot for the time slot
+        :rtype: :class:`numpy.ndarray`, None
+        """
+
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self._snapshots.move_to_end(key)
+        self.hits += 1
+        return snapshot
+
+    def put(self, key, positions):
+        """
+        Store a copy of the positions as snapshot of the given time slot and evict old snapshots if needed
+
+        :param key: Time slot
+        :type key: int
+        :param positions: Positions of all bodies
+        :type positions: :class:`numpy.ndarray`
+        """
+
+        snapshot = numpy.array(positions, dtype=self.dtype)
+        memory = self.entry_memory(key, snapshot)
+        if memory > self.memory_budget:
+            return
+        old = self._snapshots.pop(key, None)
+        if old is not None:
+            self.memory -= self.entry_memory(key, old)
+        self._snapshots[key] = snapshot
+        self.memory += memory
+        while self.memory > self.memory_budget:
+            evicted_key, evicted = self._snapshots.popitem(last=False)
+            self.memory -= self.entry_memory(evicted_key, evicted)
+
+    def clear(self):
+        """
+        Remove all snapshots
+        """
+
+        self._snapshots.clear()
+        self.memory = 0
+
+
+def _init_worker(directory, output):
+    """
+    Loads the bodies and opens the shared output in a worker process
+
+    :param directory: directory to load the bodies from
+    :type directory: str
+    :param output: .npy file the positions are written to
+    :type output: str
+    """
+
+    global _worker_propagator, _worker_positions
+    _worker_propagator = Propagator(load_bodies(directory, headless=True))
+    _worker_positions = numpy.load(output, mmap_mode="r+")
+
+
+def _propagate_shard(start, step, first, last, chunk_size):
+    """
+    Calculates the positions of a shard of the time range in a worker process and writes them to the output
+
+    :param start: First time of the whole range in seconds since J.2000
+    :type start: float
+    :param step: Time between two positions in seconds
+    :type step: float
+    :param first: Index of the first time of the shard
+    :type first: int
+    :param last: Index after the last time of the shard
+    :type last: int
+    :param chunk_size: Number of times calculated at once
+    :type chunk_size: int
+    """
+
+    _propagate_range(_worker_propagator, _worker_positions, start, step, first, last, chunk_size)
+    _worker_positions.flush()
+
+
+def _propagate_range(propagator, positions, start, step, first, last, chunk_size):
+    """
+    Calculates the positions for the given indices of the time range in chunks and writes them to positions
+
+    :param propagator: Propagator of the bodies
+    :type propagator: :class:`solarsystem.propagator.Propagator`
+    :param positions: Output with shape (bodies, times, 3)
+    :type positions: :class:`numpy.ndarray`
+    :param start: First time of the whole range in seconds since J.2000
+    :type start: float
+    :param step: Time between two positions in seconds
+    :type step: float
+    :param first: Index of the first time to calculate
+    :type first: int
+    :param last: Index after the last time to calculate
+    :type last: int
+    :param chunk_size: Number of times calculated at once
+    :type chunk_size: int
+    """
+
+    for offset in range(first, last, chunk_size):
+        end = min(offset + chunk_size, last)
+        times = start + numpy.arange(offset, end, dtype=numpy.float64) * step
+        positions[:, offset:end] = propagator.ephemeris(times).transpose(1, 0, 2)
+
+
+def chunk_size_for(body_count, memory_budget):
+    """
+    Get the number of times that can be calculated at once within a memory budget
+
+    :param body_count: Number of bodies
+    :type body_count: int
+    :param memory_budget: Bytes a chunk may use
+    :type memory_budget: int
+    :return: Number of times per chunk, at least 1
+    :rtype: int
+    """
+
+    return max(1, int(memory_budget // (max(1, body_count) * _chunk_bytes_per_position)))
+
+
+def generate_ephemeris(directory, output, start, stop, step, chunk_size=None, processes=None, memory_budget=64 * 1024 * 1024):
+    """
+    Calculates the positions of all bodies from start to stop and writes them to the output file.
+
+    The positions are written to one memory-mappable .npy file with shape (bodies, times, 3),
+    so the positions of every body are stored contiguously. A .json file next to it lists
+    the names of the bodies and the times.
+
+    The time range is split into shards that are calculated by a pool of worker processes.
+    Every worker loads the bodies once and writes its shards directly into the memory-mapped output.
+    Shards are calculated in chunks, so the memory used does not depend on the length of the range.
+    By default the chunks are as large as the memory budget allows for the number of bodies.
+
+    :param directory: directory to load the bodies from
+    :type directory: str
+    :param output: .npy file to write the positions to
+    :type output: str
+    :param start: First time in seconds since J.2000
+    :type start: float
+    :param stop: End of the time range in seconds since J.2000 (exclusive)
+    :type stop: float
+    :param step: Time between two positions in seconds
+    :type step: float
+    :param chunk_size: Number of times calculated at once, None to derive it from the memory budget
+    :type chunk_size: int, None
+    :param processes: Number of worker processes, None to use all cores, at most one per shard is started
+                      and none if that is only one
+    :type processes: int, None
+    :param memory_budget: Bytes every process may use for calculating a chunk, used if chunk_size is None
+    :type memory_budget: int
+    :return: The written positions as memory-mapped array
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    if step <= 0 or stop <= start:
+        raise ValueError("invalid time range")
+
+    bodies = load_bodies(directory, headless=True)
+    count = int(numpy.ceil((stop - start) / step))
+    if chunk_size is None:
+        chunk_size = chunk_size_for(len(bodies), memory_budget)
+    positions = open_memmap(output, mode="w+", dtype=numpy.float64, shape=(len(bodies), count, 3))
+    with open(os.path.splitext(output)[0] + ".json", "w") as index_file:
+        json.dump({"bodies": [body.name for body in bodies], "start": start, "step": step, "count": count}, index_file, indent=2)
+
+    # a few shards per worker, so workers that finish early can take over some of the work,
+    # but no more workers than shards, starting them costs more than a shard
+    processes = processes or os.cpu_count() or 1
+    shard_count = min(processes * 4, max(1, count // chunk_size))
+    processes = min(processes, shard_count)
+    if processes == 1:
+        _propagate_range(Propagator(bodies), positions, start, step, 0, count, chunk_size)
+    else:
+        positions.flush()
+        bounds = numpy.linspace(0, count, shard_count + 1).astype(int).tolist()
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(directory, output)) as pool:
+            results = [pool.apply_async(_propagate_shard, (start, step, first, last, chunk_size)) for first, last in zip(bounds, bounds[1:]) if last > first]
+            for result in results:
+                result.get()
+
+    positions.flush()
+    return positions
@@ -9,47 +9,126 @@ import json
 
 import os
 from os.path import basename, splitext
-from solarsystem.body import OrbitingBody, StationaryBody
-from solarsystem.orbit import CircularOrbit, EllipticOrbit
-from solarsystem.renderer import OrbitingBodyWithRingRenderer, setup_ring_renderer
+from solarsystem.body import OrbitingBody, StationaryBody, post_init_bodies
+from solarsystem.bodystore import BodyStore
+from solarsystem.catalog import Catalog
+from solarsystem.orbit import CircularOrbit, EllipticOrbit, TabulatedOrbit
 from util import dts
 
 
-def load_bodies(directory):
+def load_bodies(directory, headless=False):
     """
-    Loads all bodies that are defined in the JSON files from the given directory
+    Loads all bodies that are defined in the JSON files from the given directory or in a compiled catalog
 
-    :param directory: directory to load the bodies from
+    :param directory: directory to load the bodies from or filename of a catalog, see :func:`load_catalog`
     :type directory: str
-    :return: list of the loaded bodies
+    :param headless: Do not create renderers, so the bodies can be loaded and updated without OpenGL
+    :type headless: bool
+    :return: list of the loaded bodies, every parent comes before its children
     :rtype: list
     """
 
-    files = glob.glob(os.path.join(directory, "*.json"))
+    if os.path.isfile(directory):
+        return load_catalog(directory, headless=headless)
+
+    files = sorted(glob.glob(os.path.join(directory, "*.json")))
+    # the state of all bodies is kept in one store, so it can be updated at once
+    store = BodyStore(len(files))
     bodies = {}
     for file in files:
-        print("Loading body " + file)
         with open(file) as data_file:
             internal_name = splitext(basename(file))[0]
-            bodies[internal_name] = load_body(json.load(data_file))
+            bodies[internal_name] = load_body(json.load(data_file), store)
+    print("Loaded %d bodies from %s" % (len(bodies), directory))
+    return _link_bodies(bodies, headless)
+
+
+def load_catalog(catalog, selection=None, headless=False):
+    """
+    Loads bodies from a catalog compiled by :func:`solarsystem.catalog.compile_catalog`. Only the records of the
+    selected bodies and their parents are read, so a few bodies of a large catalog load as fast as from a small one.
+
+    :param catalog: catalog or filename of the catalog
+    :type catalog: :class:`solarsystem.catalog.Catalog`, str
+    :param selection: internal names or indices of the bodies or a boolean mask over the records, None for all bodies
+    :type selection: list, :class:`numpy.ndarray`, None
+    :param headless: Do not create renderers, so the bodies can be loaded and updated without OpenGL
+    :type headless: bool
+    :return: list of the loaded bodies, every parent comes before its children
+    :rtype: list
+    """
+
+    if not isinstance(catalog, Catalog):
+        catalog = Catalog(catalog)
+    indices = catalog.select(selection)
+    print("Loading %d of %d bodies from %s" % (len(indices), len(catalog), catalog.filename))
+    store = BodyStore(len(indices))
+    bodies = {}
+    for index in indices:
+        internal_name, data = catalog.body_data(index)
+        bodies[internal_name] = load_body(data, store)
+    return _link_bodies(bodies, headless)
+
+
+def _link_bodies(bodies, headless):
+    """
+    Sets the parents and children of the loaded bodies, sorts them and prepares them to be updated and drawn
+
+    :param bodies: loaded bodies by their internal name
+    :type bodies: dict
+    :param headless: Do not create renderers
+    :type headless: bool
+    :return: list of the bodies, every parent comes before its children
+    :rtype: list
+    """
+
     for key in bodies:
         body = bodies[key]
         if body.parent_internal_name is not None:
             body.parent = bodies[body.parent_internal_name]
-            del body.parent_internal_name
+            body.parent.children.append(body)
+        del body.parent_internal_name
+
+    bodies = sort_bodies(bodies.values())
+    print("Executing post_init for %d bodies" % len(bodies))
+    post_init_bodies(bodies)
+
+    if not headless:
+        # imported here, the renderers need OpenGL
+        from solarsystem.renderer import create_renderers
+        create_renderers(bodies)
+
+    return bodies
 
-    for body in bodies.values():
-        print("Executing post_init for " + body.name)
-        body.post_init()
 
-    return bodies.values()
+def sort_bodies(bodies):
+    """
+    Flattens the body tree level by level, so every parent comes before its children.
+    The parents and children of the bodies have to be set already.
+
+    :param bodies: bodies to sort
+    :type bodies: list
+    :return: sorted list of the bodies
+    :rtype: list
+    :raise ValueError: A body is not reachable from a body without a parent
+    """
+
+    bodies = list(bodies)
+    ordered = [body for body in bodies if body.parent is None]
+    for body in ordered:
+        ordered.extend(body.children)
+    if len(ordered) != len(bodies):
+        raise ValueError("bodies " + ", ".join(body.name for body in bodies if body not in ordered) + " have a parent cycle")
+    return ordered
 
 
-def load_body(data):
+def load_body(data, store=None):
     """
     Load the body from the specified JSON data. Parent is not set here!
 
     :param data: JSON data to load the body from
+    :param store: Store that holds the state of the body, None for a new store of its own
+    :type store: :class:`solarsystem.bodystore.BodyStore`, None
     :return: Body from the supplied data
     :rtype: :class:`solarsystem.body.Body`
     """
@@ -84,13 +163,14 @@ def load_body(data):
     body = None
 
     if has_orbit:
-        body = OrbitingBody(None, name, texture, basecolor, radius, orbit, axial_tilt, sidereal_rotation_period, mass)
+        body = OrbitingBody(None, name, texture, basecolor, radius, orbit, axial_tilt, sidereal_rotation_period, mass, store=store)
         if has_ring:
-            body.renderer = OrbitingBodyWithRingRenderer()
-            body = setup_ring_renderer(ring_texture, ring_inner_radius, ring_outer_radius, body)
+            body.set_ring(ring_texture, ring_inner_radius, ring_outer_radius)
     else:
-        body = StationaryBody(None, name, texture, basecolor, radius, axial_tilt, sidereal_rotation_period, mass)
+        body = StationaryBody(None, name, texture, basecolor, radius, axial_tilt, sidereal_rotation_period, mass, store=store)
 
+    body.instanced = data.get("instanced", False)
+    body.atlas = data.get("atlas", False)
     body.parent_internal_name = parent
     return body
 
@@ -109,7 +189,7 @@ def load_orbit(data):
         radius = data["radius"]
         orbital_period = data["orbital_period"] * dts
         inclination = data["inclination"]
-        return CircularOrbit(radius, orbital_period, inclination)
+        orbit = CircularOrbit(radius, orbital_period, inclination)
     elif type == "elliptic":
         apoapsis = data["apoapsis"]
         periapsis = data["periapsis"]
@@ -118,6 +198,11 @@ def load_orbit(data):
         inclination = data["inclination"]
         initial_mean_anomaly = data["initial_mean_anomaly"]
         multiplier = data["multiplier"]
-        return EllipticOrbit(apoapsis, periapsis, longtitude_ascending_node, argument_of_periapsis, inclination, initial_mean_anomaly=initial_mean_anomaly, multiplier=multiplier)
+        orbit = EllipticOrbit(apoapsis, periapsis, longtitude_ascending_node, argument_of_periapsis, inclination, initial_mean_anomaly=initial_mean_anomaly, multiplier=multiplier)
     else:
         raise TypeError("type " + type + " is invalid")
+
+    if "lookup_table" in data:
+        lookup_table_data = data["lookup_table"]
+        orbit = TabulatedOrbit(orbit, **lookup_table_data)
+    return orbit
@@ -4,12 +4,13 @@ Created on 03.11.2015
 :author: Rene Hollander
 """
 
-from math import sin, cos, radians, sqrt, pi
+from math import sin, cos, sqrt, pi, log2
 
+import numpy
 from abc import ABCMeta, abstractmethod
 from euclid import Vector3
 from util import auto_str
-from util.orbitalcalculations import gravitational_constant, true_anomaly_from_eccentric, eccentric_anomaly_from_mean
+from util.orbitalcalculations import gravitational_constant, solve_kepler, solve_kepler_array, kepler_tolerance, tau
 
 
 @auto_str
@@ -17,12 +18,25 @@ class Orbit(object, metaclass=ABCMeta):
     """
     An abstract class defining the orbit of a body
 
+    Everything that only depends on the orbital elements is precomputed by :meth:`compile`.
+    Changing one of the attributes listed in elements marks the orbit as not compiled,
+    so it gets compiled again on the next calculation.
+
     :var body: Body that this orbit belongs to
     :type body: :class:`solarsystem.body.Body`
     :var multiplier: Position multiplier
     :type multiplier: float
+    :var compiled: False if an element changed since the last compilation
+    :type compiled: bool
+    :var version: Incremented whenever an element of this orbit changes
+    :type version: int
+    :var revision: Incremented whenever an element of any orbit changes
+    :type revision: int
     """
 
+    elements = ("multiplier",)
+    revision = 0
+
     def __init__(self, body=None, multiplier=1):
         """
         Creates a new Orbit
@@ -33,15 +47,43 @@ class Orbit(object, metaclass=ABCMeta):
         :type multiplier: float
         """
 
+        self.version = 0
+        self.compiled = False
         self.body = body
         self.multiplier = multiplier
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.elements:
+            super().__setattr__("compiled", False)
+            super().__setattr__("version", self.version + 1)
+            Orbit.revision += 1
+
     def post_init(self):
         """
         Calculations and stuff that should happen after everything is setup correctly
         """
 
-        pass
+        self.compile()
+
+    def compile(self):
+        """
+        Precompute everything that only depends on the orbital elements
+        """
+
+        self.compiled = True
+
+    @classmethod
+    def compile_many(cls, orbits):
+        """
+        Compiles many orbits of this type, subclasses can precompute the elements of all of them at once
+
+        :param orbits: Orbits to compile
+        :type orbits: list
+        """
+
+        for orbit in orbits:
+            orbit.compile()
 
     @abstractmethod
     def calculate(self, time):
@@ -56,6 +98,47 @@ class Orbit(object, metaclass=ABCMeta):
 
         pass
 
+    def velocity(self, time):
+        """
+        Calculate the current velocity of the body with a central difference of :meth:`calculate`
+
+        :param time: Delta Time
+        :type time: float
+        :return: velocity per second
+        :rtype: :class:`euclid.Vector3`
+        """
+
+        delta = self.orbital_period * 1e-6
+        return (self.calculate(time + delta) - self.calculate(time - delta)) / (2.0 * delta)
+
+    def calculate_array(self, times):
+        """
+        Calculate the positions at many times at once
+
+        :param times: Delta Times
+        :type times: :class:`numpy.ndarray`
+        :return: positions as array with the shape of times and 3 more entries in the last axis
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        positions = [tuple(self.calculate(time)) for time in times.ravel().tolist()]
+        return numpy.array(positions, dtype=numpy.float64).reshape(times.shape + (3,))
+
+    def velocity_array(self, times):
+        """
+        Calculate the velocities at many times at once
+
+        :param times: Delta Times
+        :type times: :class:`numpy.ndarray`
+        :return: velocities per second as array with the shape of times and 3 more entries in the last axis
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        velocities = [tuple(self.velocity(time)) for time in times.ravel().tolist()]
+        return numpy.array(velocities, dtype=numpy.float64).reshape(times.shape + (3,))
+
     def plot(self, steps):
         """
         Generator to calculate the position in orbit
@@ -68,6 +151,61 @@ class Orbit(object, metaclass=ABCMeta):
         for i in range(0, steps):
             yield self.calculate(i * step)
 
+    def plot_point(self, fraction):
+        """
+        Calculate a point of the orbit for plotting. The points do not have to be evenly spaced in time,
+        subclasses use the parameter of their orbit shape, so the points are spread evenly along it.
+
+        :param fraction: Position along the orbit from 0 to 1
+        :type fraction: float
+        :return: position
+        :rtype: :class:`euclid.Vector3`
+        """
+
+        return self.calculate(fraction * self.orbital_period)
+
+    def plot_adaptive(self, tolerance, min_steps=16, max_steps=16384, scale=None):
+        """
+        Plots the orbit with as few points as needed to keep the distance between the plotted line and the orbit
+        below the tolerance. Every segment is split in half until the middle of the orbit between its ends is
+        close enough to the middle of the segment, so points are only added where the orbit is curved.
+
+        :param tolerance: Maximum distance between line and orbit relative to the size of the orbit, or in the
+                          units of scale if it is given
+        :type tolerance: float
+        :param min_steps: Number of evenly spaced points the line is refined from
+        :type min_steps: int
+        :param max_steps: Maximum number of points, the tolerance might not be met with that many
+        :type max_steps: int
+        :param scale: Function that gives a factor for the distance at a position, for example the pixels
+                      per unit at that position to plot the orbit with a tolerance in pixels
+        :type scale: function
+        :return: positions along the orbit, the first position is not repeated at the end
+        :rtype: list
+        """
+
+        fractions = [i / min_steps for i in range(min_steps + 1)]
+        points = [self.plot_point(fraction % 1.0) for fraction in fractions]
+        if scale is None:
+            tolerance *= max(abs(point) for point in points)
+            scale = lambda point: 1.0
+        max_depth = max(0, int(log2(max_steps / min_steps)))
+
+        plot = []
+        for i in range(min_steps):
+            # the first half of a split segment is refined first, so the points stay in order
+            segments = [(fractions[i], points[i], fractions[i + 1], points[i + 1], 0)]
+            while segments:
+                start, start_point, end, end_point, depth = segments.pop()
+                middle = (start + end) / 2.0
+                middle_point = self.plot_point(middle)
+                if depth < max_depth and abs(middle_point - (start_point + end_point) * 0.5) * scale(middle_point) > tolerance:
+                    segments.append((middle, middle_point, end, end_point, depth + 1))
+                    segments.append((start, start_point, middle, middle_point, depth + 1))
+                else:
+                    plot.append(start_point)
+        return plot
+
 
 class CircularOrbit(Orbit):
     """
@@ -81,8 +219,14 @@ class CircularOrbit(Orbit):
     :type inclination: float
     :param multiplier: Position multiplier
     :type multiplier: float
+    :var p: Direction of the position at the start of the orbit, scaled by the radius
+    :type p: :class:`euclid.Vector3`
+    :var q: Direction of the position a quarter orbit later, scaled by the radius
+    :type q: :class:`euclid.Vector3`
     """
 
+    elements = ("radius", "orbital_period", "inclination", "multiplier")
+
     def __init__(self, radius, orbital_period, inclination=0, multiplier=1):
         """
         Creates a circular orbit with the given radius, orbital_period (siderial) and inclination
@@ -100,14 +244,45 @@ class CircularOrbit(Orbit):
         self.orbital_period = orbital_period
         self.inclination = inclination
 
+    def compile(self):
+        # the orbital plane is tilted around the z axis by the inclination
+        self.p = Vector3(self.radius * cos(self.inclination), self.radius * sin(self.inclination), 0)
+        self.q = Vector3(0, 0, self.radius)
+        super().compile()
+
     def calculate(self, time):
-        angle = radians(360 * ((time % self.orbital_period) / self.orbital_period))
-        x = self.radius * cos(angle)
-        z = self.radius * sin(angle)
-        pos = Vector3(x, 0, z)
-        if self.inclination != 0:
-            pos = pos.rotate_around(Vector3(0, 0, 1), self.inclination)
-        return pos
+        if not self.compiled:
+            self.compile()
+        angle = tau * ((time % self.orbital_period) / self.orbital_period)
+        cos_angle = cos(angle)
+        sin_angle = sin(angle)
+        p = self.p
+        q = self.q
+        return Vector3(p.x * cos_angle + q.x * sin_angle, p.y * cos_angle + q.y * sin_angle, p.z * cos_angle + q.z * sin_angle)
+
+    def velocity(self, time):
+        if not self.compiled:
+            self.compile()
+        angle = tau * ((time % self.orbital_period) / self.orbital_period)
+        angular_velocity = tau / self.orbital_period
+        cos_angle = cos(angle) * angular_velocity
+        sin_angle = sin(angle) * angular_velocity
+        p = self.p
+        q = self.q
+        return Vector3(q.x * cos_angle - p.x * sin_angle, q.y * cos_angle - p.y * sin_angle, q.z * cos_angle - p.z * sin_angle)
+
+    def calculate_array(self, times):
+        if not self.compiled:
+            self.compile()
+        angle = tau * (numpy.remainder(times, self.orbital_period) / self.orbital_period)
+        return numpy.multiply.outer(numpy.cos(angle), tuple(self.p)) + numpy.multiply.outer(numpy.sin(angle), tuple(self.q))
+
+    def velocity_array(self, times):
+        if not self.compiled:
+            self.compile()
+        angle = tau * (numpy.remainder(times, self.orbital_period) / self.orbital_period)
+        angular_velocity = tau / self.orbital_period
+        return (numpy.multiply.outer(numpy.cos(angle), tuple(self.q)) - numpy.multiply.outer(numpy.sin(angle), tuple(self.p))) * angular_velocity
 
 
 class EllipticOrbit(Orbit):
@@ -142,9 +317,21 @@ class EllipticOrbit(Orbit):
     :type mean_motion: float
     :param multiplier: Position multiplier
     :type multiplier: float
+    :var tolerance: Maximum residual of Kepler's equation
+    :type tolerance: float
+    :var iterations: Iterations the Kepler solver needed in the last calculation
+    :type iterations: int
+    :var semi_minor_axis: Semi-minor axis calculated from the semi-major axis and eccentricity
+    :type semi_minor_axis: float
+    :var p: Unit vector from the focus to the periapsis in ecliptic coordinates, scaled by the multiplier
+    :type p: :class:`euclid.Vector3`
+    :var q: Unit vector in the orbital plane 90 degrees ahead of p, scaled by the multiplier
+    :type q: :class:`euclid.Vector3`
     """
 
-    def __init__(self, apoapsis, periapsis, longtitude_ascending_node, argument_of_periapsis, inclination, initial_mean_anomaly=0, multiplier=1):
+    elements = ("apoapsis", "periapsis", "longtitude_ascending_node", "argument_of_periapsis", "inclination", "initial_mean_anomaly", "multiplier")
+
+    def __init__(self, apoapsis, periapsis, longtitude_ascending_node, argument_of_periapsis, inclination, initial_mean_anomaly=0, multiplier=1, tolerance=kepler_tolerance):
         """
         Creates a new elliptical orbit from the given parameters
 
@@ -160,6 +347,8 @@ class EllipticOrbit(Orbit):
         :type initial_mean_anomaly: float
         :param inclination: Inclination of the orbit in radians
         :type inclination: float
+        :param tolerance: Maximum residual of Kepler's equation
+        :type tolerance: float
         """
         super().__init__(multiplier=multiplier)
 
@@ -169,22 +358,308 @@ class EllipticOrbit(Orbit):
         self.argument_of_periapsis = argument_of_periapsis
         self.initial_mean_anomaly = initial_mean_anomaly
         self.inclination = inclination
+        self.tolerance = tolerance
+        self.iterations = 0
 
-    def post_init(self):
+    def compile(self):
         self.semi_major_axis = (self.apoapsis + self.periapsis) / 2.0
         self.eccentricity = (self.apoapsis - self.periapsis) / (self.apoapsis + self.periapsis)
+        self.semi_minor_axis = self.semi_major_axis * sqrt(1.0 - self.eccentricity ** 2.0)
         self.orbital_period = 2.0 * pi * sqrt((self.semi_major_axis ** 3.0) / (gravitational_constant * (5.97237 * 10 ** 24 + 1.9884 * 10 ** 30)))
         self.mean_motion = 2.0 * pi / self.orbital_period
 
+        # rotate the perifocal frame into the ecliptic (longtitude of the ascending node, inclination, argument of periapsis)
+        cos_node = cos(self.longtitude_ascending_node)
+        sin_node = sin(self.longtitude_ascending_node)
+        cos_argument = cos(self.argument_of_periapsis)
+        sin_argument = sin(self.argument_of_periapsis)
+        cos_inclination = cos(self.inclination)
+        sin_inclination = sin(self.inclination)
+        node = Vector3(cos_node, 0, sin_node)
+        normal = Vector3(-sin_node * cos_inclination, sin_inclination, cos_node * cos_inclination)
+        self.p = (node * cos_argument + normal * sin_argument) * self.multiplier
+        self.q = (normal * cos_argument - node * sin_argument) * self.multiplier
+        super().compile()
+
+    @classmethod
+    def compile_many(cls, orbits):
+        if cls.compile is not EllipticOrbit.compile:
+            super().compile_many(orbits)
+            return
+        elements = numpy.array([(orbit.apoapsis, orbit.periapsis, orbit.longtitude_ascending_node, orbit.argument_of_periapsis,
+                                 orbit.inclination, orbit.multiplier) for orbit in orbits], dtype=numpy.float64).reshape(-1, 6)
+        apoapsis, periapsis, longtitude_ascending_node, argument_of_periapsis, inclination, multiplier = elements.T
+
+        # the same as compile, for all orbits at once
+        semi_major_axis = (apoapsis + periapsis) / 2.0
+        eccentricity = (apoapsis - periapsis) / (apoapsis + periapsis)
+        semi_minor_axis = semi_major_axis * numpy.sqrt(1.0 - eccentricity ** 2.0)
+        orbital_period = 2.0 * pi * numpy.sqrt((semi_major_axis ** 3.0) / (gravitational_constant * (5.97237 * 10 ** 24 + 1.9884 * 10 ** 30)))
+        mean_motion = 2.0 * pi / orbital_period
+
+        cos_node = numpy.cos(longtitude_ascending_node)
+        sin_node = numpy.sin(longtitude_ascending_node)
+        cos_argument = numpy.cos(argument_of_periapsis)[:, None]
+        sin_argument = numpy.sin(argument_of_periapsis)[:, None]
+        cos_inclination = numpy.cos(inclination)
+        sin_inclination = numpy.sin(inclination)
+        node = numpy.stack((cos_node, numpy.zeros_like(cos_node), sin_node), axis=1)
+        normal = numpy.stack((-sin_node * cos_inclination, sin_inclination, cos_node * cos_inclination), axis=1)
+        p = (node * cos_argument + normal * sin_argument) * multiplier[:, None]
+        q = (normal * cos_argument - node * sin_argument) * multiplier[:, None]
+
+        # none of these are elements, so they are set without going through __setattr__
+        for orbit, a, e, b, period, motion, p_orbit, q_orbit in zip(orbits, semi_major_axis.tolist(), eccentricity.tolist(),
+                                                                    semi_minor_axis.tolist(), orbital_period.tolist(),
+                                                                    mean_motion.tolist(), p.tolist(), q.tolist()):
+            orbit.__dict__.update(semi_major_axis=a, eccentricity=e, semi_minor_axis=b, orbital_period=period,
+                                  mean_motion=motion, p=Vector3(*p_orbit), q=Vector3(*q_orbit), compiled=True)
+
     def calculate(self, time):
+        if not self.compiled:
+            self.compile()
         mean_anomaly = self.initial_mean_anomaly
         mean_anomaly += self.mean_motion * time
-        true_anomaly = true_anomaly_from_eccentric(self.eccentricity, eccentric_anomaly_from_mean(self.eccentricity, mean_anomaly))
-        true_anomaly = abs(true_anomaly)
-        radius = self.semi_major_axis * (1.0 - self.eccentricity ** 2.0) / (1.0 + self.eccentricity * cos(true_anomaly))
-        x = radius * (cos(self.longtitude_ascending_node) * cos(true_anomaly + self.argument_of_periapsis) - sin(self.longtitude_ascending_node) * sin(true_anomaly + self.argument_of_periapsis) * cos(self.inclination))
-        z = radius * (sin(self.longtitude_ascending_node) * cos(true_anomaly + self.argument_of_periapsis) + cos(self.longtitude_ascending_node) * sin(true_anomaly + self.argument_of_periapsis) * cos(self.inclination))
-        y = radius * sin(true_anomaly + self.argument_of_periapsis) * sin(self.inclination)
-        pos = Vector3(x, y, z)
-        pos *= self.multiplier
-        return pos
+        eccentric_anomaly, self.iterations = solve_kepler(self.eccentricity, mean_anomaly, tolerance=self.tolerance)
+        # position in the perifocal frame, x towards the periapsis
+        x = self.semi_major_axis * (cos(eccentric_anomaly) - self.eccentricity)
+        y = self.semi_minor_axis * sin(eccentric_anomaly)
+        p = self.p
+        q = self.q
+        return Vector3(p.x * x + q.x * y, p.y * x + q.y * y, p.z * x + q.z * y)
+
+    def plot_point(self, fraction):
+        # evenly spaced in eccentric anomaly instead of time, so the periapsis gets as many points as the apoapsis
+        if not self.compiled:
+            self.compile()
+        eccentric_anomaly = tau * fraction
+        x = self.semi_major_axis * (cos(eccentric_anomaly) - self.eccentricity)
+        y = self.semi_minor_axis * sin(eccentric_anomaly)
+        p = self.p
+        q = self.q
+        return Vector3(p.x * x + q.x * y, p.y * x + q.y * y, p.z * x + q.z * y)
+
+    def velocity(self, time):
+        if not self.compiled:
+            self.compile()
+        mean_anomaly = self.initial_mean_anomaly + self.mean_motion * time
+        eccentric_anomaly, self.iterations = solve_kepler(self.eccentricity, mean_anomaly, tolerance=self.tolerance)
+        # derivative of the eccentric anomaly from Kepler's equation
+        rate = self.mean_motion / (1.0 - self.eccentricity * cos(eccentric_anomaly))
+        x = -self.semi_major_axis * sin(eccentric_anomaly) * rate
+        y = self.semi_minor_axis * cos(eccentric_anomaly) * rate
+        p = self.p
+        q = self.q
+        return Vector3(p.x * x + q.x * y, p.y * x + q.y * y, p.z * x + q.z * y)
+
+    def calculate_array(self, times):
+        if not self.compiled:
+            self.compile()
+        mean_anomaly = self.initial_mean_anomaly + self.mean_motion * numpy.asarray(times, dtype=numpy.float64)
+        eccentric_anomaly, _ = solve_kepler_array(self.eccentricity, mean_anomaly, tolerance=self.tolerance)
+        x = self.semi_major_axis * (numpy.cos(eccentric_anomaly) - self.eccentricity)
+        y = self.semi_minor_axis * numpy.sin(eccentric_anomaly)
+        return numpy.multiply.outer(x, tuple(self.p)) + numpy.multiply.outer(y, tuple(self.q))
+
+    def velocity_array(self, times):
+        if not self.compiled:
+            self.compile()
+        mean_anomaly = self.initial_mean_anomaly + self.mean_motion * numpy.asarray(times, dtype=numpy.float64)
+        eccentric_anomaly, _ = solve_kepler_array(self.eccentricity, mean_anomaly, tolerance=self.tolerance)
+        rate = self.mean_motion / (1.0 - self.eccentricity * numpy.cos(eccentric_anomaly))
+        x = -self.semi_major_axis * numpy.sin(eccentric_anomaly) * rate
+        y = self.semi_minor_axis * numpy.cos(eccentric_anomaly) * rate
+        return numpy.multiply.outer(x, tuple(self.p)) + numpy.multiply.outer(y, tuple(self.q))
+
+
+def hermite(p0, m0, p1, m1, s, out=None):
+    """
+    Interpolates between two samples with a cubic Hermite spline
+
+    :param p0: Positions at the first samples as (..., 3) array
+    :type p0: :class:`numpy.ndarray`
+    :param m0: Velocities at the first samples scaled to the sample interval
+    :type m0: :class:`numpy.ndarray`
+    :param p1: Positions at the second samples
+    :type p1: :class:`numpy.ndarray`
+    :param m1: Velocities at the second samples scaled to the sample interval
+    :type m1: :class:`numpy.ndarray`
+    :param s: Position between the samples from 0 to 1 as (..., 1) array or float
+    :type s: :class:`numpy.ndarray`, float
+    :param out: Optional array to write the positions into
+    :type out: :class:`numpy.ndarray`
+    :return: Interpolated positions
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    s2 = s * s
+    s3 = s2 * s
+    out = numpy.multiply(p0, 2 * s3 - 3 * s2 + 1, out=out)
+    out += m0 * (s3 - 2 * s2 + s)
+    out += p1 * (3 * s2 - 2 * s3)
+    out += m1 * (s3 - s2)
+    return out
+
+
+class TabulatedOrbit(Orbit):
+    """
+    Serves the positions of another orbit from a lookup table. The orbit is sampled once over one orbital period
+    and positions are interpolated with cubic Hermite splines from the sampled positions and velocities.
+    The table is doubled in size until the interpolation error stays below the tolerance. The table is built the first time it is used and again once the elements of the tabulated orbit changed.
+
+    :var orbit: Orbit that gets tabulated
+    :type orbit: :class:`Orbit`
+    :var tolerance: Maximum distance between the interpolated and the calculated position
+    :type tolerance: float
+    :var min_steps: Minimum number of samples
+    :type min_steps: int
+    :var max_steps: Maximum number of samples, the tolerance might not be met with that many
+    :type max_steps: int
+    :var steps: Number of samples in the table
+    :type steps: int
+    :var error: Largest interpolation error measured while building the table
+    :type error: float
+    :var positions: Sampled positions as (steps, 3) array
+    :type positions: :class:`numpy.ndarray`
+    :var velocities: Sampled velocities scaled to the sample interval as (steps, 3) array
+    :type velocities: :class:`numpy.ndarray`
+    """
+
+    elements = ("orbit", "tolerance", "min_steps", "max_steps")
+
+    def __init__(self, orbit, tolerance=0.001, min_steps=64, max_steps=65536):
+        """
+        Creates a lookup table for the given orbit
+
+        :param orbit: Orbit to tabulate
+        :type orbit: :class:`Orbit`
+        :param tolerance: Maximum distance between the interpolated and the calculated position
+        :type tolerance: float
+        :param min_steps: Minimum number of samples
+        :type min_steps: int
+        :param max_steps: Maximum number of samples
+        :type max_steps: int
+        """
+
+        super().__init__()
+        self.orbit = orbit
+        self.tolerance = tolerance
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.steps = 0
+        self.error = 0.0
+        self.positions = numpy.zeros((0, 3))
+        self.velocities = numpy.zeros((0, 3))
+        self._positions = None
+        self._velocities = None
+        self._orbit_version = None
+
+    @property
+    def compiled(self):
+        # the table is stale as well when the tabulated orbit changed, no matter who compiled it since
+        return self._compiled and self._orbit_version == self.orbit.version
+
+    @compiled.setter
+    def compiled(self, compiled):
+        self._compiled = compiled
+
+    @property
+    def orbital_period(self):
+        return self.orbit.orbital_period
+
+    def post_init(self):
+        # the table is built when it is used, bodies that are not calculated from it do not need it
+        self.orbit.post_init()
+
+    def compile(self):
+        if not self.orbit.compiled:
+            self.orbit.compile()
+
+        steps = self.min_steps
+        while True:
+            step = self.orbital_period / steps
+            times = numpy.arange(steps) * step
+            positions = self.orbit.calculate_array(times)
+            # scale the velocities to the sample interval, that is what the hermite basis expects
+            velocities = self.orbit.velocity_array(times) * step
+            # the error is largest between two samples, so check it there
+            middle = hermite(positions, velocities, numpy.roll(positions, -1, axis=0), numpy.roll(velocities, -1, axis=0), 0.5)
+            error = middle - self.orbit.calculate_array(times + 0.5 * step)
+            error = float(numpy.sqrt((error * error).sum(axis=1)).max())
+            if error <= self.tolerance or steps >= self.max_steps:
+                break
+            steps *= 2
+
+        self.set_table(positions, velocities, error)
+
+    def set_table(self, positions, velocities, error):
+        """
+        Sets the table sampled from the current elements of the tabulated orbit, afterwards the orbit is compiled
+
+        :param positions: Positions at evenly spaced times over one orbital period as (steps, 3) array
+        :type positions: :class:`numpy.ndarray`
+        :param velocities: Velocities at the same times scaled to the sample interval as (steps, 3) array
+        :type velocities: :class:`numpy.ndarray`
+        :param error: Largest interpolation error of the table
+        :type error: float
+        """
+
+        self.steps = len(positions)
+        self.positions = positions
+        self.velocities = velocities
+        self.error = error
+        self._step = self.orbital_period / self.steps
+        # the scalar interpolation is faster on lists, they are only created when it is used
+        self._positions = None
+        self._velocities = None
+        self._orbit_version = self.orbit.version
+        super().compile()
+
+    def _interpolate(self, time):
+        """
+        Interpolate the position at the given time from the table
+
+        :param time: Delta Time
+        :type time: float
+        :return: position
+        :rtype: :class:`euclid.Vector3`
+        """
+
+        if self._positions is None:
+            self._positions = self.positions.tolist()
+            self._velocities = self.velocities.tolist()
+        steps = self.steps
+        phase = (time % self.orbital_period) / self._step
+        i = int(phase) % steps
+        j = (i + 1) % steps
+        s = phase - int(phase)
+        s2 = s * s
+        s3 = s2 * s
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = s3 - 2 * s2 + s
+        h01 = 3 * s2 - 2 * s3
+        h11 = s3 - s2
+        p0 = self._positions[i]
+        m0 = self._velocities[i]
+        p1 = self._positions[j]
+        m1 = self._velocities[j]
+        return Vector3(h00 * p0[0] + h10 * m0[0] + h01 * p1[0] + h11 * m1[0],
+                       h00 * p0[1] + h10 * m0[1] + h01 * p1[1] + h11 * m1[1],
+                       h00 * p0[2] + h10 * m0[2] + h01 * p1[2] + h11 * m1[2])
+
+    def calculate(self, time):
+        if not self.compiled:
+            self.compile()
+        return self._interpolate(time)
+
+    def velocity(self, time):
+        return self.orbit.velocity(time)
+
+    def velocity_array(self, times):
+        return self.orbit.velocity_array(times)
+
+    def plot(self, steps):
+        return self.orbit.plot(steps)
+
+    def plot_point(self, fraction):
+        return self.orbit.plot_point(fraction)
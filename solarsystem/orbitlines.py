@@ -0,0 +1,238 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import ctypes
+
+import numpy
+from euclid import Vector3
+from pyglet.gl import *
+from solarsystem.renderer import pixels_per_unit
+from util import auto_str
+from util.shader import Shader
+
+_vertex_shader = """
+#version 120
+
+uniform mat4 mvp;
+uniform vec3 offsets[%d];
+
+attribute vec3 vertex;
+attribute vec3 color;
+attribute float orbit;
+
+varying vec3 line_color;
+
+void main() {
+    gl_Position = mvp * vec4(vertex + offsets[int(orbit)], 1.0);
+    line_color = color;
+}
+"""
+
+_fragment_shader = """
+#version 120
+
+varying vec3 line_color;
+
+void main() {
+    gl_FragColor = vec4(line_color, 1.0);
+}
+"""
+
+_attributes = {"vertex": 0, "color": 1, "orbit": 2}
+
+
+@auto_str
+class OrbitLines(object):
+    """
+    Draws the plotted orbits of all bodies from one shared vertex buffer. Every orbit is a range of the buffer
+    relative to its parent, the positions of the parents are passed to the shader as uniform array.
+    The orbits are drawn in chunks of as many orbits as fit into that array, with one glMultiDrawArrays call
+    per chunk. Hidden and culled orbits are left out of the ranges, nothing has to be uploaded again.
+
+    :var bodies: Bodies the orbits are drawn for
+    :type bodies: list
+    :var parents: Index of the parent of every orbit in the position array passed to draw, -1 if it has none
+    :type parents: :class:`numpy.ndarray`
+    :var first: First vertex of every orbit in the buffer
+    :type first: :class:`numpy.ndarray`
+    :var count: Number of vertices of every orbit
+    :type count: :class:`numpy.ndarray`
+    :var radius: Distance of the point of every orbit farthest from the parent
+    :type radius: :class:`numpy.ndarray`
+    :var line_width: Width of the lines in pixels
+    :type line_width: float
+    """
+
+    def __init__(self, bodies, line_width=1.25):
+        """
+        Plots the orbits of the bodies that are drawn one by one, the OpenGL resources are created
+        when the orbits are drawn the first time
+
+        :param bodies: All bodies in the order of the position array passed to draw
+        :type bodies: list
+        :param line_width: Width of the lines in pixels
+        :type line_width: float
+        """
+
+        indices = {id(body): i for i, body in enumerate(bodies)}
+        self.bodies = [body for body in bodies if hasattr(body, "orbit") and body.renderer is not None and not body.instanced]
+        self.parents = numpy.array([-1 if body.parent is None else indices[id(body.parent)] for body in self.bodies], dtype=numpy.int64)
+        self.line_width = line_width
+
+        self._shader = None
+        self._buffer = None
+        self._chunk_size = 0
+        self._offsets = None
+        self._set_lines([body.plot_orbit() for body in self.bodies])
+
+    def _set_lines(self, lines):
+        """
+        Replaces the plotted orbits, they are uploaded before they are drawn the next time
+
+        :param lines: Flat x, y and z of the points of every orbit
+        :type lines: list
+        """
+
+        lines = [numpy.array(line, dtype=numpy.float32).reshape(-1, 3) for line in lines]
+        self.count = numpy.array([len(line) for line in lines], dtype=numpy.int32)
+        self.first = numpy.zeros(len(lines), dtype=numpy.int32)
+        self.first[1:] = numpy.cumsum(self.count)[:-1]
+        self.radius = numpy.array([numpy.sqrt((line ** 2).sum(axis=1)).max() if len(line) else 0.0 for line in lines])
+        self._lines = lines
+
+    def _create(self):
+        """
+        Compiles the shader
+        """
+
+        # every vec3 takes up a vec4 slot on most hardware, keep some room for the matrix
+        max_components = GLint()
+        glGetIntegerv(GL_MAX_VERTEX_UNIFORM_COMPONENTS, ctypes.byref(max_components))
+        self._chunk_size = max(1, min(256, (max_components.value - 64) // 4))
+        self._shader = Shader(_vertex_shader % self._chunk_size, _fragment_shader, _attributes)
+        self._offsets = numpy.zeros((self._chunk_size, 3), dtype=numpy.float32)
+
+    def _upload(self):
+        """
+        Uploads the vertices of all orbits to the GPU
+        """
+
+        # vertex, color and orbit index in its chunk interleaved
+        vertices = numpy.empty((int(self.count.sum()), 7), dtype=numpy.float32)
+        for i, (body, line) in enumerate(zip(self.bodies, self._lines)):
+            part = vertices[self.first[i]:self.first[i] + self.count[i]]
+            part[:, 0:3] = line
+            part[:, 3:6] = (body.color["r"] / 255.0, body.color["g"] / 255.0, body.color["b"] / 255.0)
+            part[:, 6] = i % self._chunk_size
+        self._lines = None
+
+        if self._buffer is None:
+            buffer = GLuint()
+            glGenBuffers(1, ctypes.byref(buffer))
+            self._buffer = buffer.value
+        glBindBuffer(GL_ARRAY_BUFFER, self._buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices.ctypes.data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def refine(self, matrix, positions, tolerance=0.5):
+        """
+        Plots all orbits again for the current view, so no orbit is further than the tolerance in pixels from its
+        plotted line on screen. Orbits close to the camera get more points, orbits far away or behind it fewer.
+
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        :param positions: Positions of all bodies as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        :param tolerance: Maximum distance between line and orbit on screen in pixels
+        :type tolerance: float
+        """
+
+        lines = []
+        for body, center in zip(self.bodies, self.parent_positions(positions).tolist()):
+            def scale(point, center=Vector3(*center)):
+                return pixels_per_unit(matrix, point + center)
+
+            lines.append(body.plot_orbit(tolerance, scale=scale))
+        self._set_lines(lines)
+
+    def visible(self, positions, frustum=None):
+        """
+        Get the orbits that are drawn and inside the view frustum
+
+        :param positions: Positions of all bodies as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        :param frustum: View frustum, None to not cull the orbits
+        :type frustum: :class:`util.frustum.Frustum`, None
+        :return: Boolean array with one entry per orbit
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        visible = numpy.fromiter((body.draw_orbit for body in self.bodies), dtype=bool, count=len(self.bodies))
+        if frustum is not None and len(self.bodies):
+            visible &= frustum.intersects_spheres(self.parent_positions(positions), self.radius)
+        return visible
+
+    def parent_positions(self, positions):
+        """
+        Get the position of the parent of every orbit
+
+        :param positions: Positions of all bodies as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        :return: Positions of the parents as (orbits, 3) array, 0 for orbits without parent
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        centers = positions[numpy.maximum(self.parents, 0)]
+        centers[self.parents < 0] = 0
+        return centers
+
+    def draw(self, matrix, positions, frustum=None):
+        """
+        Draws all visible orbits
+
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        :param positions: Positions of all bodies as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        :param frustum: View frustum to cull the orbits against, None to draw all of them
+        :type frustum: :class:`util.frustum.Frustum`, None
+        """
+
+        visible = self.visible(positions, frustum)
+        if not visible.any():
+            return
+        if self._shader is None:
+            self._create()
+        if self._lines is not None:
+            self._upload()
+        centers = self.parent_positions(positions)
+
+        self._shader.bind()
+        self._shader.set_uniform_matrix("mvp", matrix)
+        glLineWidth(self.line_width)
+        glBindBuffer(GL_ARRAY_BUFFER, self._buffer)
+        # (location, size, offset)
+        attributes = ((0, 3, 0), (1, 3, 12), (2, 1, 24))
+        for location, size, offset in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, 28, ctypes.c_void_p(offset))
+
+        for start in range(0, len(self.bodies), self._chunk_size):
+            end = min(start + self._chunk_size, len(self.bodies))
+            chunk = numpy.flatnonzero(visible[start:end])
+            if not len(chunk):
+                continue
+            self._offsets[:end - start] = centers[start:end]
+            self._shader.set_uniform_vec3_array("offsets", self._offsets[:end - start])
+            first = numpy.ascontiguousarray(self.first[start + chunk])
+            count = numpy.ascontiguousarray(self.count[start + chunk])
+            glMultiDrawArrays(GL_LINE_LOOP, first.ctypes.data_as(ctypes.POINTER(GLint)),
+                              count.ctypes.data_as(ctypes.POINTER(GLsizei)), len(chunk))
+
+        for location, _, _ in attributes:
+            glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._shader.unbind()
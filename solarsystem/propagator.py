@@ -0,0 +1,556 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+from abc import ABCMeta, abstractmethod
+from euclid import Vector3
+from solarsystem.orbit import Orbit, CircularOrbit, EllipticOrbit, TabulatedOrbit, hermite
+from util import auto_str
+from util.orbitalcalculations import solve_kepler_array, kepler_tolerance, tau
+
+
+@auto_str
+class OrbitBatch(object, metaclass=ABCMeta):
+    """
+    An abstract class for propagating many orbits of the same type at once. The orbital elements are stored in
+    contiguous arrays and collected again when an element of any orbit changed.
+
+    The time passed to calculate can be a single time or an array of times. For an array of shape S the
+    positions are returned as array of shape S + (N, 3).
+
+    :var orbits: Orbits in this batch
+    :type orbits: list
+    :var p: Perifocal p vectors of the orbits as (N, 3) array
+    :type p: :class:`numpy.ndarray`
+    :var q: Perifocal q vectors of the orbits as (N, 3) array
+    :type q: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, orbits):
+        """
+        Creates a new batch from the given orbits
+
+        :param orbits: Orbits to propagate
+        :type orbits: list
+        """
+
+        self.orbits = list(orbits)
+        self._collect()
+
+    def __len__(self):
+        return len(self.orbits)
+
+    def _collect(self):
+        """
+        Compiles changed orbits and collects their elements into the arrays
+        """
+
+        for orbit in self.orbits:
+            if not orbit.compiled:
+                orbit.compile()
+        self._revision = Orbit.revision
+
+        self.p = numpy.array([(orbit.p.x, orbit.p.y, orbit.p.z) for orbit in self.orbits], dtype=numpy.float64).reshape(-1, 3)
+        self.q = numpy.array([(orbit.q.x, orbit.q.y, orbit.q.z) for orbit in self.orbits], dtype=numpy.float64).reshape(-1, 3)
+        self.collect_elements()
+
+    @abstractmethod
+    def collect_elements(self):
+        """
+        Collect the elements needed by perifocal into arrays
+        """
+
+        pass
+
+    def _elements(self, name):
+        """
+        Collects the given element of every orbit into a contiguous array
+
+        :param name: Name of the element
+        :type name: str
+        :return: Array with one entry per orbit
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        return numpy.array([getattr(orbit, name) for orbit in self.orbits], dtype=numpy.float64)
+
+    def calculate(self, time, out=None):
+        """
+        Calculate the positions of all orbits at the given time
+
+        :param time: Delta Time or array of them
+        :type time: float, :class:`numpy.ndarray`
+        :param out: Optional array to write the positions into
+        :type out: :class:`numpy.ndarray`
+        :return: Positions as (N, 3) array, or one (N, 3) array per time
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        return self.calculate_orbits(numpy.asarray(time, dtype=numpy.float64)[..., None], out=out)
+
+    def calculate_orbits(self, times, out=None):
+        """
+        Calculate the positions of the orbits at times that can differ from orbit to orbit
+
+        :param times: Array of times, broadcastable against the orbits in the last axis
+        :type times: :class:`numpy.ndarray`
+        :param out: Optional array to write the positions into
+        :type out: :class:`numpy.ndarray`
+        :return: Positions as array with the broadcast shape of times and the orbits and 3 more entries in the last axis
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        if self._revision != Orbit.revision:
+            self._collect()
+        times = numpy.asarray(times, dtype=numpy.float64)
+        if out is None:
+            out = numpy.empty(numpy.broadcast_shapes(times.shape, (len(self.orbits),)) + (3,), dtype=numpy.float64)
+
+        x, y = self.perifocal(times)
+
+        # rotate into the ecliptic with the precomputed p and q vectors
+        numpy.multiply(self.p, x[..., None], out=out)
+        out += self.q * y[..., None]
+        return out
+
+    def sample_orbits(self, times):
+        """
+        Calculate the positions and velocities of the orbits at times that can differ from orbit to orbit
+
+        :param times: Array of times, broadcastable against the orbits in the last axis
+        :type times: :class:`numpy.ndarray`
+        :return: Positions and velocities per second, both like the positions of :meth:`calculate_orbits`
+        :rtype: tuple
+        """
+
+        if self._revision != Orbit.revision:
+            self._collect()
+        x, y, vx, vy = self.perifocal(numpy.asarray(times, dtype=numpy.float64), velocity=True)
+        return self.p * x[..., None] + self.q * y[..., None], self.p * vx[..., None] + self.q * vy[..., None]
+
+    @abstractmethod
+    def perifocal(self, time, velocity=False):
+        """
+        Calculate the positions along the p and q vectors
+
+        :param time: Array of times, broadcastable against the orbits
+        :type time: :class:`numpy.ndarray`
+        :param velocity: Calculate the velocities along the p and q vectors as well
+        :type velocity: bool
+        :return: p and q coordinates, followed by the p and q velocities per second if velocity is True
+        :rtype: tuple
+        """
+
+        pass
+
+
+class EllipticOrbitBatch(OrbitBatch):
+    """
+    Propagates many elliptic orbits at once, Kepler's equation is solved for every orbit in a single NumPy pass.
+
+    :var semi_major_axis: Semi-major axes
+    :type semi_major_axis: :class:`numpy.ndarray`
+    :var semi_minor_axis: Semi-minor axes
+    :type semi_minor_axis: :class:`numpy.ndarray`
+    :var eccentricity: Eccentricities
+    :type eccentricity: :class:`numpy.ndarray`
+    :var longtitude_ascending_node: Longtitudes of the ascending node in radians
+    :type longtitude_ascending_node: :class:`numpy.ndarray`
+    :var argument_of_periapsis: Arguments of the periapsis in radians
+    :type argument_of_periapsis: :class:`numpy.ndarray`
+    :var inclination: Inclinations in radians
+    :type inclination: :class:`numpy.ndarray`
+    :var initial_mean_anomaly: Initial mean anomalies at J.2000 in radians
+    :type initial_mean_anomaly: :class:`numpy.ndarray`
+    :var mean_motion: Mean motions in radians per second
+    :type mean_motion: :class:`numpy.ndarray`
+    :var multiplier: Position multipliers
+    :type multiplier: :class:`numpy.ndarray`
+    :var tolerance: Maximum residual of Kepler's equation
+    :type tolerance: float
+    :var iterations: Iterations the Kepler solver needed for every orbit in the last calculation
+    :type iterations: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, orbits, tolerance=kepler_tolerance):
+        """
+        Creates a new batch from the given orbits
+
+        :param orbits: Orbits to propagate
+        :type orbits: list
+        :param tolerance: Maximum residual of Kepler's equation
+        :type tolerance: float
+        """
+
+        self.tolerance = tolerance
+        self.iterations = numpy.zeros(len(orbits), dtype=numpy.int32)
+        super().__init__(orbits)
+
+    def collect_elements(self):
+        self.semi_major_axis = self._elements("semi_major_axis")
+        self.semi_minor_axis = self._elements("semi_minor_axis")
+        self.eccentricity = self._elements("eccentricity")
+        self.longtitude_ascending_node = self._elements("longtitude_ascending_node")
+        self.argument_of_periapsis = self._elements("argument_of_periapsis")
+        self.inclination = self._elements("inclination")
+        self.initial_mean_anomaly = self._elements("initial_mean_anomaly")
+        self.mean_motion = self._elements("mean_motion")
+        self.multiplier = self._elements("multiplier")
+
+    def perifocal(self, time, velocity=False):
+        e = self.eccentricity
+        mean_anomaly = self.initial_mean_anomaly + self.mean_motion * time
+        eccentric_anomaly, self.iterations = solve_kepler_array(e, mean_anomaly, tolerance=self.tolerance)
+        cos_anomaly = numpy.cos(eccentric_anomaly)
+        sin_anomaly = numpy.sin(eccentric_anomaly)
+        x = self.semi_major_axis * (cos_anomaly - e)
+        y = self.semi_minor_axis * sin_anomaly
+        if not velocity:
+            return x, y
+        # derivative of the eccentric anomaly from Kepler's equation
+        rate = self.mean_motion / (1.0 - e * cos_anomaly)
+        return x, y, -self.semi_major_axis * sin_anomaly * rate, self.semi_minor_axis * cos_anomaly * rate
+
+
+class CircularOrbitBatch(OrbitBatch):
+    """
+    Propagates many circular orbits at once
+
+    :var orbital_period: Orbital periods in seconds
+    :type orbital_period: :class:`numpy.ndarray`
+    """
+
+    def collect_elements(self):
+        self.orbital_period = self._elements("orbital_period")
+
+    def perifocal(self, time, velocity=False):
+        angle = tau * (numpy.remainder(time, self.orbital_period) / self.orbital_period)
+        cos_angle = numpy.cos(angle)
+        sin_angle = numpy.sin(angle)
+        if not velocity:
+            return cos_angle, sin_angle
+        angular_velocity = tau / self.orbital_period
+        return cos_angle, sin_angle, -sin_angle * angular_velocity, cos_angle * angular_velocity
+
+
+# batch of every orbit type that is propagated in batches
+_batch_types = {EllipticOrbit: EllipticOrbitBatch, CircularOrbit: CircularOrbitBatch}
+
+
+@auto_str
+class TabulatedOrbitBatch(object):
+    """
+    Interpolates many tabulated orbits at once. The tables of all orbits are concatenated into one array,
+    for every orbit the two samples around the time are gathered and interpolated in a single Hermite step.
+    The tables are collected again when an element of any orbit changed.
+
+    :var orbits: Tabulated orbits in this batch
+    :type orbits: list
+    :var orbital_period: Orbital periods in seconds
+    :type orbital_period: :class:`numpy.ndarray`
+    :var steps: Number of samples of every orbit
+    :type steps: :class:`numpy.ndarray`
+    :var step: Time between two samples of every orbit
+    :type step: :class:`numpy.ndarray`
+    :var offsets: Index of the first sample of every orbit in the concatenated tables
+    :type offsets: :class:`numpy.ndarray`
+    :var positions: Sampled positions of all orbits as (M, 3) array
+    :type positions: :class:`numpy.ndarray`
+    :var velocities: Sampled velocities of all orbits scaled to their sample interval as (M, 3) array
+    :type velocities: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, orbits):
+        """
+        Creates a new batch from the given orbits, their tables are built if they are not yet
+
+        :param orbits: Tabulated orbits to interpolate
+        :type orbits: list
+        """
+
+        self.orbits = list(orbits)
+        self._collect()
+
+    def __len__(self):
+        return len(self.orbits)
+
+    def _collect(self):
+        """
+        Builds changed tables and concatenates all of them
+        """
+
+        build_tables([orbit for orbit in self.orbits if not orbit.compiled])
+        self._revision = Orbit.revision
+
+        self.orbital_period = numpy.array([orbit.orbital_period for orbit in self.orbits], dtype=numpy.float64)
+        self.steps = numpy.array([orbit.steps for orbit in self.orbits], dtype=numpy.int64)
+        self.step = self.orbital_period / numpy.maximum(self.steps, 1)
+        self.offsets = numpy.cumsum(self.steps) - self.steps
+        self.positions = numpy.concatenate([orbit.positions for orbit in self.orbits]).reshape(-1, 3)
+        self.velocities = numpy.concatenate([orbit.velocities for orbit in self.orbits]).reshape(-1, 3)
+
+    def calculate(self, time, out=None):
+        """
+        Interpolate the positions of all orbits at the given time
+
+        :param time: Delta Time or array of them
+        :type time: float, :class:`numpy.ndarray`
+        :param out: Optional array to write the positions into
+        :type out: :class:`numpy.ndarray`
+        :return: Positions as (N, 3) array, or one (N, 3) array per time
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        if self._revision != Orbit.revision:
+            self._collect()
+        time = numpy.asarray(time, dtype=numpy.float64)
+
+        phase = numpy.remainder(time[..., None], self.orbital_period) / self.step
+        sample = numpy.floor(phase)
+        s = (phase - sample)[..., None]
+        # the remainder can round up to a whole period
+        sample = numpy.minimum(sample.astype(numpy.int64), self.steps - 1)
+        following = numpy.where(sample + 1 == self.steps, 0, sample + 1) + self.offsets
+        sample += self.offsets
+        return hermite(self.positions[sample], self.velocities[sample], self.positions[following], self.velocities[following], s, out=out)
+
+
+def build_tables(orbits):
+    """
+    Builds the tables of many tabulated orbits at once like :meth:`solarsystem.orbit.TabulatedOrbit.compile` does.
+    The tabulated orbits are sampled together with an :class:`OrbitBatch` of their type, all tables with the same
+    number of samples are built in one pass. Orbits of other types build their tables one by one.
+
+    :param orbits: Tabulated orbits
+    :type orbits: list
+    """
+
+    groups = {}
+    for orbit in orbits:
+        if type(orbit.orbit) in _batch_types:
+            groups.setdefault(type(orbit.orbit), []).append(orbit)
+        else:
+            orbit.compile()
+
+    for orbit_type, group in groups.items():
+        # samples of every orbit by the number of samples, None if the orbit was not sampled with that many yet
+        pending = {}
+        for orbit in group:
+            pending.setdefault(orbit.min_steps, []).append((orbit, None, None))
+        while pending:
+            steps = min(pending)
+            entries = pending.pop(steps)
+            tabulated = [orbit for orbit, _, _ in entries]
+            period = numpy.array([orbit.orbital_period for orbit in tabulated], dtype=numpy.float64)
+            step = period / steps
+            times = numpy.arange(steps, dtype=numpy.float64)[:, None] * step
+
+            positions = numpy.empty((steps, len(entries), 3))
+            velocities = numpy.empty((steps, len(entries), 3))
+            fresh = [i for i, (_, samples, _) in enumerate(entries) if samples is None]
+            if fresh:
+                batch = _batch_types[orbit_type]([tabulated[i].orbit for i in fresh])
+                positions[:, fresh], velocities[:, fresh] = batch.sample_orbits(times[:, fresh])
+            for i, (_, samples, sample_velocities) in enumerate(entries):
+                if samples is not None:
+                    positions[:, i] = samples
+                    velocities[:, i] = sample_velocities
+
+            # the error is largest between two samples, so check it there, those are the samples added when doubling
+            batch = _batch_types[orbit_type]([orbit.orbit for orbit in tabulated])
+            middle_positions, middle_velocities = batch.sample_orbits(times + 0.5 * step)
+            # scale the velocities to the sample interval, that is what the hermite basis expects
+            scaled = velocities * step[:, None]
+            middle = hermite(positions, scaled, numpy.roll(positions, -1, axis=0), numpy.roll(scaled, -1, axis=0), 0.5)
+            middle -= middle_positions
+            errors = numpy.sqrt((middle * middle).sum(axis=2)).max(axis=0)
+            for i, orbit in enumerate(tabulated):
+                if errors[i] <= orbit.tolerance or steps >= orbit.max_steps:
+                    orbit.set_table(positions[:, i].copy(), scaled[:, i].copy(), float(errors[i]))
+                elif steps * 2 <= orbit.max_steps:
+                    samples = numpy.empty((steps * 2, 3))
+                    samples[0::2] = positions[:, i]
+                    samples[1::2] = middle_positions[:, i]
+                    sample_velocities = numpy.empty((steps * 2, 3))
+                    sample_velocities[0::2] = velocities[:, i]
+                    sample_velocities[1::2] = middle_velocities[:, i]
+                    pending.setdefault(steps * 2, []).append((orbit, samples, sample_velocities))
+                else:
+                    pending.setdefault(orbit.max_steps, []).append((orbit, None, None))
+
+
+@auto_str
+class Propagator(object):
+    """
+    Updates all bodies of the system in a single pass. First the position of every body relative to its parent
+    is calculated, bodies on elliptic and circular orbits together with an :class:`OrbitBatch` per orbit type
+    and bodies on tabulated orbits together with a :class:`TabulatedOrbitBatch`.
+    Then the positions are added up level by level of the body tree, so every body ends up relative to the
+    same frame no matter in which order the bodies were given. If all bodies are in the same
+    :class:`solarsystem.bodystore.BodyStore`, their state is written into it at once without calling their update.
+
+    :var bodies: All bodies of the system
+    :type bodies: list
+    :var parents: Index of the parent of every body, -1 if it has none
+    :type parents: :class:`numpy.ndarray`
+    :var depths: Depth of every body in the body tree
+    :type depths: :class:`numpy.ndarray`
+    :var levels: Indices of the bodies that are moved with their parent, one array per depth
+    :type levels: list
+    :var positions: Position of every body in the system from the last update
+    :type positions: :class:`numpy.ndarray`
+    :var cache: Cache for the positions while time is paused or scrubbed slowly, the positions and rotations are
+                calculated for the quantized times of the cache then
+    :type cache: :class:`solarsystem.ephemeris.EphemerisCache`, None
+    """
+
+    def __init__(self, bodies, cache=None):
+        """
+        Creates a new propagator for the given bodies
+
+        :param bodies: Bodies to update, post_init has to be called on them before
+        :type bodies: list
+        :param cache: Cache for the positions, None to calculate them on every update
+        :type cache: :class:`solarsystem.ephemeris.EphemerisCache`, None
+        """
+
+        self.bodies = list(bodies)
+        self.cache = cache
+        self._revision = Orbit.revision
+        self._last_key = None
+        self._cached_key = None
+        indices = {id(body): i for i, body in enumerate(self.bodies)}
+        self.parents = numpy.array([-1 if body.parent is None else indices[id(body.parent)] for body in self.bodies], dtype=numpy.int64)
+        self.depths = numpy.zeros(len(self.bodies), dtype=numpy.int64)
+        for i in range(len(self.bodies)):
+            parent = self.parents[i]
+            while parent >= 0:
+                self.depths[i] += 1
+                if self.depths[i] > len(self.bodies):
+                    raise ValueError("body " + self.bodies[i].name + " has a parent cycle")
+                parent = self.parents[parent]
+
+        batched = {EllipticOrbit: [], CircularOrbit: [], TabulatedOrbit: []}
+        self._orbiting = []
+        self._stationary = []
+        for i, body in enumerate(self.bodies):
+            orbit = getattr(body, "orbit", None)
+            # calculating a circular orbit is faster than interpolating it and exact
+            if type(orbit) is TabulatedOrbit and type(orbit.orbit) is CircularOrbit:
+                orbit = orbit.orbit
+            if type(orbit) in batched:
+                batched[type(orbit)].append((i, orbit))
+            elif orbit is not None:
+                self._orbiting.append(i)
+            else:
+                self._stationary.append(i)
+        self._moving = numpy.array(sorted([i for orbits in batched.values() for i, _ in orbits] + self._orbiting), dtype=numpy.int64)
+        self._batches = []
+        for orbit_type, batch_type in ((EllipticOrbit, EllipticOrbitBatch), (CircularOrbit, CircularOrbitBatch), (TabulatedOrbit, TabulatedOrbitBatch)):
+            if batched[orbit_type]:
+                batch_indices, orbits = zip(*batched[orbit_type])
+                self._batches.append((numpy.array(batch_indices, dtype=numpy.int64), batch_type(orbits)))
+
+        # stationary bodies keep their position, only orbiting bodies move with their parent
+        moved = numpy.zeros(len(self.bodies), dtype=bool)
+        moved[self._moving] = True
+        moved &= self.parents >= 0
+        self.levels = [numpy.flatnonzero(moved & (self.depths == depth)) for depth in range(1, self.depths.max(initial=0) + 1)]
+
+        self.positions = numpy.zeros((len(self.bodies), 3), dtype=numpy.float64)
+
+        stores = {id(body.store): body.store for body in self.bodies}
+        self._store = next(iter(stores.values())) if len(stores) == 1 else None
+        self._store_indices = numpy.array([body.store_index for body in self.bodies], dtype=numpy.int64)
+
+    def ephemeris(self, times, out=None):
+        """
+        Calculate the positions of all bodies at the given times without updating the bodies
+
+        :param times: Delta Times
+        :type times: :class:`numpy.ndarray`
+        :param out: Optional (T, N, 3) array to write the positions into
+        :type out: :class:`numpy.ndarray`
+        :return: Positions of all bodies as (T, N, 3) array
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        if out is None:
+            out = numpy.empty(times.shape + (len(self.bodies), 3), dtype=numpy.float64)
+
+        for indices, batch in self._batches:
+            out[..., indices, :] = batch.calculate(times)
+
+        for index in numpy.ndindex(times.shape):
+            time = float(times[index])
+            for i in self._orbiting:
+                pos = self.bodies[i].orbit.calculate(time)
+                out[index + (i,)] = (pos.x, pos.y, pos.z)
+        for i in self._stationary:
+            pos = self.bodies[i].xyz
+            out[..., i, :] = (pos.x, pos.y, pos.z)
+
+        for level in self.levels:
+            out[..., level, :] += out[..., self.parents[level], :]
+        return out
+
+    def calculate(self, time):
+        """
+        Calculate the positions of all bodies into positions without updating the bodies
+
+        :param time: Delta Time
+        :type time: float
+        """
+
+        self.ephemeris(time, out=self.positions)
+
+    def update(self, time):
+        """
+        Update all bodies (Calculate current orbit positions). When the positions come from the cache, the bodies
+        are updated to the time of the cache slot instead, so their positions and rotations belong to the same time.
+
+        :param time: Delta Time
+        :type time: float
+        """
+
+        if self.cache is None:
+            self.calculate(time)
+        else:
+            # positions calculated with old orbital elements are not valid anymore
+            if self._revision != Orbit.revision:
+                self.cache.clear()
+                self._revision = Orbit.revision
+                self._cached_key = None
+            key = self.cache.key(time)
+            if key == self._cached_key:
+                # paused, the positions of the time slot are still there
+                time = self.cache.time(key)
+            elif self.cache.usable(key, self._last_key):
+                time = self.cache.time(key)
+                snapshot = self.cache.get(key)
+                if snapshot is None:
+                    self.calculate(time)
+                    self.cache.put(key, self.positions)
+                else:
+                    self.positions[:] = snapshot
+                self._cached_key = key
+            else:
+                # during playback every update is a new time, caching it would only copy the positions
+                self.calculate(time)
+                self._cached_key = None
+            self._last_key = key
+
+        moving = self._moving
+        if self._store is not None:
+            # all bodies are in one store, their state is written at once instead of calling update on every body
+            self._store.positions[self._store_indices[moving]] = self.positions[moving]
+            self._store.update_rotations(time, self._store_indices)
+            return
+        for i, (x, y, z) in zip(moving.tolist(), self.positions[moving].tolist()):
+            self.bodies[i].update(time, position=Vector3(x, y, z))
+        for i in self._stationary:
+            self.bodies[i].update(time)
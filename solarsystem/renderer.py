@@ -4,14 +4,147 @@ Created on 1.12.2015
 :author: Rene Hollander
 """
 
+import ctypes
 import math
 
+import numpy
 from abc import ABCMeta, abstractmethod
 from euclid import Vector3
 from pyglet.gl import *
+from pyglet.gl import gl_info
 from util import auto_str, toGlMatrix
+from util.mesh import sphere_mesh, tessellate_sphere
+from util.shader import Shader
 from util.texture import Texture
 
+# levels of detail from fine to coarse as (minimum radius on screen in pixels, slices, stacks),
+# bodies that are smaller on screen than the last level are drawn as points
+lod_levels = ((48.0, 50, 50), (16.0, 32, 32), (6.0, 16, 16), (2.0, 8, 8))
+# relative margin around the thresholds, so bodies close to one do not switch the level every frame
+lod_hysteresis = 0.15
+
+# pixels per unit of length at a distance of one unit from the camera, set by set_projection
+_pixels_per_unit = 360.0
+
+# loader the textures of the bodies are decoded with, set by set_texture_loader
+_texture_loader = None
+
+# manager that streams the mipmap levels of the textures, set by set_residency_manager
+_residency_manager = None
+
+# atlas the textures of bodies marked with atlas are packed into, set by set_texture_atlas
+_texture_atlas = None
+
+
+def set_texture_loader(loader):
+    """
+    Sets the loader the textures of the bodies are decoded with in the background. Bodies are drawn in their
+    base color until their texture is ready.
+
+    :param loader: Texture loader, None to load the textures right away
+    :type loader: :class:`util.texture.TextureLoader`, None
+    """
+
+    global _texture_loader
+    _texture_loader = loader
+
+
+def set_texture_atlas(atlas):
+    """
+    Sets the atlas the textures of bodies marked with atlas are packed into. Bodies are drawn with their own
+    texture if there is no atlas or it is full.
+
+    :param atlas: Texture atlas, None to give every body its own texture
+    :type atlas: :class:`util.atlas.TextureAtlas`, None
+    """
+
+    global _texture_atlas
+    _texture_atlas = atlas
+
+
+def set_residency_manager(manager):
+    """
+    Sets the manager the size of the textures on screen is reported to, so it can stream their mipmap levels
+
+    :param manager: Residency manager, None to keep all levels resident
+    :type manager: :class:`util.residency.ResidencyManager`, None
+    """
+
+    global _residency_manager
+    _residency_manager = manager
+
+
+def set_projection(projection_matrix, viewport_height):
+    """
+    Sets the projection used to calculate the size of the bodies on screen. Has to be called when the window is resized.
+
+    :param projection_matrix: Projection matrix
+    :type projection_matrix: :class:`euclid.Matrix4`
+    :param viewport_height: Height of the viewport in pixels
+    :type viewport_height: int
+    """
+
+    global _pixels_per_unit
+    _pixels_per_unit = projection_matrix.f * viewport_height / 2.0
+
+
+def projected_radius(matrix, position, radius):
+    """
+    Calculates the approximate radius of a sphere on screen
+
+    :param matrix: Model-View-Projection matrix
+    :type matrix: :class:`euclid.Matrix4`
+    :param position: Center of the sphere
+    :type position: :class:`euclid.Vector3`
+    :param radius: Radius of the sphere
+    :type radius: float
+    :return: Radius on screen in pixels, infinite if the camera is in or behind the center of the sphere
+    :rtype: float
+    """
+
+    # w in clip space is the distance from the camera along the view direction
+    distance = matrix.m * position.x + matrix.n * position.y + matrix.o * position.z + matrix.p
+    if distance <= radius:
+        return math.inf
+    return radius * _pixels_per_unit / distance
+
+
+def pixels_per_unit(matrix, position):
+    """
+    Calculates how many pixels on screen a unit of length at the given position covers
+
+    :param matrix: Model-View-Projection matrix
+    :type matrix: :class:`euclid.Matrix4`
+    :param position: Position in the system
+    :type position: :class:`euclid.Vector3`
+    :return: Pixels per unit of length, 0 if the position is behind the camera
+    :rtype: float
+    """
+
+    distance = matrix.m * position.x + matrix.n * position.y + matrix.o * position.z + matrix.p
+    if distance <= 0:
+        return 0.0
+    return _pixels_per_unit / distance
+
+
+def select_lod(level, radius):
+    """
+    Selects the level of detail for the given radius on screen, starting from the level used before
+
+    :param level: Level used the last time, index into lod_levels
+    :type level: int
+    :param radius: Radius on screen in pixels
+    :type radius: float
+    :return: New level, len(lod_levels) if the body should be drawn as point
+    :rtype: int
+    """
+
+    while level < len(lod_levels) and radius < lod_levels[level][0] * (1.0 - lod_hysteresis):
+        level += 1
+    while level > 0 and radius >= lod_levels[level - 1][0] * (1.0 + lod_hysteresis):
+        level -= 1
+    return level
+
 
 @auto_str
 class Renderer(metaclass=ABCMeta):
@@ -19,10 +152,35 @@ class Renderer(metaclass=ABCMeta):
     An abstract class that gets inherited from all Renderer
     """
 
+    def attach(self, body):
+        """
+        Create the OpenGL resources the renderer needs for the body. Called before the body is drawn the first time
+
+        :param body: The body that will be rendered
+        :type body: :class:`solarsystem.body.Body`
+        :return: None
+        """
+
+        pass
+
+    def visible(self, body, frustum):
+        """
+        Checks if the renderer would draw anything of the body inside the view frustum
+
+        :param body: The body that will be rendered
+        :type body: :class:`solarsystem.body.Body`
+        :param frustum: View frustum
+        :type frustum: :class:`util.frustum.Frustum`
+        :return: True if the body has to be drawn, otherwise False
+        :rtype: bool
+        """
+
+        return True
+
     @abstractmethod
     def draw(self, body, matrix):
         """
-        Draw the supplied body with the specified MVP Matrix
+        Draw the supplied body with the specified MVP Matrix. Culling is up to the caller, see :meth:`visible`
 
         :param body: The body to render
         :type body: :class:`solarsystem.body.Body`
@@ -39,38 +197,68 @@ class BodyRenderer(Renderer):
     Renders the body at a fixed position given by the MVP matrix
     """
 
+    def attach(self, body):
+        if body.atlas and _texture_atlas is not None and not _texture_atlas.full:
+            body.texture = _texture_atlas.add(body.texturename, loader=_texture_loader)
+        else:
+            body.texture = Texture(body.texturename, loader=_texture_loader)
+
+    def visible(self, body, frustum):
+        return frustum.intersects_sphere(body.xyz, body.bounding_radius())
+
     def draw(self, body, matrix):
+        radius = projected_radius(matrix, body.xyz, body.radius)
+        body.lod_level = select_lod(body.lod_level, radius)
+        if body.lod_level == len(lod_levels):
+            self.draw_point(body, matrix, radius)
+            return
+
+        _, slices, stacks = lod_levels[body.lod_level]
+        body.sphere = sphere_mesh(slices, stacks)
         matrix.translate(body.xyz.x, body.xyz.y, body.xyz.z)
         matrix.rotate_axis(math.radians(-90), Vector3(1, 0, 0))
         matrix.rotate_axis(body.axial_tilt, Vector3(0, 1, 0))
         matrix.rotate_axis(math.radians(-360 * body.timefactor), Vector3(0, 0, 1))
+        matrix.scale(body.radius, body.radius, body.radius)
         glLoadMatrixd(toGlMatrix(matrix))
-        if body.draw_texture:
+        if body.draw_texture and body.texture.ready:
+            if _residency_manager is not None:
+                # the width of the texture wraps once around the equator
+                _residency_manager.request(body.texture, 2.0 * math.pi * radius)
             body.texture.draw()
         else:
             glColor3f(body.color["r"] / 255.0, body.color["g"] / 255.0, body.color["b"] / 255.0)
 
-        gluSphere(body.sphere, body.radius, 50, 50)
+        body.sphere.draw()
         glDisable(GL_TEXTURE_2D)
 
+    def draw_point(self, body, matrix, radius):
+        """
+        Draws a body that is too small on screen for a mesh as point in its color
+
+        :param body: The body to render
+        :type body: :class:`solarsystem.body.Body`
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        :param radius: Radius of the body on screen in pixels
+        :type radius: float
+        """
+
+        glLoadMatrixd(toGlMatrix(matrix))
+        glPointSize(max(1.0, 2.0 * radius))
+        glColor3f(body.color["r"] / 255.0, body.color["g"] / 255.0, body.color["b"] / 255.0)
+        glBegin(GL_POINTS)
+        glVertex3f(body.xyz.x, body.xyz.y, body.xyz.z)
+        glEnd()
+
 
 class OrbitingBodyRenderer(BodyRenderer):
     """
-    Renders the body at the current position in orbit. If :draw_orbit is true, the orbit will be plotted,
+    Renders the body at the current position in orbit. The orbit is drawn together with all other orbits
+    by :class:`solarsystem.orbitlines.OrbitLines`
     """
 
     def draw(self, body, matrix):
-        # draw the in the constructor plotted line if requested
-        if body.draw_orbit:
-            linematrix = matrix.__copy__()
-            if body.parent is not None:
-                linematrix.translate(body.parent.xyz.x, body.parent.xyz.y, body.parent.xyz.z)
-
-            glLoadMatrixd(toGlMatrix(linematrix))
-            glLineWidth(1.25)
-            glColor3f(body.color["r"] / 255.0, body.color["g"] / 255.0, body.color["b"] / 255.0)
-            body.orbit_line_batch.draw()
-
         glColor3f(1.0, 1.0, 1.0)
 
         super().draw(body, matrix)
@@ -78,12 +266,23 @@ class OrbitingBodyRenderer(BodyRenderer):
 
 class OrbitingBodyWithRingRenderer(OrbitingBodyRenderer):
     """
-    Renders the body at the current position in orbit. If :draw_orbit is true, the orbit will be plotted,
+    Renders the body at the current position in orbit together with its rings.
     The parameters for the rings are set with setup_ring_renderer
     """
 
+    def attach(self, body):
+        super().attach(body)
+        body.ring_texture = Texture(body.ring_texture_name, loader=_texture_loader)
+        body.ring_disk = gluNewQuadric()
+        gluQuadricNormals(body.ring_disk, GLU_SMOOTH)
+        gluQuadricTexture(body.ring_disk, GL_TRUE)
+
     def draw(self, body, mat):
-        if body.draw_texture:
+        # rings smaller than a few pixels are not drawn at all
+        radius = projected_radius(mat, body.xyz, body.ring_outer_radius)
+        body.ring_lod_level = select_lod(body.ring_lod_level, radius)
+        if body.draw_texture and body.ring_texture.ready and body.ring_lod_level < len(lod_levels):
+            _, slices, loops = lod_levels[body.ring_lod_level]
             matrix = mat.__copy__()
             matrix.translate(body.xyz.x, body.xyz.y, body.xyz.z)
             matrix.rotate_axis(math.radians(-90), Vector3(1, 0, 0))
@@ -91,8 +290,10 @@ class OrbitingBodyWithRingRenderer(OrbitingBodyRenderer):
             glLoadMatrixd(toGlMatrix(matrix))
             glDisable(GL_DEPTH_TEST)
             glDisable(GL_CULL_FACE)
+            if _residency_manager is not None:
+                _residency_manager.request(body.ring_texture, 2.0 * radius)
             body.ring_texture.draw()
-            gluDisk(body.ring_disk, body.ring_inner_radius, body.ring_outer_radius, 50, 50)
+            gluDisk(body.ring_disk, body.ring_inner_radius, body.ring_outer_radius, slices, loops)
             glEnable(GL_CULL_FACE)
             glEnable(GL_DEPTH_TEST)
             glDisable(GL_TEXTURE_2D)
@@ -100,9 +301,209 @@ class OrbitingBodyWithRingRenderer(OrbitingBodyRenderer):
         super().draw(body, mat)
 
 
+_instance_vertex_shader = """
+#version 120
+
+uniform mat4 mvp;
+uniform float pixels_per_unit;
+uniform float min_pixel_radius;
+
+attribute vec3 vertex;
+attribute vec3 offset;
+attribute float radius;
+attribute vec3 color;
+
+varying vec3 body_color;
+
+void main() {
+    // bodies smaller than min_pixel_radius on screen are drawn with that size, so they do not disappear
+    float distance = max((mvp * vec4(offset, 1.0)).w, 1e-6);
+    float scale = max(radius, min_pixel_radius * distance / pixels_per_unit);
+    gl_Position = mvp * vec4(offset + vertex * scale, 1.0);
+    body_color = color;
+}
+"""
+
+_instance_fragment_shader = """
+#version 120
+
+varying vec3 body_color;
+
+void main() {
+    gl_FragColor = vec4(body_color, 1.0);
+}
+"""
+
+# attribute locations of the instance shader
+_instance_attributes = {"vertex": 0, "offset": 1, "radius": 2, "color": 3}
+
+
+class InstancedBodyRenderer(Renderer):
+    """
+    Renders many small bodies in a single instanced draw call as untextured coarse spheres in their color.
+    The bodies are not drawn one by one, draw does nothing for them. Instead draw_instances draws all bodies
+    of the renderer once per frame with the positions calculated by the propagator.
+    Without GL_ARB_instanced_arrays and GL_ARB_draw_instanced the bodies are drawn as points in their color instead.
+    Orbits of instanced bodies are not drawn.
+
+    :var bodies: Bodies drawn by this renderer
+    :type bodies: list
+    :var indices: Index of every body in the position array passed to draw_instances
+    :type indices: :class:`numpy.ndarray`
+    :var slices: Number of subdivisions of the sphere around the z axis
+    :type slices: int
+    :var stacks: Number of subdivisions of the sphere along the z axis
+    :type stacks: int
+    :var min_pixel_radius: Minimum radius of the bodies on screen in pixels
+    :type min_pixel_radius: float
+    :var instanced: True if the bodies are drawn instanced, False if as points, None before they are drawn the first time
+    :type instanced: bool, None
+    """
+
+    def __init__(self, bodies, indices, slices=8, stacks=6, min_pixel_radius=1.0):
+        """
+        Creates a new renderer for the given bodies, the OpenGL resources are created when it is drawn the first time
+
+        :param bodies: Bodies to draw
+        :type bodies: list
+        :param indices: Index of every body in the position array passed to draw_instances
+        :type indices: list
+        :param slices: Number of subdivisions of the sphere around the z axis
+        :type slices: int
+        :param stacks: Number of subdivisions of the sphere along the z axis
+        :type stacks: int
+        :param min_pixel_radius: Minimum radius of the bodies on screen in pixels
+        :type min_pixel_radius: float
+        """
+
+        self.bodies = list(bodies)
+        self.indices = numpy.array(indices, dtype=numpy.int64)
+        self.slices = slices
+        self.stacks = stacks
+        self.min_pixel_radius = min_pixel_radius
+
+        self.instanced = None
+
+        self._shader = None
+        self._vertex_count = 0
+        self._offsets = numpy.zeros((len(self.bodies), 3), dtype=numpy.float32)
+        self._colors = None
+
+    def visible(self, body, frustum):
+        # all bodies are drawn together by draw_instances
+        return False
+
+    def draw(self, body, matrix):
+        pass
+
+    def _create(self):
+        """
+        Compiles the shader and uploads the sphere and the radius and color of every body to the GPU.
+        If instancing is not supported only the colors for the points are prepared.
+        """
+
+        self.instanced = (gl_info.have_extension("GL_ARB_instanced_arrays") and
+                          gl_info.have_extension("GL_ARB_draw_instanced"))
+        if not self.instanced:
+            self._colors = numpy.array([(body.color["r"], body.color["g"], body.color["b"]) for body in self.bodies],
+                                       dtype=numpy.float32) / 255.0
+            return
+
+        self._shader = Shader(_instance_vertex_shader, _instance_fragment_shader, _instance_attributes)
+
+        vertices, _, indices = tessellate_sphere(self.slices, self.stacks)
+        vertices = numpy.array(vertices, dtype=numpy.float32).reshape(-1, 3)[indices]
+        self._vertex_count = len(vertices)
+
+        # radius and color are interleaved, they do not change
+        instances = numpy.empty((len(self.bodies), 4), dtype=numpy.float32)
+        for i, body in enumerate(self.bodies):
+            instances[i] = (body.radius, body.color["r"] / 255.0, body.color["g"] / 255.0, body.color["b"] / 255.0)
+
+        buffers = (GLuint * 3)()
+        glGenBuffers(3, buffers)
+        self._vertex_buffer, self._offset_buffer, self._instance_buffer = buffers
+        for buffer, data, usage in ((self._vertex_buffer, vertices, GL_STATIC_DRAW),
+                                    (self._offset_buffer, self._offsets, GL_STREAM_DRAW),
+                                    (self._instance_buffer, instances, GL_STATIC_DRAW)):
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data.ctypes.data, usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw_instances(self, matrix, positions):
+        """
+        Draws all bodies of the renderer
+
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        :param positions: Positions of all bodies in the system as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        """
+
+        if not self.bodies:
+            return
+        if self.instanced is None:
+            self._create()
+        if not self.instanced:
+            self.draw_points(matrix, positions)
+            return
+
+        # replace the whole buffer, so the driver does not wait for the last frame to finish with it
+        self._offsets[:] = positions[self.indices]
+        glBindBuffer(GL_ARRAY_BUFFER, self._offset_buffer)
+        glBufferData(GL_ARRAY_BUFFER, self._offsets.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, self._offsets.nbytes, self._offsets.ctypes.data)
+
+        self._shader.bind()
+        self._shader.set_uniform_matrix("mvp", matrix)
+        self._shader.set_uniform_float("pixels_per_unit", _pixels_per_unit)
+        self._shader.set_uniform_float("min_pixel_radius", self.min_pixel_radius)
+
+        # (location, buffer, size, stride, offset, divisor)
+        attributes = ((0, self._vertex_buffer, 3, 0, 0, 0),
+                      (1, self._offset_buffer, 3, 0, 0, 1),
+                      (2, self._instance_buffer, 1, 16, 0, 1),
+                      (3, self._instance_buffer, 3, 16, 4, 1))
+        for location, buffer, size, stride, offset, divisor in attributes:
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset))
+            glVertexAttribDivisorARB(location, divisor)
+
+        glDrawArraysInstancedARB(GL_TRIANGLES, 0, self._vertex_count, len(self.bodies))
+
+        for location, _, _, _, _, _ in attributes:
+            glVertexAttribDivisorARB(location, 0)
+            glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._shader.unbind()
+
+    def draw_points(self, matrix, positions):
+        """
+        Draws all bodies of the renderer as points in their color with min_pixel_radius, used without instancing
+
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        :param positions: Positions of all bodies in the system as (N, 3) array, see :attr:`Propagator.positions`
+        :type positions: :class:`numpy.ndarray`
+        """
+
+        self._offsets[:] = positions[self.indices]
+
+        glLoadMatrixd(toGlMatrix(matrix))
+        glPointSize(max(1.0, 2.0 * self.min_pixel_radius))
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, self._offsets.ctypes.data)
+        glColorPointer(3, GL_FLOAT, 0, self._colors.ctypes.data)
+        glDrawArrays(GL_POINTS, 0, len(self.bodies))
+        glPopClientAttrib()
+
+
 def setup_ring_renderer(ring_texture_name, ring_inner_radius, ring_outer_radius, body):
     """
-    Sets the needed parameters for the OrbitingBodyWithRingRenderer.
+    Sets the needed parameters for the OrbitingBodyWithRingRenderer and makes it the renderer of the body.
 
     :param ring_texture_name: Name of the texture
     :type ring_texture_name: str
@@ -111,15 +512,48 @@ def setup_ring_renderer(ring_texture_name, ring_inner_radius, ring_outer_radius,
     :param ring_outer_radius: Outer radius of the rings
     :type ring_outer_radius: float
     :param body: Body to apply these parameters to
-    :type body: :class:`solarsystem.body.Body`
+    :type body: :class:`solarsystem.body.OrbitingBody`
     :return: Supplied body
-    :rtype: :class:`solarsystem.body.Body`
+    :rtype: :class:`solarsystem.body.OrbitingBody`
     """
 
-    body.ring_inner_radius = ring_inner_radius
-    body.ring_outer_radius = ring_outer_radius
-    body.ring_texture = Texture(ring_texture_name)
-    body.ring_disk = gluNewQuadric()
-    gluQuadricNormals(body.ring_disk, GLU_SMOOTH)
-    gluQuadricTexture(body.ring_disk, GL_TRUE)
+    body.set_ring(ring_texture_name, ring_inner_radius, ring_outer_radius)
+    body.renderer = OrbitingBodyWithRingRenderer()
+    body.renderer_attached = False
     return body
+
+
+def create_renderers(bodies):
+    """
+    Creates the matching renderers for all bodies. Bodies marked as instanced share one :class:`InstancedBodyRenderer`.
+
+    :param bodies: Bodies to create the renderers for, in the order they are passed to the propagator
+    :type bodies: list
+    :return: The renderer of the instanced bodies, None if there are none
+    :rtype: :class:`InstancedBodyRenderer`, None
+    """
+
+    instanced = [i for i, body in enumerate(bodies) if body.instanced]
+    instanced_renderer = None
+    if instanced:
+        instanced_renderer = InstancedBodyRenderer([bodies[i] for i in instanced], instanced)
+    for body in bodies:
+        body.renderer = instanced_renderer if body.instanced else create_renderer(body)
+    return instanced_renderer
+
+
+def create_renderer(body):
+    """
+    Creates the matching renderer for the given body
+
+    :param body: Body to create the renderer for
+    :type body: :class:`solarsystem.body.Body`
+    :return: Renderer for the body
+    :rtype: :class:`Renderer`
+    """
+
+    if not hasattr(body, "orbit"):
+        return BodyRenderer()
+    if body.ring_texture_name is not None:
+        return OrbitingBodyWithRingRenderer()
+    return OrbitingBodyRenderer()
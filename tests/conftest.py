@@ -0,0 +1,24 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+
+The modules are imported from the root of the repository, like the application does.
+"""
+
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+@pytest.fixture
+def bodies_directory():
+    """
+    Directory of the bodies of the solar system
+    """
+
+    return os.path.join(root, "bodies")
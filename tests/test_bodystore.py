@@ -0,0 +1,112 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import gc
+import weakref
+
+import numpy
+import pytest
+from euclid import Vector3
+from solarsystem.body import StationaryBody
+from solarsystem.bodystore import BodyStore
+from solarsystem.loader import load_bodies
+
+color = {"r": 10, "g": 20, "b": 30}
+
+
+def create_body(name, parent=None, store=None, radius=1.0):
+    return StationaryBody(parent, name, name + ".png", color, radius, 0.5, 2.0, 3.0, Vector3(1.0, 2.0, 3.0), store=store)
+
+
+def test_bodies_without_store_are_released():
+    body = create_body("a")
+    child = create_body("b", body)
+    assert child.store is body.store
+    assert len(body.store) == 2
+    store = weakref.ref(body.store)
+    del body, child
+    gc.collect()
+    assert store() is None
+
+
+def test_loaded_bodies_are_released(bodies_directory):
+    bodies = load_bodies(bodies_directory, headless=True)
+    store = weakref.ref(bodies[0].store)
+    assert all(body.store is store() for body in bodies)
+    assert load_bodies(bodies_directory, headless=True)[0].store is not store()
+    del bodies
+    gc.collect()
+    assert store() is None
+
+
+def test_parent_from_other_store():
+    root = create_body("root", store=BodyStore())
+    body = create_body("body", radius=2.0)
+    child = create_body("child", body, radius=3.0)
+    grandchild = create_body("grandchild", child, radius=4.0)
+    old = body.store
+
+    body.parent = root
+    for moved, radius in ((body, 2.0), (child, 3.0), (grandchild, 4.0)):
+        assert moved.store is root.store
+        assert moved.radius == radius
+        assert moved.color == color
+        assert moved.xyz == Vector3(1.0, 2.0, 3.0)
+    assert body.parent is root
+    assert child.parent is body
+    assert grandchild.parent is child
+    assert len(root.store) == 4
+    assert len(old) == 0
+
+
+def test_removed_slots_are_reused():
+    store = BodyStore(2)
+    parent = create_body("parent", store=store)
+    bodies = [create_body(str(i), parent, store, radius=i + 1.0) for i in range(5)]
+    indices = [body.store_index for body in bodies]
+    store.remove(indices[1])
+    store.remove(indices[3])
+    assert len(store) == 4
+    assert store.bodies[indices[1]] is None
+    assert store.radii[indices[1]] == 0.0
+    assert store.parents[indices[1]] == -1
+
+    added = [create_body(name, parent, store) for name in ("x", "y")]
+    assert sorted(body.store_index for body in added) == sorted((indices[1], indices[3]))
+    assert len(store.bodies) == 6
+    assert len(store) == 6
+    assert all(body.parent is parent for body in added)
+    assert [bodies[i].radius for i in (0, 2, 4)] == [1.0, 3.0, 5.0]
+
+
+def test_remove_orphans_children():
+    store = BodyStore()
+    parent = create_body("parent", store=store)
+    child = create_body("child", parent)
+    store.remove(parent.store_index)
+    assert child.parent is None
+    assert numpy.count_nonzero(store.parents >= 0) == 0
+
+
+def test_transfer_keeps_state():
+    store = BodyStore()
+    other = BodyStore()
+    body = create_body("body", store=store, radius=7.0)
+    body.timefactor = 0.25
+    index = store.transfer(body.store_index, other)
+    assert other.bodies[index] is body
+    assert other.radii[index] == pytest.approx(7.0)
+    assert other.rotations[index] == pytest.approx(0.25)
+    assert other.parents[index] == -1
+    assert len(store) == 0
+
+
+def test_colors_are_kept_exactly():
+    body = create_body("body")
+    assert body.color == color
+    assert all(type(value) is int for value in body.color.values())
+    body.color = {"r": 127.6, "g": 300, "b": -1}
+    assert body.color == {"r": 127.6, "g": 300, "b": -1}
@@ -0,0 +1,95 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import inf
+
+import numpy
+import pytest
+from euclid import Vector3
+from util.bvh import BoundingVolumeHierarchy
+from util.ray import Ray, intersect_sphere
+
+
+def random_rays(random, count, spread):
+    rays = []
+    for _ in range(count):
+        origin = Vector3(*random.uniform(-spread, spread, 3))
+        # aim near the spheres, so most rays hit something
+        target = Vector3(*random.normal(0.0, spread / 4, 3))
+        rays.append(Ray(origin, (target - origin).normalized()))
+    return rays
+
+
+def brute_force(ray, centers, radii):
+    distances = [intersect_sphere(ray, Vector3(*center), radius) for center, radius in zip(centers, radii)]
+    nearest = int(numpy.argmin(distances))
+    if distances[nearest] == inf:
+        return None
+    return nearest, distances[nearest]
+
+
+def check_rays(bvh, rays, centers, radii):
+    hits = 0
+    for ray in rays:
+        expected = brute_force(ray, centers, radii)
+        result = bvh.intersect(ray)
+        if expected is None:
+            assert result is None
+        else:
+            hits += 1
+            assert result is not None
+            assert result[1] == pytest.approx(expected[1], rel=1e-12)
+            # spheres hit at the same distance may be reported in any order
+            index = result[0]
+            assert intersect_sphere(ray, Vector3(*centers[index]), radii[index]) == pytest.approx(expected[1], rel=1e-12)
+    return hits
+
+
+@pytest.mark.parametrize("count", (1, 7, 8, 9, 300, 1000))
+def test_intersect_matches_brute_force(count):
+    random = numpy.random.default_rng(count)
+    centers = random.normal(0.0, 100.0, (count, 3))
+    radii = random.uniform(0.5, 10.0, count)
+    bvh = BoundingVolumeHierarchy(radii)
+    bvh.refit(centers)
+    hits = check_rays(bvh, random_rays(random, 200, 300.0), centers, radii)
+    if count >= 300:
+        assert hits > 50
+
+
+def test_refit_and_rebuild_match_brute_force():
+    random = numpy.random.default_rng(4)
+    centers = random.normal(0.0, 100.0, (500, 3))
+    radii = random.uniform(0.5, 5.0, 500)
+    bvh = BoundingVolumeHierarchy(radii)
+    bvh.refit(centers)
+    for step in range(6):
+        # the spheres drift apart, so the boxes grow until the tree is built again
+        centers = centers + random.normal(0.0, 20.0 * (step + 1), centers.shape)
+        bvh.refit(centers)
+        check_rays(bvh, random_rays(random, 50, 300.0), centers, radii)
+
+
+def test_origin_inside_sphere():
+    centers = numpy.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]])
+    radii = numpy.array([2.0, 1.0])
+    bvh = BoundingVolumeHierarchy(radii)
+    bvh.refit(centers)
+    index, distance = bvh.intersect(Ray(Vector3(0.0, 0.0, 0.0), Vector3(1.0, 0.0, 0.0)))
+    assert index == 0
+    assert distance == pytest.approx(2.0)
+
+
+def test_empty_and_missed():
+    bvh = BoundingVolumeHierarchy(numpy.zeros(0))
+    bvh.refit(numpy.zeros((0, 3)))
+    assert bvh.intersect(Ray(Vector3(0.0, 0.0, 0.0), Vector3(1.0, 0.0, 0.0))) is None
+
+    bvh = BoundingVolumeHierarchy(numpy.ones(3))
+    bvh.refit(numpy.array([[5.0, 0.0, 0.0], [0.0, 5.0, 0.0], [-5.0, 0.0, 0.0]]))
+    # the sphere behind the origin is not hit
+    assert bvh.intersect(Ray(Vector3(0.0, 0.0, 10.0), Vector3(0.0, 0.0, 1.0))) is None
+    assert bvh.intersect(Ray(Vector3(-10.0, 0.0, 0.0), Vector3(1.0, 0.0, 0.0)))[0] == 2
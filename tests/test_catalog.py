@@ -0,0 +1,105 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import csv
+import json
+import os
+
+import numpy
+import pytest
+from solarsystem.catalog import Catalog, compile_catalog, read_csv, read_directory, read_jsonl, read_source
+from solarsystem.loader import load_bodies, load_catalog
+from solarsystem.propagator import Propagator
+
+
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from flatten(value, prefix + key + ".")
+        else:
+            yield prefix + key, value
+
+
+@pytest.fixture
+def catalog_file(bodies_directory, tmp_path):
+    filename = str(tmp_path / "bodies.npy")
+    compile_catalog(read_directory(bodies_directory), filename)
+    return filename
+
+
+def test_body_data_round_trip(bodies_directory, catalog_file):
+    source = read_directory(bodies_directory)
+    catalog = Catalog(catalog_file)
+    assert len(catalog) == len(source)
+    for index in range(len(catalog)):
+        internal_name, data = catalog.body_data(index)
+        expected = dict(source[internal_name])
+        expected.setdefault("instanced", False)
+        expected.setdefault("atlas", False)
+        assert data == expected
+
+
+def test_loaded_bodies_match_directory(bodies_directory, catalog_file, capsys):
+    expected = load_bodies(bodies_directory, headless=True)
+    bodies = load_bodies(catalog_file, headless=True)
+    # one summary line per step instead of one line per body
+    output = capsys.readouterr().out
+    assert output.count("post_init") == 2
+    assert output.count("Loaded %d bodies" % len(expected)) == 1
+    assert len(output.splitlines()) == 4
+    assert [body.name for body in bodies] == [body.name for body in expected]
+    for body, other in zip(bodies, expected):
+        assert (body.radius, body.mass, body.axial_tilt, body.texturename, body.instanced, body.atlas) == \
+               (other.radius, other.mass, other.axial_tilt, other.texturename, other.instanced, other.atlas)
+        assert (body.parent and body.parent.name) == (other.parent and other.parent.name)
+        assert type(getattr(body, "orbit", None)) is type(getattr(other, "orbit", None))
+    propagator, expected_propagator = Propagator(bodies), Propagator(expected)
+    for time in (0.0, 1e6, 3e8):
+        propagator.update(time)
+        expected_propagator.update(time)
+        numpy.testing.assert_allclose(propagator.positions, expected_propagator.positions, rtol=1e-12)
+
+
+def test_lookup_table_and_color_round_trip(bodies_directory, tmp_path):
+    source = read_directory(bodies_directory)
+    source["moon"]["orbit"]["lookup_table"] = {"tolerance": 0.01, "min_steps": 32}
+    source["moon"]["basecolor"] = {"r": 127.6, "g": 300, "b": 0}
+    filename = str(tmp_path / "bodies.npy")
+    compile_catalog(source, filename)
+    _, data = Catalog(filename).body_data(Catalog(filename).find("moon"))
+    assert data["orbit"]["lookup_table"] == {"tolerance": 0.01, "min_steps": 32, "max_steps": 65536}
+    assert data["basecolor"] == {"r": 127.6, "g": 300, "b": 0}
+
+
+def test_select_includes_parents(catalog_file):
+    catalog = Catalog(catalog_file)
+    indices = catalog.select(["moon"])
+    assert [catalog.body_data(index)[0] for index in indices] == sorted(["moon", "earth", "sun"])
+    assert [body.name for body in load_catalog(catalog, ["moon"], headless=True)] == ["Sun", "Earth", "Moon"]
+    with pytest.raises(KeyError):
+        catalog.find("nothing")
+
+
+def test_text_sources_match_directory(bodies_directory, tmp_path):
+    source = read_directory(bodies_directory)
+    rows = [dict(flatten(dict(data, id=internal_name))) for internal_name, data in source.items()]
+
+    jsonl = str(tmp_path / "bodies.jsonl")
+    with open(jsonl, "w") as data_file:
+        for row in source.items():
+            data_file.write(json.dumps(dict(row[1], id=row[0])) + "\n")
+    assert read_jsonl(jsonl) == source
+
+    filename = str(tmp_path / "bodies.csv")
+    with open(filename, "w", newline="") as data_file:
+        writer = csv.DictWriter(data_file, sorted(set(column for row in rows for column in row)))
+        writer.writeheader()
+        writer.writerows(rows)
+    assert read_csv(filename) == source
+    assert read_source(filename) == source
+
+    with pytest.raises(ValueError):
+        read_source(os.path.join(str(tmp_path), "bodies.txt"))
@@ -0,0 +1,126 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import json
+import multiprocessing
+import os
+
+import numpy
+from solarsystem.ephemeris import EphemerisCache, chunk_size_for, generate_ephemeris
+from solarsystem.loader import load_bodies
+from solarsystem.propagator import Propagator
+from util import dts
+
+
+def test_cache_hits_and_misses():
+    cache = EphemerisCache(quantum=10)
+    assert cache.key(14.0) == cache.key(6.0) == 1
+    assert cache.get(1) is None
+    cache.put(1, numpy.ones((4, 3)))
+    numpy.testing.assert_array_equal(cache.get(1), numpy.ones((4, 3)))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    snapshot = numpy.zeros((100, 3))
+    entry = EphemerisCache.entry_memory(0, snapshot)
+    # the entries take more than the bytes of their positions
+    assert entry > snapshot.nbytes
+    cache = EphemerisCache(memory_budget=3 * entry)
+    for key in range(3):
+        cache.put(key, snapshot)
+    assert cache.memory == 3 * entry
+    cache.get(0)
+    cache.put(3, snapshot)
+    assert len(cache) == 3
+    assert cache.get(1) is None
+    assert cache.get(0) is not None
+    assert cache.memory <= cache.memory_budget
+    cache.clear()
+    assert (len(cache), cache.memory) == (0, 0)
+
+
+def test_cache_is_only_used_when_paused_or_scrubbing(bodies_directory):
+    bodies = load_bodies(bodies_directory, headless=True)
+    cache = EphemerisCache(quantum=600)
+    propagator = Propagator(bodies, cache=cache)
+    reference = Propagator(bodies)
+
+    # playback, every update jumps many time slots and is calculated exactly
+    for frame in range(10):
+        propagator.update(frame * 1.0e4)
+        reference.calculate(frame * 1.0e4)
+        numpy.testing.assert_array_equal(propagator.positions, reference.positions)
+    assert len(cache) == 0 and cache.hits == cache.misses == 0
+
+    # paused, the time slot is calculated once
+    for _ in range(5):
+        propagator.update(9.0e4)
+    assert len(cache) == 1
+    reference.calculate(cache.time(cache.key(9.0e4)))
+    numpy.testing.assert_array_equal(propagator.positions, reference.positions)
+
+    # scrubbing back and forth over neighbouring time slots hits the snapshots
+    for time in (9.06e4, 9.0e4, 9.06e4, 9.12e4, 9.06e4):
+        propagator.update(time)
+    assert len(cache) == 3
+    assert cache.hits == 3
+
+
+def test_chunk_size_follows_memory_budget():
+    assert chunk_size_for(10, 64 * 1024 * 1024) > chunk_size_for(50000, 64 * 1024 * 1024) >= 1
+    assert chunk_size_for(50000, 1) == 1
+    assert chunk_size_for(0, 64 * 1024 * 1024) >= 1
+
+
+def test_generate_ephemeris_in_chunks(bodies_directory, tmp_path):
+    start, stop, step = 0.0, 400 * dts, 0.5 * dts
+    output = os.path.join(str(tmp_path), "small.npy")
+    positions = generate_ephemeris(bodies_directory, output, start, stop, step, processes=1, memory_budget=1)
+    with open(os.path.join(str(tmp_path), "small.json")) as index_file:
+        index = json.load(index_file)
+    assert positions.shape == (len(index["bodies"]), 800, 3)
+
+    propagator = Propagator(load_bodies(bodies_directory, headless=True))
+    expected = propagator.ephemeris(start + numpy.arange(800) * step).transpose(1, 0, 2)
+    numpy.testing.assert_allclose(positions, expected, rtol=1e-12, atol=1e-9)
+    large = generate_ephemeris(bodies_directory, os.path.join(str(tmp_path), "large.npy"), start, stop, step, processes=1)
+    numpy.testing.assert_array_equal(positions, large)
+
+
+def test_generate_ephemeris_with_processes(bodies_directory, tmp_path):
+    start, stop, step = -50 * dts, 350 * dts, 0.5 * dts
+    single = generate_ephemeris(bodies_directory, os.path.join(str(tmp_path), "single.npy"), start, stop, step, chunk_size=50, processes=1)
+    sharded = generate_ephemeris(bodies_directory, os.path.join(str(tmp_path), "sharded.npy"), start, stop, step, chunk_size=50, processes=3)
+    numpy.testing.assert_array_equal(single, sharded)
+
+
+def test_generate_ephemeris_skips_pool_for_one_shard(bodies_directory, tmp_path, monkeypatch):
+    def pool(*args, **kwargs):
+        raise AssertionError("no pool is needed for a single shard")
+
+    monkeypatch.setattr(multiprocessing, "Pool", pool)
+    positions = generate_ephemeris(bodies_directory, os.path.join(str(tmp_path), "one.npy"), 0.0, 10 * dts, dts, chunk_size=64, processes=8)
+    assert positions.shape[1] == 10
+
+
+def test_cached_update_rotates_bodies_to_the_slot_time(bodies_directory):
+    bodies = load_bodies(bodies_directory, headless=True)
+    cache = EphemerisCache(quantum=600)
+    propagator = Propagator(bodies, cache=cache)
+    reference = Propagator(load_bodies(bodies_directory, headless=True))
+    earth = bodies.index(next(body for body in bodies if body.name == "Earth"))
+
+    # paused and scrubbing both snap to the time slot, up to half a quantum away
+    propagator.update(9.0e4)
+    for time in (9.0e4 + 250.0, 9.0e4 + 250.0, 9.06e4 - 280.0):
+        propagator.update(time)
+        slot_time = cache.time(cache.key(time))
+        assert slot_time != time
+        reference.update(slot_time)
+        numpy.testing.assert_array_equal(propagator.positions, reference.positions)
+        assert bodies[earth].timefactor == reference.bodies[earth].timefactor
+        assert tuple(bodies[earth].xyz) == tuple(reference.bodies[earth].xyz)
@@ -0,0 +1,63 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import sin
+
+import numpy
+import pytest
+from util.orbitalcalculations import ConvergenceError, kepler_max_iterations, kepler_tolerance, solve_kepler, \
+    solve_kepler_array, tau
+
+eccentricities = (0.0, 0.0167, 0.2, 0.5, 0.9, 0.99, 0.999999)
+
+
+@pytest.mark.parametrize("eccentricity", eccentricities)
+def test_solve_kepler_residual(eccentricity):
+    for mean_anomaly in numpy.linspace(-3 * tau, 3 * tau, 997):
+        eccentric_anomaly, iterations = solve_kepler(eccentricity, mean_anomaly)
+        residual = eccentric_anomaly - eccentricity * sin(eccentric_anomaly) - mean_anomaly % tau
+        assert abs(residual) <= kepler_tolerance
+        assert iterations <= kepler_max_iterations
+
+
+@pytest.mark.parametrize("eccentricity", eccentricities)
+def test_solve_kepler_array_residual(eccentricity):
+    mean_anomalies = numpy.linspace(-3 * tau, 3 * tau, 997)
+    eccentric_anomalies, iterations = solve_kepler_array(eccentricity, mean_anomalies)
+    residuals = eccentric_anomalies - eccentricity * numpy.sin(eccentric_anomalies) - numpy.remainder(mean_anomalies, tau)
+    assert numpy.abs(residuals).max() <= kepler_tolerance
+    assert iterations.shape == mean_anomalies.shape
+    assert iterations.max() <= kepler_max_iterations
+
+
+def test_solve_kepler_array_matches_scalar():
+    random = numpy.random.default_rng(2)
+    e = random.uniform(0.0, 0.99, (20, 30))
+    m = random.uniform(-100.0, 100.0, (20, 30))
+    eccentric_anomalies, _ = solve_kepler_array(e, m)
+    assert eccentric_anomalies.shape == (20, 30)
+    for index in numpy.ndindex(e.shape):
+        assert eccentric_anomalies[index] == pytest.approx(solve_kepler(e[index], m[index])[0], abs=1e-12)
+
+
+def test_solve_kepler_raises_without_convergence():
+    with pytest.raises(ConvergenceError):
+        solve_kepler(0.9, 1.0, max_iterations=0)
+    with pytest.raises(ConvergenceError):
+        solve_kepler_array(numpy.array([0.9]), numpy.array([1.0]), max_iterations=0)
+
+
+@pytest.mark.parametrize("eccentricity", eccentricities)
+def test_scalar_and_array_solver_match_at_periapsis(eccentricity):
+    # multiples of 2pi start on the root, tiny anomalies end just outside the bracket [0, 2pi] after rounding
+    mean_anomalies = numpy.array([0.0, tau, 2 * tau, -tau, 5 * tau, 1e-300, -1e-300, 1e-10, tau - 1e-10])
+    eccentric_anomalies, iterations = solve_kepler_array(eccentricity, mean_anomalies)
+    for mean_anomaly, expected, expected_iterations in zip(mean_anomalies, eccentric_anomalies, iterations):
+        eccentric_anomaly, scalar_iterations = solve_kepler(eccentricity, mean_anomaly)
+        assert eccentric_anomaly == pytest.approx(expected, abs=1e-12)
+        assert scalar_iterations == expected_iterations
+    assert list(iterations[:5]) == [0] * 5
+    assert solve_kepler(eccentricity, 0.0) == (0.0, 0)
@@ -0,0 +1,84 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+import pytest
+from solarsystem.ephemeris import EphemerisCache
+from solarsystem.loader import load_bodies
+from solarsystem.orbit import CircularOrbit, EllipticOrbit
+from solarsystem.propagator import CircularOrbitBatch, EllipticOrbitBatch, Propagator
+from util import dts
+
+time = 1.234e7
+
+
+def assert_batch_matches(batch, orbits):
+    expected = numpy.array([tuple(orbit.calculate(time)) for orbit in orbits])
+    numpy.testing.assert_allclose(batch.calculate(time), expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("element, value", [("radius", 21.0), ("orbital_period", 3.0 * dts),
+                                            ("inclination", 0.7), ("multiplier", 2.0)])
+def test_circular_batch_follows_changed_elements(element, value):
+    orbits = [CircularOrbit(15.36, 29.53 * dts, 0.09), CircularOrbit(4.0, 2.0 * dts)]
+    for orbit in orbits:
+        orbit.post_init()
+    batch = CircularOrbitBatch(orbits)
+    assert_batch_matches(batch, orbits)
+    setattr(orbits[0], element, value)
+    assert not orbits[0].compiled
+    assert_batch_matches(batch, orbits)
+
+
+@pytest.mark.parametrize("element, value", [("apoapsis", 2.0e11), ("periapsis", 1.0e11),
+                                            ("longtitude_ascending_node", 1.0), ("argument_of_periapsis", 2.0),
+                                            ("inclination", 0.3), ("initial_mean_anomaly", 4.0),
+                                            ("multiplier", 2e-9)])
+def test_elliptic_batch_follows_changed_elements(element, value):
+    orbits = [EllipticOrbit(1.52e11, 1.47e11, 0.1, 1.99, 0.0, 6.2, multiplier=1e-9),
+              EllipticOrbit(8.17e11, 7.41e11, 1.75, 4.78, 0.02, 0.35, multiplier=1e-9)]
+    for orbit in orbits:
+        orbit.post_init()
+    batch = EllipticOrbitBatch(orbits)
+    assert_batch_matches(batch, orbits)
+    setattr(orbits[0], element, value)
+    assert not orbits[0].compiled
+    assert_batch_matches(batch, orbits)
+
+
+def test_propagator_follows_changed_period(bodies_directory):
+    bodies = load_bodies(bodies_directory, headless=True)
+    moon = next(body for body in bodies if body.name == "Moon")
+    propagator = Propagator(bodies, cache=EphemerisCache(quantum=1))
+    propagator.update(time)
+    moon.orbit.orbital_period *= 1.7
+    propagator.update(time)
+    expected = numpy.array(tuple(moon.orbit.calculate(time))) + propagator.positions[bodies.index(moon.parent)]
+    numpy.testing.assert_allclose(propagator.positions[bodies.index(moon)], expected, rtol=1e-9)
+
+
+def test_compile_many_matches_compile():
+    random = numpy.random.default_rng(8)
+    elements = numpy.column_stack((random.uniform(2.0e11, 3.0e11, 50), random.uniform(1.0e11, 2.0e11, 50),
+                                   random.uniform(0.0, 6.0, (50, 4)), random.uniform(1e-10, 1e-8, 50))).tolist()
+    orbits = [EllipticOrbit(*row[:6], multiplier=row[6]) for row in elements]
+    compiled = [EllipticOrbit(*row[:6], multiplier=row[6]) for row in elements]
+    EllipticOrbit.compile_many(orbits)
+    for orbit, expected in zip(orbits, compiled):
+        expected.compile()
+        assert orbit.compiled
+        for name in ("semi_major_axis", "eccentricity", "semi_minor_axis", "orbital_period", "mean_motion"):
+            assert getattr(orbit, name) == pytest.approx(getattr(expected, name), rel=1e-12)
+        numpy.testing.assert_allclose(tuple(orbit.p), tuple(expected.p), rtol=1e-12, atol=1e-24)
+        numpy.testing.assert_allclose(tuple(orbit.q), tuple(expected.q), rtol=1e-12, atol=1e-24)
+
+    # elements changed afterwards still mark the orbit as not compiled
+    version = orbits[0].version
+    orbits[0].apoapsis *= 1.5
+    assert not orbits[0].compiled
+    assert orbits[0].version == version + 1
+    compiled[0].apoapsis *= 1.5
+    assert tuple(orbits[0].calculate(time)) == pytest.approx(tuple(compiled[0].calculate(time)), rel=1e-9)
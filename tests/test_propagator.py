@@ -0,0 +1,57 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+import pytest
+from solarsystem.loader import load_bodies
+from solarsystem.orbit import EllipticOrbit
+from solarsystem.propagator import EllipticOrbitBatch, Propagator
+
+times = (0.0, 1.0e6, 3.0e8, -4.5e9)
+
+
+def elliptic_orbits(count=32, seed=1):
+    random = numpy.random.default_rng(seed)
+    orbits = []
+    for _ in range(count):
+        periapsis = random.uniform(1e10, 1e12)
+        apoapsis = periapsis * random.uniform(1.0, 20.0)
+        orbits.append(EllipticOrbit(apoapsis, periapsis, random.uniform(0, 6.28), random.uniform(0, 6.28),
+                                    random.uniform(0, 3.14), random.uniform(0, 6.28), multiplier=1e-9))
+    for orbit in orbits:
+        orbit.post_init()
+    return orbits
+
+
+def positions(orbits, time):
+    return numpy.array([tuple(orbit.calculate(time)) for orbit in orbits])
+
+
+@pytest.mark.parametrize("time", times)
+def test_elliptic_batch_matches_orbits(time):
+    orbits = elliptic_orbits()
+    batch = EllipticOrbitBatch(orbits)
+    numpy.testing.assert_allclose(batch.calculate(time), positions(orbits, time), rtol=1e-9, atol=1e-9)
+
+
+def test_elliptic_batch_calculates_many_times():
+    orbits = elliptic_orbits()
+    result = EllipticOrbitBatch(orbits).calculate(numpy.array(times))
+    assert result.shape == (len(times), len(orbits), 3)
+    for i, time in enumerate(times):
+        numpy.testing.assert_allclose(result[i], positions(orbits, time), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("time", times)
+def test_propagator_matches_bodies(bodies_directory, time):
+    bodies = load_bodies(bodies_directory, headless=True)
+    propagator = Propagator(bodies)
+    propagator.calculate(time)
+    for i, body in enumerate(bodies):
+        expected = numpy.array(tuple(body.orbit.calculate(time) if hasattr(body, "orbit") else body.xyz))
+        if body.parent is not None and hasattr(body, "orbit"):
+            expected += propagator.positions[propagator.parents[i]]
+        numpy.testing.assert_allclose(propagator.positions[i], expected, rtol=1e-9, atol=1e-9)
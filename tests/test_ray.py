@@ -0,0 +1,49 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import inf
+
+import numpy
+import pytest
+from euclid import Vector3
+from util.ray import Ray, intersect_sphere, intersect_spheres
+
+
+def test_intersect_spheres_matches_scalar():
+    random = numpy.random.default_rng(5)
+    centers = random.normal(0.0, 20.0, (2000, 3))
+    radii = random.uniform(0.1, 8.0, 2000)
+    for _ in range(20):
+        ray = Ray(Vector3(*random.normal(0.0, 20.0, 3)), Vector3(*random.normal(0.0, 1.0, 3)).normalized())
+        distances = intersect_spheres(ray, centers, radii)
+        expected = [intersect_sphere(ray, Vector3(*center), radius) for center, radius in zip(centers, radii)]
+        assert distances.shape == (2000,)
+        assert numpy.isinf(distances).sum() < 2000
+        # missed spheres are inf in both, everything else agrees
+        assert list(numpy.isinf(distances)) == [distance == inf for distance in expected]
+        hit = ~numpy.isinf(distances)
+        numpy.testing.assert_allclose(distances[hit], numpy.array(expected)[hit], rtol=1e-12)
+
+
+def test_intersect_spheres_cases():
+    ray = Ray(Vector3(0.0, 0.0, 0.0), Vector3(1.0, 0.0, 0.0))
+    centers = numpy.array([[5.0, 0.0, 0.0],   # in front
+                           [0.0, 0.0, 0.0],   # origin inside
+                           [-5.0, 0.0, 0.0],  # behind
+                           [5.0, 3.0, 0.0],   # beside
+                           [5.0, 1.0, 0.0]])  # touching
+    radii = numpy.array([1.0, 2.0, 1.0, 1.0, 1.0])
+    out = numpy.empty(5)
+    distances = intersect_spheres(ray, centers, radii, out=out)
+    assert distances is out
+    assert list(distances) == pytest.approx([4.0, 2.0, inf, inf, 5.0])
+    for center, radius, distance in zip(centers, radii, distances):
+        assert intersect_sphere(ray, Vector3(*center), radius) == pytest.approx(distance)
+
+
+def test_intersect_spheres_empty():
+    ray = Ray(Vector3(0.0, 0.0, 0.0), Vector3(0.0, 0.0, 1.0))
+    assert intersect_spheres(ray, numpy.zeros((0, 3)), numpy.zeros(0)).shape == (0,)
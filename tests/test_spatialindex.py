@@ -0,0 +1,74 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+import pytest
+from util.spatialindex import SpatialGrid
+
+
+def brute_force_radius(positions, position, radius):
+    distances = numpy.sqrt(((positions - position) ** 2).sum(axis=1))
+    return set(numpy.flatnonzero(distances <= radius).tolist())
+
+
+def brute_force_nearest(positions, position, count):
+    distances = numpy.sqrt(((positions - position) ** 2).sum(axis=1))
+    return numpy.sort(distances)[:count]
+
+
+@pytest.mark.parametrize("cell_size", (None, 0.5, 50.0))
+def test_query_radius_matches_brute_force(cell_size):
+    random = numpy.random.default_rng(6)
+    # a flat disk with a dense center, like the orbits of a system
+    positions = random.normal(0.0, 10.0, (2000, 3)) * (1.0, 1.0, 0.05)
+    grid = SpatialGrid(cell_size)
+    grid.update(positions)
+    for radius in (0.0, 0.3, 2.0, 15.0, 100.0):
+        for position in random.normal(0.0, 12.0, (10, 3)):
+            indices, distances = grid.query_radius(position, radius)
+            assert set(indices.tolist()) == brute_force_radius(positions, position, radius)
+            assert len(set(indices.tolist())) == len(indices)
+            assert (numpy.diff(distances) >= 0.0).all()
+
+
+@pytest.mark.parametrize("count", (1, 5, 50, 3000))
+def test_query_nearest_matches_brute_force(count):
+    random = numpy.random.default_rng(count)
+    positions = random.uniform(-100.0, 100.0, (2000, 3))
+    grid = SpatialGrid()
+    grid.update(positions)
+    for position in random.uniform(-150.0, 150.0, (10, 3)):
+        indices, distances = grid.query_nearest(position, count)
+        assert len(indices) == min(count, 2000)
+        numpy.testing.assert_allclose(distances, brute_force_nearest(positions, position, count))
+        numpy.testing.assert_allclose(numpy.sqrt(((positions[indices] - position) ** 2).sum(axis=1)), distances)
+
+
+def test_update_after_moving():
+    random = numpy.random.default_rng(7)
+    positions = random.normal(0.0, 10.0, (1000, 3))
+    grid = SpatialGrid()
+    grid.update(positions)
+    for _ in range(5):
+        positions = positions + random.normal(0.0, 3.0, positions.shape)
+        grid.update(positions)
+        for position in random.normal(0.0, 10.0, (5, 3)):
+            indices, _ = grid.query_radius(position, 4.0)
+            assert set(indices.tolist()) == brute_force_radius(positions, position, 4.0)
+    # the number of points may change between updates
+    positions = positions[:600]
+    grid.update(positions)
+    indices, _ = grid.query_radius((0.0, 0.0, 0.0), 8.0)
+    assert set(indices.tolist()) == brute_force_radius(positions, numpy.zeros(3), 8.0)
+
+
+def test_empty_grid():
+    grid = SpatialGrid()
+    grid.update(numpy.zeros((0, 3)))
+    indices, distances = grid.query_radius((0.0, 0.0, 0.0), 10.0)
+    assert len(indices) == 0 and len(distances) == 0
+    indices, _ = grid.query_nearest((0.0, 0.0, 0.0), 3)
+    assert len(indices) == 0
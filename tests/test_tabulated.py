@@ -0,0 +1,107 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import json
+import os
+
+import numpy
+import pytest
+from solarsystem.loader import load_bodies
+from solarsystem.orbit import CircularOrbit, EllipticOrbit, TabulatedOrbit
+from solarsystem.propagator import Propagator, TabulatedOrbitBatch, build_tables
+from util import dts
+
+times = numpy.linspace(-3.0e8, 3.0e8, 101)
+
+
+def tabulated_orbits(count=16, seed=3, tolerance=0.001):
+    random = numpy.random.default_rng(seed)
+    orbits = []
+    for i in range(count):
+        if i % 4 == 0:
+            orbit = CircularOrbit(random.uniform(5.0, 50.0), random.uniform(1.0, 100.0) * dts, random.uniform(0, 0.3))
+        else:
+            periapsis = random.uniform(1e11, 1e12)
+            orbit = EllipticOrbit(periapsis * random.uniform(1.0, 3.0), periapsis, random.uniform(0, 6.28),
+                                  random.uniform(0, 6.28), random.uniform(0, 0.3), random.uniform(0, 6.28), multiplier=1e-9)
+        orbits.append(TabulatedOrbit(orbit, tolerance=tolerance))
+    for orbit in orbits:
+        orbit.post_init()
+    return orbits
+
+
+def exact(orbits, time):
+    return numpy.array([tuple(orbit.orbit.calculate(time)) for orbit in orbits])
+
+
+def test_table_is_within_tolerance():
+    for orbit in tabulated_orbits():
+        orbit.compile()
+        assert orbit.error <= orbit.tolerance
+        for time in times:
+            assert abs(orbit.calculate(time) - orbit.orbit.calculate(time)) <= orbit.tolerance
+
+
+def test_built_tables_are_within_tolerance():
+    orbits = tabulated_orbits()
+    build_tables(orbits)
+    for orbit in orbits:
+        assert orbit.compiled
+        assert orbit.error <= orbit.tolerance
+        numpy.testing.assert_allclose(orbit.positions, orbit.orbit.calculate_array(numpy.arange(orbit.steps) * orbit.orbital_period / orbit.steps), atol=1e-9)
+
+
+def test_batch_matches_orbits():
+    orbits = tabulated_orbits()
+    batch = TabulatedOrbitBatch(orbits)
+    for time in times:
+        expected = numpy.array([tuple(orbit.calculate(time)) for orbit in orbits])
+        numpy.testing.assert_allclose(batch.calculate(time), expected, rtol=1e-9, atol=1e-9)
+        assert numpy.abs(batch.calculate(time) - exact(orbits, time)).max() <= 0.001
+    assert batch.calculate(times).shape == (len(times), len(orbits), 3)
+
+
+def test_batch_follows_changed_elements():
+    orbits = tabulated_orbits()
+    batch = TabulatedOrbitBatch(orbits)
+    orbits[1].orbit.apoapsis *= 1.5
+    orbits[0].orbit.orbital_period *= 2.0
+    assert numpy.abs(batch.calculate(times[7]) - exact(orbits, times[7])).max() <= 0.001
+
+
+@pytest.mark.parametrize("recompile", [False, True])
+def test_table_follows_recompiled_orbit(recompile):
+    orbit = tabulated_orbits(count=2)[1]
+    orbit.calculate(0.0)
+    orbit.orbit.inclination += 0.5
+    if recompile:
+        # compiling the tabulated orbit first must not leave the table stale
+        orbit.orbit.compile()
+    assert not orbit.compiled
+    assert abs(orbit.calculate(times[3]) - orbit.orbit.calculate(times[3])) <= orbit.tolerance
+
+
+def test_propagator_batches_tables(bodies_directory, tmp_path):
+    for filename in os.listdir(bodies_directory):
+        with open(os.path.join(bodies_directory, filename)) as data_file:
+            data = json.load(data_file)
+        if "orbit" in data:
+            data["orbit"]["lookup_table"] = {"tolerance": 0.001}
+        with open(os.path.join(str(tmp_path), filename), "w") as data_file:
+            json.dump(data, data_file)
+    bodies = load_bodies(str(tmp_path), headless=True)
+    propagator = Propagator(bodies)
+    # only bodies on tables of orbits other than circular ones are interpolated
+    tabulated = [i for i, body in enumerate(bodies) if hasattr(body, "orbit") and type(body.orbit.orbit) is not CircularOrbit]
+    assert [batch for _, batch in propagator._batches if isinstance(batch, TabulatedOrbitBatch)][0].orbits == [bodies[i].orbit for i in tabulated]
+    assert not propagator._orbiting
+
+    reference = Propagator(load_bodies(bodies_directory, headless=True))
+    for time in times[::10]:
+        propagator.calculate(time)
+        reference.calculate(time)
+        # the errors of a body and its parent add up
+        assert numpy.abs(propagator.positions - reference.positions).max() <= 0.002
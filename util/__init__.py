@@ -9,8 +9,6 @@ import time as time_
 from math import pi
 
 import pyglet
-from pyglet.gl import GLdouble
-from pyglet.text import decode_html
 
 lightfv = ctypes.c_float * 4
 dts = 24 * 60 * 60
@@ -38,9 +36,29 @@ def load_html(filename):
     :return: content of the file
     """
 
+    # imported here, pyglet.text needs OpenGL
+    from pyglet.text import decode_html
     return decode_html(load_string(filename))
 
 
+def attributes(obj):
+    """
+    Get the attributes of an object, including the ones in slots
+
+    :param obj: Object to get the attributes of
+    :return: List of (name, value) tuples
+    :rtype: list
+    """
+
+    items = list(getattr(obj, '__dict__', {}).items())
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__') and hasattr(obj, name):
+                items.append((name, getattr(obj, name)))
+    return items
+
+
 def auto_str(cls):
     """
     Adds an automatically generated __str__ method to the class that is annotated with it.
@@ -52,7 +70,7 @@ def auto_str(cls):
     def __str__(self):
         return '%s(%s)' % (
             type(self).__name__,
-            ', '.join('%s=%s' % item for item in vars(self).items())
+            ', '.join('%s=%s' % item for item in attributes(self))
         )
 
     cls.__str__ = __str__
@@ -79,4 +97,4 @@ def toGlMatrix(matrix4):
     :return: Matrix to be used by OpenGL
     :rtype: No Idea
     """
-    return (GLdouble * 16)(*matrix4)
+    return (ctypes.c_double * 16)(*matrix4)
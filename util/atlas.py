@@ -0,0 +1,315 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import ctypes
+
+import numpy
+from pyglet.gl import *
+from util import auto_str
+from util.texture import bind_texture, decode_image, texture_manager, texture_memory
+from util.texturecache import CachedImage, downsample, image_texels, mipmap_chain, resize_power_of_two
+
+
+def fit_texels(image, width, height):
+    """
+    Scales an image to the given size as RGBA texels, starting from the smallest mipmap level that is not smaller
+
+    :param image: Decoded image
+    :type image: :class:`pyglet.image.ImageData`, :class:`util.texturecache.CachedImage`
+    :param width: Width of the texels
+    :type width: int
+    :param height: Height of the texels
+    :type height: int
+    :return: Texels as (height, width, 4) array with the rows from bottom to top
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    if isinstance(image, CachedImage):
+        levels = image.levels
+    else:
+        levels = mipmap_chain(resize_power_of_two(image_texels(image)))
+    texels = levels[0]
+    for level in levels[1:]:
+        if level.shape[0] < height or level.shape[1] < width:
+            break
+        texels = level
+    rows = numpy.arange(height) * texels.shape[0] // height
+    columns = numpy.arange(width) * texels.shape[1] // width
+    texels = numpy.asarray(texels)[rows][:, columns]
+    if texels.shape[2] == 3:
+        texels = numpy.concatenate((texels, numpy.full((height, width, 1), 255, dtype=numpy.uint8)), axis=2)
+    return texels
+
+
+def pad_tile(texels, padding):
+    """
+    Adds the border around the texels of a tile. The textures wrap around the bodies horizontally, so the left and
+    right border continue the texels from the other side and there is no seam at the date line. The top and bottom
+    border repeat the edge texels, as the poles do not wrap.
+
+    :param texels: RGBA texels as (height, width, 4) array
+    :type texels: :class:`numpy.ndarray`
+    :param padding: Width of the border
+    :type padding: int
+    :return: Texels with the border as (height + 2 * padding, width + 2 * padding, 4) array
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    texels = numpy.pad(texels, ((0, 0), (padding, padding), (0, 0)), mode="wrap")
+    return numpy.pad(texels, ((padding, padding), (0, 0), (0, 0)), mode="edge")
+
+
+@auto_str
+class TextureAtlas(object):
+    """
+    One texture that holds many small textures in a grid of equally sized tiles, so bodies with textures in the
+    same atlas are drawn one after another without binding another texture. The textures are scaled to the size of
+    the tiles and the texture matrix maps the texture coordinates into their tile. Every tile is surrounded by a
+    border, see :func:`pad_tile`, the atlas only has as many mipmap levels as the border is wide, so filtering
+    does not bleed into the neighbouring tiles.
+
+    :var width: Width of the atlas
+    :type width: int
+    :var height: Height of the atlas
+    :type height: int
+    :var tile_width: Width of the textures in the atlas
+    :type tile_width: int
+    :var tile_height: Height of the textures in the atlas
+    :type tile_height: int
+    :var padding: Width of the border around every tile
+    :type padding: int
+    :var levels: Number of mipmap levels
+    :type levels: int
+    :var manager: Manager that counts the memory of the atlas
+    :type manager: :class:`util.texture.TextureManager`
+    :var id: Name of the texture, None until the first texture is uploaded
+    :type id: int, None
+    :var memory: GPU memory used by the atlas in bytes
+    :type memory: int
+    """
+
+    def __init__(self, width=2048, height=1024, tile_width=256, tile_height=128, padding=8, manager=None):
+        """
+        Creates an empty atlas, the texture is created when the first texture is uploaded
+
+        :param width: Width of the atlas
+        :type width: int
+        :param height: Height of the atlas
+        :type height: int
+        :param tile_width: Width of the textures in the atlas
+        :type tile_width: int
+        :param tile_height: Height of the textures in the atlas
+        :type tile_height: int
+        :param padding: Width of the border around every tile, a power of two
+        :type padding: int
+        :param manager: Manager that counts the memory of the atlas, None for texture_manager
+        :type manager: :class:`util.texture.TextureManager`, None
+        :raise ValueError: The tiles can not be halved for every mipmap level or do not fit into the atlas
+        """
+
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.padding = padding
+        self.levels = padding.bit_length()
+        self.manager = manager if manager is not None else texture_manager
+        self.id = None
+        self.memory = 0
+
+        self._slot_width = tile_width + 2 * padding
+        self._slot_height = tile_height + 2 * padding
+        # every level has to start at whole texels, otherwise the tiles of the coarse levels are shifted
+        if self._slot_width % padding or self._slot_height % padding:
+            raise ValueError("tiles of %dx%d can not be halved %d times" % (tile_width, tile_height, self.levels - 1))
+        self._columns = width // self._slot_width
+        self._rows = height // self._slot_height
+        if not self._columns or not self._rows:
+            raise ValueError("tiles of %dx%d do not fit into an atlas of %dx%d" % (tile_width, tile_height, width, height))
+        self._next = 0
+
+    @property
+    def full(self):
+        """
+        True if all tiles are taken
+
+        :rtype: bool
+        """
+
+        return self._next >= self._columns * self._rows
+
+    @property
+    def streamable(self):
+        """
+        The atlas always keeps all levels resident, see :class:`util.residency.ResidencyManager`
+
+        :rtype: bool
+        """
+
+        return False
+
+    def add(self, filename, loader=None):
+        """
+        Takes the next free tile for a texture
+
+        :param filename: Filename of the texture (Loads from pyglet resource loader)
+        :type filename: str
+        :param loader: Loader to decode the texture in the background, None to load it right away
+        :type loader: :class:`util.texture.TextureLoader`, None
+        :return: The texture in the atlas
+        :rtype: :class:`AtlasTexture`
+        :raise ValueError: The atlas is full
+        """
+
+        if self.full:
+            raise ValueError("texture atlas is full")
+        self._next += 1
+        return AtlasTexture(filename, self, self._next - 1, loader)
+
+    def _slot(self, tile):
+        """
+        Get the position of the tile including its border
+
+        :param tile: Index of the tile
+        :type tile: int
+        :return: x and y of the lower left corner in texels
+        :rtype: tuple
+        """
+
+        return tile % self._columns * self._slot_width, tile // self._columns * self._slot_height
+
+    def region(self, tile):
+        """
+        Get the region of the tile without its border in texture coordinates
+
+        :param tile: Index of the tile
+        :type tile: int
+        :return: Region as (u, v, width, height)
+        :rtype: tuple
+        """
+
+        x, y = self._slot(tile)
+        return ((x + self.padding) / self.width, (y + self.padding) / self.height,
+                self.tile_width / self.width, self.tile_height / self.height)
+
+    def _create(self):
+        """
+        Creates the texture with all levels
+        """
+
+        texture_id = GLuint()
+        glGenTextures(1, ctypes.byref(texture_id))
+        self.id = texture_id.value
+        bind_texture(GL_TEXTURE_2D, self.id)
+        for level in range(self.levels):
+            glTexImage2D(GL_TEXTURE_2D, level, GL_RGBA, self.width >> level, self.height >> level, 0,
+                         GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, self.levels - 1)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        if self.manager.anisotropy() > 1.0:
+            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, self.manager.anisotropy())
+
+        self.memory = texture_memory(self.width, self.height, self.levels)
+        self.manager.add(self)
+
+    def upload(self, tile, texels):
+        """
+        Uploads the texels of a tile with its border and all levels
+
+        :param tile: Index of the tile
+        :type tile: int
+        :param texels: RGBA texels with the size of the tiles as (height, width, 4) array
+        :type texels: :class:`numpy.ndarray`
+        """
+
+        if self.id is None:
+            self._create()
+        x, y = self._slot(tile)
+        texels = pad_tile(texels, self.padding)
+        bind_texture(GL_TEXTURE_2D, self.id)
+        for level in range(self.levels):
+            if level:
+                texels = downsample(texels)
+            glTexSubImage2D(GL_TEXTURE_2D, level, x >> level, y >> level, texels.shape[1], texels.shape[0],
+                            GL_RGBA, GL_UNSIGNED_BYTE, texels.ctypes.data)
+
+    def delete(self):
+        """
+        Releases the texture on the GPU, the textures in the atlas are not ready anymore afterwards
+        """
+
+        if self.id is not None:
+            glDeleteTextures(1, ctypes.byref(GLuint(self.id)))
+        self.manager.remove(self)
+        self.id = None
+        self.memory = 0
+
+
+@auto_str
+class AtlasTexture(object):
+    """
+    A texture in a tile of a :class:`TextureAtlas`, it is loaded and drawn like a :class:`util.texture.Texture`
+
+    :var filename: Filename of the texture
+    :type filename: str
+    :var atlas: Atlas the texture is in
+    :type atlas: :class:`TextureAtlas`
+    :var tile: Index of the tile in the atlas
+    :type tile: int
+    :var region: Region of the tile as (u, v, width, height) in texture coordinates of the atlas
+    :type region: tuple
+    :var manager: Manager of the atlas
+    :type manager: :class:`util.texture.TextureManager`
+    :var ready: True once the texture is uploaded
+    :type ready: bool
+    """
+
+    def __init__(self, filename, atlas, tile, loader=None):
+        """
+        Loads the texture and uploads it into its tile, use :meth:`TextureAtlas.add` to create it
+
+        :param filename: Filename of the texture (Loads from pyglet resource loader)
+        :type filename: str
+        :param atlas: Atlas the texture is in
+        :type atlas: :class:`TextureAtlas`
+        :param tile: Index of the tile in the atlas
+        :type tile: int
+        :param loader: Loader to decode the texture in the background, None to load it right away
+        :type loader: :class:`util.texture.TextureLoader`, None
+        """
+        print("Loading Texture " + filename + " into atlas")
+
+        self.filename = filename
+        self.atlas = atlas
+        self.tile = tile
+        self.region = atlas.region(tile)
+        self.manager = atlas.manager
+        self.ready = False
+
+        if loader is None:
+            self.upload(decode_image(filename))
+        else:
+            loader.load(self)
+
+    def upload(self, image):
+        """
+        Scales the decoded image to the size of the tile and uploads it, after that the texture is ready to be drawn
+
+        :param image: Decoded image
+        :type image: :class:`pyglet.image.ImageData`, :class:`util.texturecache.CachedImage`
+        """
+
+        self.atlas.upload(self.tile, fit_texels(image, self.atlas.tile_width, self.atlas.tile_height))
+        self.ready = True
+
+    def draw(self):
+        """
+        Enable and bind the atlas and map the texture coordinates to the tile, it has to be ready
+        """
+
+        glEnable(GL_TEXTURE_2D)
+        bind_texture(GL_TEXTURE_2D, self.atlas.id, self.region)
@@ -0,0 +1,219 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import inf
+
+import numpy
+from util import auto_str
+from util.ray import intersect_spheres
+
+
+def morton_codes(points, bits=10):
+    """
+    Calculates the Morton code of every point, points close to each other have codes close to each other
+
+    :param points: Points as (N, 3) array
+    :type points: :class:`numpy.ndarray`
+    :param bits: Bits per axis, at most 21
+    :type bits: int
+    :return: Codes with the bits of x, y and z interleaved
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    low = points.min(axis=0)
+    size = numpy.maximum(points.max(axis=0) - low, 1e-12)
+    cells = ((points - low) / size * ((1 << bits) - 1)).astype(numpy.uint64)
+    codes = numpy.zeros(len(points), dtype=numpy.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> numpy.uint64(bit)) & numpy.uint64(1)) << numpy.uint64(3 * bit + 2 - axis)
+    return codes
+
+
+@auto_str
+class BoundingVolumeHierarchy(object):
+    """
+    A tree of axis aligned bounding boxes over spheres that finds the nearest sphere hit by a ray without testing
+    all of them. The spheres are sorted along a Morton curve and grouped into leaves of neighbouring spheres,
+    the leaves form a complete binary tree stored as array. When the spheres move, only the boxes are refitted,
+    the tree is built again once the refitted boxes got too large. Rays are traced through the tree level by level,
+    with all boxes of a level tested at once.
+
+    :var radii: Radius of every sphere
+    :type radii: :class:`numpy.ndarray`
+    :var leaf_size: Maximum number of spheres per leaf
+    :type leaf_size: int
+    :var rebuild_growth: The tree is built again when the boxes of the leaves grew by this factor since the last build
+    :type rebuild_growth: float
+    """
+
+    # depth of the first level that is tested and number of levels that are skipped between tested levels
+    _first_depth = 6
+    _depth_step = 2
+
+    def __init__(self, radii, leaf_size=8, rebuild_growth=2.0):
+        """
+        Creates an empty tree, it is built with the first call to refit
+
+        :param radii: Radius of every sphere
+        :type radii: :class:`numpy.ndarray`
+        :param leaf_size: Maximum number of spheres per leaf
+        :type leaf_size: int
+        :param rebuild_growth: The tree is built again when the boxes of the leaves grew by this factor since the last build
+        :type rebuild_growth: float
+        """
+
+        self.radii = numpy.asarray(radii, dtype=numpy.float64)
+        self.leaf_size = leaf_size
+        self.rebuild_growth = rebuild_growth
+
+        self._centers = None
+        self._order = None
+        self._leaf_radii = None
+        self._depth = 0
+        self._bounds = None
+        self._built_size = 0.0
+
+    def build(self, centers):
+        """
+        Sorts the spheres into leaves and fits the boxes around them
+
+        :param centers: Center of every sphere as (N, 3) array
+        :type centers: :class:`numpy.ndarray`
+        """
+
+        count = len(self.radii)
+        depth = 0
+        while (1 << depth) * self.leaf_size < count:
+            depth += 1
+        leaves = 1 << depth
+        # slots of leaves that are not full hold an empty sphere with a radius of -inf
+        order = numpy.zeros(leaves * self.leaf_size, dtype=numpy.int64)
+        radii = numpy.full(leaves * self.leaf_size, -inf)
+        if count:
+            order[:count] = numpy.argsort(morton_codes(centers), kind="stable")
+            radii[:count] = self.radii[order[:count]]
+        # slot k of every leaf is stored next to each other, so reducing over the slots is fast
+        self._order = order.reshape(leaves, self.leaf_size).T.copy()
+        self._leaf_radii = radii.reshape(leaves, self.leaf_size).T.copy()
+        self._depth = depth
+        self._bounds = numpy.empty((2 * leaves, 6), dtype=numpy.float64)
+        self._fit(centers)
+        self._built_size = self._leaf_size()
+
+    def refit(self, centers):
+        """
+        Fits the boxes around the moved spheres, the tree is built the first time and when the boxes got too large
+
+        :param centers: Center of every sphere as (N, 3) array in the same order as the radii
+        :type centers: :class:`numpy.ndarray`
+        """
+
+        if self._order is None:
+            self.build(centers)
+            return
+        self._fit(centers)
+        if self._leaf_size() > self._built_size * self.rebuild_growth:
+            self.build(centers)
+
+    def _fit(self, centers):
+        """
+        Calculates the boxes of the leaves from the spheres and of all other nodes from their children
+
+        :param centers: Center of every sphere as (N, 3) array
+        :type centers: :class:`numpy.ndarray`
+        """
+
+        self._centers = numpy.asarray(centers, dtype=numpy.float64)
+        leaves = 1 << self._depth
+        bounds = self._bounds
+        if not len(self.radii):
+            bounds[:, :3] = inf
+            bounds[:, 3:] = -inf
+            return
+        slots = numpy.take(self._centers, self._order.ravel(), axis=0).reshape(self.leaf_size, leaves, 3)
+        radii = self._leaf_radii[:, :, None]
+        # empty slots give a low corner of inf and a high corner of -inf
+        bounds[leaves:, :3] = numpy.subtract(slots, radii).min(axis=0)
+        bounds[leaves:, 3:] = numpy.add(slots, radii, out=slots).max(axis=0)
+        # node i has the children 2i and 2i + 1, the root is node 1
+        level = leaves // 2
+        while level >= 1:
+            children = bounds[2 * level:4 * level]
+            numpy.minimum(children[0::2, :3], children[1::2, :3], out=bounds[level:2 * level, :3])
+            numpy.maximum(children[0::2, 3:], children[1::2, 3:], out=bounds[level:2 * level, 3:])
+            level //= 2
+
+    def _leaf_size(self):
+        """
+        Get the sum of the edges of the boxes of all leaves that are not empty
+
+        :return: Measure of how tight the leaves are
+        :rtype: float
+        """
+
+        leaves = self._bounds[1 << self._depth:]
+        extents = leaves[:, 3:] - leaves[:, :3]
+        return float(extents[numpy.isfinite(extents).all(axis=1)].sum())
+
+    def intersect(self, ray):
+        """
+        Finds the nearest sphere hit by the ray
+
+        :param ray: Ray to check, the direction has to be normalized
+        :type ray: :class:`util.ray.Ray`
+        :return: Index of the sphere and distance from the origin of the ray to the hit, None if no sphere is hit
+        :rtype: tuple, None
+        """
+
+        if self._order is None or not len(self.radii):
+            return None
+
+        origin = numpy.array((ray.origin.x, ray.origin.y, ray.origin.z))
+        direction = numpy.array((ray.direction.x, ray.direction.y, ray.direction.z))
+        # a huge factor instead of infinity, so boxes touching the origin do not give nan
+        inverse = 1.0 / numpy.where(direction != 0.0, direction, 1e-300)
+
+        depth = min(self._first_depth, self._depth)
+        nodes = numpy.arange(1 << depth, 2 << depth)
+        nodes = nodes[self._hit_boxes(nodes, origin, inverse)]
+        while depth < self._depth and len(nodes):
+            step = min(self._depth_step, self._depth - depth)
+            nodes = ((nodes[:, None] << step) + numpy.arange(1 << step)).ravel()
+            nodes = nodes[self._hit_boxes(nodes, origin, inverse)]
+            depth += step
+        if not len(nodes):
+            return None
+
+        leaves = nodes - (1 << self._depth)
+        radii = self._leaf_radii[:, leaves].ravel()
+        indices = self._order[:, leaves].ravel()[radii > -inf]
+        distances = intersect_spheres(ray, self._centers[indices], self.radii[indices])
+        nearest = int(numpy.argmin(distances))
+        if distances[nearest] == inf:
+            return None
+        return int(indices[nearest]), float(distances[nearest])
+
+    def _hit_boxes(self, nodes, origin, inverse):
+        """
+        Checks which boxes the ray hits
+
+        :param nodes: Indices of the nodes
+        :type nodes: :class:`numpy.ndarray`
+        :param origin: Origin of the ray
+        :type origin: :class:`numpy.ndarray`
+        :param inverse: Inverse of the direction of the ray
+        :type inverse: :class:`numpy.ndarray`
+        :return: Boolean array, True for the boxes that are hit in front of the origin
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        bounds = self._bounds[nodes]
+        t0 = (bounds[:, :3] - origin) * inverse
+        t1 = (bounds[:, 3:] - origin) * inverse
+        near = numpy.minimum(t0, t1).max(axis=1)
+        far = numpy.maximum(t0, t1).min(axis=1)
+        return (far >= numpy.maximum(near, 0.0)) & (bounds[:, 0] <= bounds[:, 3])
@@ -0,0 +1,75 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import sqrt
+
+import numpy
+from util import auto_str
+
+
+@auto_str
+class Frustum(object):
+    """
+    The view frustum of a Model-View-Projection matrix, used to skip everything that is not on screen
+
+    :var planes: The left, right, bottom, top, near and far plane as (a, b, c, d) tuples with normals pointing
+                 into the frustum, a point is inside if a * x + b * y + c * z + d >= 0 for all planes
+    :type planes: list
+    """
+
+    def __init__(self, matrix):
+        """
+        Extracts the planes of the frustum from the matrix
+
+        :param matrix: Model-View-Projection matrix
+        :type matrix: :class:`euclid.Matrix4`
+        """
+
+        rows = ((matrix.a, matrix.b, matrix.c, matrix.d),
+                (matrix.e, matrix.f, matrix.g, matrix.h),
+                (matrix.i, matrix.j, matrix.k, matrix.l))
+        w = (matrix.m, matrix.n, matrix.o, matrix.p)
+
+        self.planes = []
+        for row in rows:
+            for sign in (1, -1):
+                plane = tuple(w[i] + sign * row[i] for i in range(4))
+                length = sqrt(plane[0] ** 2 + plane[1] ** 2 + plane[2] ** 2)
+                self.planes.append(tuple(value / length for value in plane))
+
+    def intersects_sphere(self, center, radius):
+        """
+        Checks if the sphere is at least partially inside the frustum
+
+        :param center: Center of the sphere
+        :type center: :class:`euclid.Vector3`
+        :param radius: Radius of the sphere
+        :type radius: float
+        :return: False if the sphere is completely outside, otherwise True
+        :rtype: bool
+        """
+
+        x, y, z = center.x, center.y, center.z
+        for a, b, c, d in self.planes:
+            if a * x + b * y + c * z + d < -radius:
+                return False
+        return True
+
+    def intersects_spheres(self, centers, radii):
+        """
+        Checks for many spheres at once if they are at least partially inside the frustum
+
+        :param centers: Centers of the spheres as (N, 3) array
+        :type centers: :class:`numpy.ndarray`
+        :param radii: Radii of the spheres
+        :type radii: :class:`numpy.ndarray`
+        :return: Boolean array, False for the spheres that are completely outside
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        planes = numpy.array(self.planes, dtype=numpy.float64)
+        distances = numpy.dot(centers, planes[:, :3].T) + planes[:, 3]
+        return numpy.all(distances >= -numpy.asarray(radii)[:, None], axis=1)
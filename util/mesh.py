@@ -0,0 +1,105 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+from math import sin, cos, pi
+
+import pyglet
+from pyglet.gl import *
+from util import auto_str
+
+# meshes shared by everything that draws spheres, by slices and stacks
+_sphere_meshes = {}
+
+
+@auto_str
+class SphereMesh(object):
+    """
+    A sphere with radius 1 in a vertex buffer object, tessellated and textured the same way as gluSphere.
+    Scale the modelview matrix to draw spheres of other sizes.
+
+    :var slices: Number of subdivisions around the z axis
+    :type slices: int
+    :var stacks: Number of subdivisions along the z axis
+    :type stacks: int
+    """
+
+    def __init__(self, slices, stacks):
+        """
+        Tessellates the sphere and uploads it to the GPU
+
+        :param slices: Number of subdivisions around the z axis
+        :type slices: int
+        :param stacks: Number of subdivisions along the z axis
+        :type stacks: int
+        """
+
+        self.slices = slices
+        self.stacks = stacks
+
+        vertices, texcoords, indices = tessellate_sphere(slices, stacks)
+
+        # on a unit sphere the normals are the vertices
+        self._vertex_list = pyglet.graphics.vertex_list_indexed(len(vertices) // 3, indices,
+                                                                ('v3f/static', vertices),
+                                                                ('n3f/static', vertices),
+                                                                ('t2f/static', texcoords))
+
+    def draw(self):
+        """
+        Draws the sphere with the current matrix
+        """
+
+        self._vertex_list.draw(GL_TRIANGLES)
+
+
+def tessellate_sphere(slices, stacks):
+    """
+    Tessellates a sphere with radius 1 the same way as gluSphere
+
+    :param slices: Number of subdivisions around the z axis
+    :type slices: int
+    :param stacks: Number of subdivisions along the z axis
+    :type stacks: int
+    :return: Flat lists of the vertices, texture coordinates and triangle indices
+    :rtype: tuple
+    """
+
+    vertices = []
+    texcoords = []
+    for i in range(stacks + 1):
+        rho = i * pi / stacks
+        for j in range(slices + 1):
+            theta = 0.0 if j == slices else j * 2.0 * pi / slices
+            vertices.extend((-sin(theta) * sin(rho), cos(theta) * sin(rho), cos(rho)))
+            texcoords.extend((j / slices, 1.0 - i / stacks))
+
+    # two triangles for every quad of the quad strips gluSphere would draw
+    indices = []
+    for i in range(stacks):
+        for j in range(slices):
+            a = i * (slices + 1) + j
+            b = a + slices + 1
+            indices.extend((a, b, a + 1, a + 1, b, b + 1))
+
+    return vertices, texcoords, indices
+
+
+def sphere_mesh(slices=50, stacks=50):
+    """
+    Get the shared sphere mesh with the given tessellation, it is created on first use
+
+    :param slices: Number of subdivisions around the z axis
+    :type slices: int
+    :param stacks: Number of subdivisions along the z axis
+    :type stacks: int
+    :return: Shared sphere mesh
+    :rtype: :class:`SphereMesh`
+    """
+
+    key = (slices, stacks)
+    if key not in _sphere_meshes:
+        _sphere_meshes[key] = SphereMesh(slices, stacks)
+    return _sphere_meshes[key]
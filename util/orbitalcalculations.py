@@ -5,11 +5,18 @@ Created on 02.12.2015
 """
 
 import datetime
+import sys
 from math import cos, sin, pi, atan2, sqrt, fabs
 
+import numpy
+
 tau = 2 * pi
 gravitational_constant = 6.67408 * 10 ** -11
 
+# residual of Kepler's equation that is reachable with doubles for anomalies up to 2pi
+kepler_tolerance = 16 * sys.float_info.epsilon
+kepler_max_iterations = 64
+
 J2000 = datetime.datetime(year=2000, month=1, day=1, hour=12, minute=0, second=0)
 
 
@@ -22,6 +29,9 @@ def eccentric_anomaly_from_mean(eccentricity, mean_anomaly, precision=50, max_it
     Convert mean anomaly to eccentric anomaly.
     Source: https://github.com/skyfielders/python-skyfield/blob/master/skyfield/keplerianlib.py
 
+    The default precision can not be reached with doubles, so this usually runs all max_iterations.
+    Use :func:`solve_kepler` for a solver that stops once the result is as exact as a double allows.
+
     :param e: Eccentricity
     :type e: float
     :param M: Mean anomaly in radians
@@ -72,3 +82,140 @@ def true_anomaly_from_eccentric(e, E):
     """
 
     return 2 * atan2(sqrt(1.0 + e) * sin(E / 2.0), sqrt(1.0 - e) * cos(E / 2.0))
+
+
+def kepler_first_guess(eccentricity, m):
+    """
+    Danby's starting value for Kepler's equation of one orbit or an array of orbits.
+    Unlike E = M it stays close to the root for high eccentricities.
+
+    :param eccentricity: Eccentricity
+    :type eccentricity: float, :class:`numpy.ndarray`
+    :param m: Mean anomaly in radians, normalized to [0, 2pi)
+    :type m: float, :class:`numpy.ndarray`
+    :return: First guess for the eccentric anomaly in radians
+    :rtype: float, :class:`numpy.ndarray`
+    """
+
+    return m + 0.85 * eccentricity * numpy.sign(numpy.sin(m))
+
+
+def solve_kepler(eccentricity, mean_anomaly, tolerance=kepler_tolerance, max_iterations=kepler_max_iterations):
+    """
+    Convert mean anomaly to eccentric anomaly.
+    Uses Newton steps inside a bracket around the root. If a Newton step leaves the bracket a Halley step is tried,
+    if that leaves the bracket as well the bracket is bisected, so the solver always converges.
+
+    :param eccentricity: Eccentricity
+    :type eccentricity: float
+    :param mean_anomaly: Mean anomaly in radians
+    :type mean_anomaly: float
+    :param tolerance: Maximum residual of Kepler's equation
+    :type tolerance: float
+    :param max_iterations: Max iterations
+    :type max_iterations: int
+    :return: Eccentric anomaly in radians and the number of iterations needed
+    :rtype: tuple
+    :raise ConvergenceError: Solution did not converge within max_iterations
+    """
+
+    m = mean_anomaly % tau
+    # the same first guess as solve_kepler_array, so both take the same steps
+    eccentric_anomaly = float(kepler_first_guess(eccentricity, m))
+
+    # E - e * sin(E) - M is monotonic, 0 <= M < 2pi puts the root into [0, 2pi]
+    lower = 0.0
+    upper = tau
+
+    for iterations in range(max_iterations + 1):
+        sin_anomaly = sin(eccentric_anomaly)
+        test = eccentric_anomaly - eccentricity * sin_anomaly - m
+        if fabs(test) <= tolerance or upper - lower <= tolerance:
+            return eccentric_anomaly, iterations
+        if iterations == max_iterations:
+            break
+
+        if test < 0:
+            lower = eccentric_anomaly
+        else:
+            upper = eccentric_anomaly
+
+        derivative = 1.0 - eccentricity * cos(eccentric_anomaly)
+        guess = eccentric_anomaly - test / derivative
+        # close to a root at the end of the bracket, like at M = 0, rounding puts the step just outside of it,
+        # steps that are outside by no more than the tolerance are kept instead of bisecting
+        if not lower - tolerance <= guess <= upper + tolerance:
+            guess = eccentric_anomaly - 2.0 * test * derivative / (2.0 * derivative ** 2 - test * eccentricity * sin_anomaly)
+            if not lower - tolerance <= guess <= upper + tolerance:
+                guess = (lower + upper) / 2.0
+        eccentric_anomaly = guess
+
+    raise ConvergenceError("Kepler's equation did not converge for e=%f, M=%f" % (eccentricity, mean_anomaly))
+
+
+def solve_kepler_array(eccentricities, mean_anomalies, tolerance=kepler_tolerance, max_iterations=kepler_max_iterations):
+    """
+    Vectorized version of :func:`solve_kepler`. Each step only updates the entries that have not converged yet.
+
+    :param eccentricities: Eccentricities
+    :type eccentricities: :class:`numpy.ndarray`
+    :param mean_anomalies: Mean anomalies in radians
+    :type mean_anomalies: :class:`numpy.ndarray`
+    :param tolerance: Maximum residual of Kepler's equation
+    :type tolerance: float
+    :param max_iterations: Max iterations
+    :type max_iterations: int
+    :return: Eccentric anomalies in radians and the number of iterations needed for each of them
+    :rtype: tuple
+    :raise ConvergenceError: Solution did not converge within max_iterations
+    """
+
+    e, m = numpy.broadcast_arrays(numpy.asarray(eccentricities, dtype=numpy.float64), numpy.remainder(mean_anomalies, tau))
+    e = e.ravel()
+    m = m.ravel()
+
+    eccentric_anomaly = kepler_first_guess(e, m)
+    iterations = numpy.zeros(m.shape, dtype=numpy.int32)
+    lower = numpy.zeros(m.shape)
+    upper = numpy.full(m.shape, tau)
+
+    active = numpy.arange(m.size)
+    for step in range(max_iterations + 1):
+        ea = eccentric_anomaly[active]
+        ee = e[active]
+        lo = lower[active]
+        hi = upper[active]
+
+        sin_anomaly = numpy.sin(ea)
+        test = ea - ee * sin_anomaly - m[active]
+        running = (numpy.abs(test) > tolerance) & (hi - lo > tolerance)
+        active = active[running]
+        if active.size == 0:
+            break
+        if step == max_iterations:
+            raise ConvergenceError("Kepler's equation did not converge for %d orbits" % active.size)
+
+        ea = ea[running]
+        ee = ee[running]
+        test = test[running]
+        sin_anomaly = sin_anomaly[running]
+        below = test < 0
+        lo = numpy.where(below, ea, lo[running])
+        hi = numpy.where(below, hi[running], ea)
+
+        derivative = 1.0 - ee * numpy.cos(ea)
+        guess = ea - test / derivative
+        outside = ~((lo - tolerance <= guess) & (guess <= hi + tolerance))
+        if outside.any():
+            halley = ea - 2.0 * test * derivative / (2.0 * derivative ** 2 - test * ee * sin_anomaly)
+            guess = numpy.where(outside, halley, guess)
+            outside = ~((lo - tolerance <= guess) & (guess <= hi + tolerance))
+            guess = numpy.where(outside, (lo + hi) / 2.0, guess)
+
+        eccentric_anomaly[active] = guess
+        lower[active] = lo
+        upper[active] = hi
+        iterations[active] += 1
+
+    shape = numpy.broadcast(eccentricities, mean_anomalies).shape
+    return eccentric_anomaly.reshape(shape), iterations.reshape(shape)
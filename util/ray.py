@@ -4,6 +4,9 @@ Created on 09.12.2015
 :author: Rene Hollander
 """
 
+from math import inf, sqrt
+
+import numpy
 from util import auto_str
 
 
@@ -30,3 +33,64 @@ class Ray(object):
 
         self.origin = origin
         self.direction = direction
+
+
+def intersect_sphere(ray, center, radius):
+    """
+    Calculates where the ray hits a sphere first
+
+    :param ray: Ray to check, the direction has to be normalized
+    :type ray: :class:`Ray`
+    :param center: Center of the sphere
+    :type center: :class:`euclid.Vector3`
+    :param radius: Radius of the sphere
+    :type radius: float
+    :return: Distance from the origin to the first hit in front of it, inf if the sphere is missed
+    :rtype: float
+    """
+
+    x = ray.origin.x - center.x
+    y = ray.origin.y - center.y
+    z = ray.origin.z - center.z
+    b = ray.direction.x * x + ray.direction.y * y + ray.direction.z * z
+    q = b * b - (x * x + y * y + z * z) + radius * radius
+    if q < 0:
+        return inf
+    root = sqrt(q)
+    if root - b <= 0:
+        return inf
+    # the far hit if the origin is inside the sphere
+    return -b - root if -b - root > 0 else root - b
+
+
+def intersect_spheres(ray, centers, radii, out=None):
+    """
+    Calculates where the ray hits each of the spheres first, solving the quadratic for all of them at once
+
+    :param ray: Ray to check, the direction has to be normalized
+    :type ray: :class:`Ray`
+    :param centers: Centers of the spheres as (N, 3) array
+    :type centers: :class:`numpy.ndarray`
+    :param radii: Radii of the spheres
+    :type radii: :class:`numpy.ndarray`
+    :param out: Optional array of N floats to write the distances into
+    :type out: :class:`numpy.ndarray`
+    :return: Distance from the origin to the first hit in front of it for every sphere, inf if it is missed
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    # with o the origin relative to the center: t = -b -+ sqrt(b^2 - o.o + r^2), b = d.o
+    offsets = numpy.subtract((ray.origin.x, ray.origin.y, ray.origin.z), centers)
+    b = offsets.dot((ray.direction.x, ray.direction.y, ray.direction.z))
+    q = numpy.einsum("ij,ij->i", offsets, offsets)
+    numpy.subtract(numpy.square(radii), q, out=q)
+    q += b * b
+    missed = q < 0.0
+    root = numpy.sqrt(q, out=q, where=~missed)
+    numpy.negative(b, out=b)
+    # the near hit -b - root, or the far one -b + root if the origin is inside the sphere
+    distances = numpy.subtract(b, root, out=out)
+    inside = distances <= 0.0
+    numpy.add(b, root, out=distances, where=inside)
+    distances[missed | (distances <= 0.0)] = inf
+    return distances
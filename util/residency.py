@@ -0,0 +1,162 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import heapq
+import math
+import time
+import weakref
+
+from util import auto_str
+from util.texture import texture_manager, texture_memory
+
+
+@auto_str
+class ResidencyManager(object):
+    """
+    Keeps only the mipmap levels of the textures resident on the GPU that are needed for their size on screen.
+    Textures start with only their coarse levels, finer levels are streamed in from the texture cache as the camera
+    approaches and released again when the texture gets small or leaves the screen. If the textures need more memory
+    than the budget, the textures with the most texels per pixel are made coarser first.
+    Only textures loaded from a :class:`util.texturecache.TextureCache` with mipmaps can be streamed.
+
+    :var manager: Manager of the textures that are streamed
+    :type manager: :class:`util.texture.TextureManager`
+    :var budget: GPU memory all textures may use in bytes
+    :type budget: int
+    :var min_size: Width and height of the finest level that is always resident
+    :type min_size: int
+    :var upload_budget: Time in seconds that may be spent uploading levels per update
+    :type upload_budget: float
+    :var linger: Time in seconds a texture keeps its levels after it was requested the last time
+    :type linger: float
+    """
+
+    def __init__(self, budget=256 * 1024 * 1024, min_size=64, upload_budget=0.002, linger=2.0, manager=None):
+        """
+        Creates a new residency manager, textures uploaded afterwards start with only the levels up to min_size
+
+        :param budget: GPU memory all textures may use in bytes
+        :type budget: int
+        :param min_size: Width and height of the finest level that is always resident
+        :type min_size: int
+        :param upload_budget: Time in seconds that may be spent uploading levels per update
+        :type upload_budget: float
+        :param linger: Time in seconds a texture keeps its levels after it was requested the last time
+        :type linger: float
+        :param manager: Manager of the textures that are streamed, None for texture_manager
+        :type manager: :class:`util.texture.TextureManager`, None
+        """
+
+        self.manager = manager if manager is not None else texture_manager
+        self.manager.initial_size = min_size
+        self.budget = budget
+        self.min_size = min_size
+        self.upload_budget = upload_budget
+        self.linger = linger
+        self._requests = weakref.WeakKeyDictionary()
+
+    def request(self, texture, size):
+        """
+        Requests the resolution a texture is drawn with, has to be called every time the texture is drawn
+
+        :param texture: Texture that is drawn
+        :type texture: :class:`util.texture.Texture`
+        :param size: Width in pixels the whole width of the texture covers on screen
+        :type size: float
+        """
+
+        self._requests[texture] = (size, time.perf_counter())
+
+    def requested_size(self, texture, now=None):
+        """
+        Get the size the texture was requested with, textures not requested within the linger time have no size
+
+        :param texture: Texture
+        :type texture: :class:`util.texture.Texture`
+        :param now: Current time, see time.perf_counter
+        :type now: float, None
+        :return: Width in pixels the texture covers on screen, 0 if it is not on screen
+        :rtype: float
+        """
+
+        if now is None:
+            now = time.perf_counter()
+        size, last_time = self._requests.get(texture, (0.0, now))
+        return size if now - last_time <= self.linger else 0.0
+
+    def desired_level(self, texture, size):
+        """
+        Get the finest level needed to draw the texture in the given size
+
+        :param texture: Streamable texture
+        :type texture: :class:`util.texture.Texture`
+        :param size: Width in pixels the texture covers on screen
+        :type size: float
+        :return: Index of the level
+        :rtype: int
+        """
+
+        coarsest = texture.image.level_for_size(self.min_size)
+        if size >= texture.image.width:
+            return 0
+        if size <= 0:
+            return coarsest
+        return max(0, min(int(math.floor(math.log2(texture.image.width / size))), coarsest))
+
+    @staticmethod
+    def level_memory(texture, level):
+        """
+        Get the GPU memory a texture uses if the given level is its finest resident level
+
+        :param texture: Streamable texture
+        :type texture: :class:`util.texture.Texture`
+        :param level: Index of the finest level
+        :type level: int
+        :return: Memory in bytes
+        :rtype: int
+        """
+
+        image = texture.image
+        return texture_memory(image.width >> level, image.height >> level, len(image.levels) - level)
+
+    def update(self):
+        """
+        Releases the levels that are not needed anymore and uploads needed levels until the time budget is used up,
+        has to be called on the main thread once per frame
+        """
+
+        start = time.perf_counter()
+        textures = [texture for texture in self.manager.textures if texture.streamable]
+        sizes = {texture: self.requested_size(texture, start) for texture in textures}
+        wanted = {texture: self.desired_level(texture, sizes[texture]) for texture in textures}
+
+        # make the textures with the most texels per pixel coarser until everything fits into the budget
+        fixed = self.manager.memory - sum(texture.memory for texture in textures)
+        total = fixed + sum(self.level_memory(texture, wanted[texture]) for texture in textures)
+        heap = [(sizes[texture] * (1 << wanted[texture]) / texture.image.width, i, texture) for i, texture in enumerate(textures)]
+        heapq.heapify(heap)
+        while total > self.budget and heap:
+            _, i, texture = heapq.heappop(heap)
+            level = wanted[texture]
+            if level >= texture.image.level_for_size(self.min_size):
+                continue
+            total -= self.level_memory(texture, level) - self.level_memory(texture, level + 1)
+            wanted[texture] = level + 1
+            heapq.heappush(heap, (sizes[texture] * (1 << (level + 1)) / texture.image.width, i, texture))
+
+        # releasing levels is cheap and makes room, finer levels are uploaded one at a time, largest on screen first
+        for texture in textures:
+            if wanted[texture] > texture.base_level:
+                texture.set_base_level(wanted[texture])
+        upgrades = sorted((texture for texture in textures if wanted[texture] < texture.base_level),
+                          key=lambda texture: sizes[texture], reverse=True)
+        for texture in upgrades:
+            if time.perf_counter() - start >= self.upload_budget:
+                break
+            level = texture.base_level - 1
+            if self.manager.memory + self.level_memory(texture, level) - texture.memory > self.budget:
+                continue
+            texture.set_base_level(level)
@@ -0,0 +1,160 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import ctypes
+
+from pyglet.gl import *
+from util import auto_str
+
+
+class ShaderError(Exception):
+    """
+    Raised if a shader can not be compiled or linked
+    """
+
+    pass
+
+
+def compile_shader(shader_type, source):
+    """
+    Compiles a single shader
+
+    :param shader_type: Type of the shader (GL_VERTEX_SHADER, GL_FRAGMENT_SHADER)
+    :type shader_type: int
+    :param source: GLSL source of the shader
+    :type source: str
+    :return: Name of the shader object
+    :rtype: int
+    :raise ShaderError: The shader could not be compiled
+    """
+
+    shader = glCreateShader(shader_type)
+    buffer = ctypes.create_string_buffer(source.encode("utf-8"))
+    pointer = ctypes.cast(ctypes.pointer(ctypes.pointer(buffer)), ctypes.POINTER(ctypes.POINTER(GLchar)))
+    glShaderSource(shader, 1, pointer, None)
+    glCompileShader(shader)
+
+    status = GLint()
+    glGetShaderiv(shader, GL_COMPILE_STATUS, ctypes.byref(status))
+    if not status.value:
+        length = GLint()
+        glGetShaderiv(shader, GL_INFO_LOG_LENGTH, ctypes.byref(length))
+        log = ctypes.create_string_buffer(max(length.value, 1))
+        glGetShaderInfoLog(shader, length, None, ctypes.cast(log, ctypes.POINTER(GLchar)))
+        glDeleteShader(shader)
+        raise ShaderError("could not compile shader: " + log.value.decode("utf-8", "replace"))
+    return shader
+
+
+@auto_str
+class Shader(object):
+    """
+    A GLSL program made of a vertex and a fragment shader
+
+    :var program: Name of the program object
+    :type program: int
+    """
+
+    def __init__(self, vertex_source, fragment_source, attributes=None):
+        """
+        Compiles and links the program
+
+        :param vertex_source: GLSL source of the vertex shader
+        :type vertex_source: str
+        :param fragment_source: GLSL source of the fragment shader
+        :type fragment_source: str
+        :param attributes: Locations to bind the vertex attributes to by their name
+        :type attributes: dict
+        :raise ShaderError: The program could not be compiled or linked
+        """
+
+        shaders = (compile_shader(GL_VERTEX_SHADER, vertex_source), compile_shader(GL_FRAGMENT_SHADER, fragment_source))
+        self.program = glCreateProgram()
+        for shader in shaders:
+            glAttachShader(self.program, shader)
+        if attributes is not None:
+            for name, location in attributes.items():
+                glBindAttribLocation(self.program, location, ctypes.create_string_buffer(name.encode("utf-8")))
+        glLinkProgram(self.program)
+        # the shaders are deleted together with the program
+        for shader in shaders:
+            glDeleteShader(shader)
+
+        status = GLint()
+        glGetProgramiv(self.program, GL_LINK_STATUS, ctypes.byref(status))
+        if not status.value:
+            length = GLint()
+            glGetProgramiv(self.program, GL_INFO_LOG_LENGTH, ctypes.byref(length))
+            log = ctypes.create_string_buffer(max(length.value, 1))
+            glGetProgramInfoLog(self.program, length, None, ctypes.cast(log, ctypes.POINTER(GLchar)))
+            glDeleteProgram(self.program)
+            raise ShaderError("could not link shader program: " + log.value.decode("utf-8", "replace"))
+
+        self._uniforms = {}
+
+    def bind(self):
+        """
+        Use the program for the following draw calls
+        """
+
+        glUseProgram(self.program)
+
+    def unbind(self):
+        """
+        Go back to the fixed function pipeline
+        """
+
+        glUseProgram(0)
+
+    def uniform(self, name):
+        """
+        Get the location of a uniform variable
+
+        :param name: Name of the uniform
+        :type name: str
+        :return: Location of the uniform, -1 if the program does not use it
+        :rtype: int
+        """
+
+        if name not in self._uniforms:
+            self._uniforms[name] = glGetUniformLocation(self.program, ctypes.create_string_buffer(name.encode("utf-8")))
+        return self._uniforms[name]
+
+    def set_uniform_matrix(self, name, matrix):
+        """
+        Set a mat4 uniform, the program has to be bound
+
+        :param name: Name of the uniform
+        :type name: str
+        :param matrix: Value of the uniform
+        :type matrix: :class:`euclid.Matrix4`
+        """
+
+        glUniformMatrix4fv(self.uniform(name), 1, GL_FALSE, (GLfloat * 16)(*matrix[:]))
+
+    def set_uniform_float(self, name, value):
+        """
+        Set a float uniform, the program has to be bound
+
+        :param name: Name of the uniform
+        :type name: str
+        :param value: Value of the uniform
+        :type value: float
+        """
+
+        glUniform1f(self.uniform(name), value)
+
+    def set_uniform_vec3_array(self, name, values):
+        """
+        Set a vec3 array uniform, the program has to be bound
+
+        :param name: Name of the uniform
+        :type name: str
+        :param values: Values of the uniform as (N, 3) float32 array
+        :type values: :class:`numpy.ndarray`
+        """
+
+        glUniform3fv(self.uniform(name), len(values), values.ctypes.data_as(ctypes.POINTER(GLfloat)))
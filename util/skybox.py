@@ -6,6 +6,7 @@ Created on 29.11.2015
 
 from pyglet.gl import *
 from util import auto_str
+from util.mesh import sphere_mesh
 from util.texture import Texture
 
 
@@ -15,7 +16,7 @@ class SkySphere():
     A SkyBox that maps the texture to a sphere
     """
 
-    def __init__(self, filename, radius):
+    def __init__(self, filename, radius, loader=None):
         """
         Creates a new SkyShpere
 
@@ -23,21 +24,26 @@ class SkySphere():
         :type filename: str
         :param radius: Radius of the skysphere
         :type radius: float
+        :param loader: Loader to decode the texture in the background, None to load it right away
+        :type loader: :class:`util.texture.TextureLoader`, None
         """
 
         self.radius = radius
-        self.texture = Texture(filename)
-        self.sphere = gluNewQuadric()
-        gluQuadricNormals(self.sphere, GLU_SMOOTH)
-        gluQuadricTexture(self.sphere, GL_TRUE)
+        self.texture = Texture(filename, loader=loader)
+        self.sphere = sphere_mesh()
 
     def draw(self):
         """
-        Draws the SkySphere
+        Draws the SkySphere, nothing is drawn until the texture is loaded
         """
 
+        if not self.texture.ready:
+            return
         glDisable(GL_DEPTH_TEST)
         glDisable(GL_BLEND)
         glDisable(GL_CULL_FACE)
         self.texture.draw()
-        gluSphere(self.sphere, self.radius, 50, 50)
+        glPushMatrix()
+        glScalef(self.radius, self.radius, self.radius)
+        self.sphere.draw()
+        glPopMatrix()
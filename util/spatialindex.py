@@ -0,0 +1,180 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import numpy
+from util import auto_str
+
+# bits per axis of the cell coordinates in the keys of the cells
+_key_bits = 21
+_key_offset = 1 << (_key_bits - 1)
+
+
+@auto_str
+class SpatialGrid(object):
+    """
+    A uniform grid over points that answers which points are within a radius of a position and which are the nearest
+    ones without looking at all of them. Only cells that contain points are stored: the points are sorted by the key
+    of their cell, the points of a cell are found by a binary search for its key. Updating the grid after the points
+    moved is vectorized and starts from the order of the previous update.
+
+    :var cell_size: Edge length of the cells, chosen from the first positions if it is None
+    :type cell_size: float, None
+    :var positions: Positions of the points as (N, 3) array from the last update
+    :type positions: :class:`numpy.ndarray`
+    """
+
+    def __init__(self, cell_size=None):
+        """
+        Creates an empty grid
+
+        :param cell_size: Edge length of the cells, None to choose it from the first positions, so there is about
+                          one point per cell
+        :type cell_size: float, None
+        """
+
+        self.cell_size = cell_size
+        self.positions = numpy.zeros((0, 3))
+
+        self._keys = numpy.zeros(0, dtype=numpy.int64)
+        self._order = numpy.zeros(0, dtype=numpy.int64)
+
+    def update(self, positions):
+        """
+        Sorts the points into the grid, has to be called after the points moved
+
+        :param positions: Positions of the points as (N, 3) array
+        :type positions: :class:`numpy.ndarray`
+        """
+
+        self.positions = numpy.asarray(positions, dtype=numpy.float64)
+        if self.cell_size is None and len(self.positions):
+            self.cell_size = self._choose_cell_size()
+        keys = self._cell_keys(self._cells(self.positions))
+        if len(self._order) != len(keys):
+            self._order = numpy.arange(len(keys))
+        # most points stay in their cell between updates, sorting the keys in the previous order is almost linear
+        keys = keys[self._order]
+        order = numpy.argsort(keys, kind="stable")
+        self._order = self._order[order]
+        self._keys = keys[order]
+
+    def _choose_cell_size(self):
+        """
+        Chooses the cell size so there is about one point per cell. Extents smaller than a cell do not count,
+        so flat or thin distributions do not end up with tiny cells.
+
+        :return: Edge length of the cells
+        :rtype: float
+        """
+
+        extents = self.positions.max(axis=0) - self.positions.min(axis=0)
+        size = max(float(extents.max()), 1e-9)
+        for _ in range(8):
+            size = (numpy.prod(numpy.maximum(extents, size)) / len(self.positions)) ** (1.0 / 3.0)
+        return float(size)
+
+    def _cells(self, positions):
+        """
+        Get the integer coordinates of the cells the positions are in
+
+        :param positions: Positions as (N, 3) array
+        :type positions: :class:`numpy.ndarray`
+        :return: Cell coordinates as (N, 3) array, clamped to the range the keys can hold
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        if self.cell_size is None:
+            return numpy.zeros((len(positions), 3), dtype=numpy.int64)
+        cells = numpy.floor(numpy.asarray(positions) / self.cell_size)
+        return numpy.clip(cells, -_key_offset, _key_offset - 1).astype(numpy.int64)
+
+    @staticmethod
+    def _cell_keys(cells):
+        """
+        Packs cell coordinates into one integer per cell
+
+        :param cells: Cell coordinates as (N, 3) array
+        :type cells: :class:`numpy.ndarray`
+        :return: Keys of the cells
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        cells = cells + _key_offset
+        return (cells[:, 0] << (2 * _key_bits)) | (cells[:, 1] << _key_bits) | cells[:, 2]
+
+    def query_radius(self, position, radius):
+        """
+        Finds all points within the radius around a position
+
+        :param position: x, y and z of the position
+        :type position: tuple, :class:`euclid.Vector3`
+        :param radius: Radius around the position
+        :type radius: float
+        :return: Indices of the points sorted by their distance and the distances
+        :rtype: tuple
+        """
+
+        position = numpy.array(tuple(position), dtype=numpy.float64)
+        candidates = self._candidates(position, radius)
+        distances = numpy.sqrt(((self.positions[candidates] - position) ** 2).sum(axis=1))
+        inside = distances <= radius
+        candidates = candidates[inside]
+        distances = distances[inside]
+        order = numpy.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def query_nearest(self, position, count=1):
+        """
+        Finds the points nearest to a position, the radius that is searched grows until enough points are found
+
+        :param position: x, y and z of the position
+        :type position: tuple, :class:`euclid.Vector3`
+        :param count: Number of points to find
+        :type count: int
+        :return: Indices of the nearest points sorted by their distance and the distances, fewer if there are
+                 not enough points
+        :rtype: tuple
+        """
+
+        position = numpy.array(tuple(position), dtype=numpy.float64)
+        count = min(count, len(self.positions))
+        radius = self.cell_size if self.cell_size else 1.0
+        while True:
+            indices, distances = self.query_radius(position, radius)
+            # every point that is not found is farther away than the radius
+            if len(indices) >= count or len(indices) == len(self.positions):
+                return indices[:count], distances[:count]
+            radius *= 2.0
+
+    def _candidates(self, position, radius):
+        """
+        Get the points in all cells that overlap the cube around a position
+
+        :param position: Position
+        :type position: :class:`numpy.ndarray`
+        :param radius: Half edge length of the cube
+        :type radius: float
+        :return: Indices of the points
+        :rtype: :class:`numpy.ndarray`
+        """
+
+        low, high = self._cells(numpy.array((position - radius, position + radius)))
+        shape = high - low + 1
+        # with more cells than points it is faster to look at all points
+        if numpy.prod(shape.astype(numpy.float64)) > len(self.positions):
+            return numpy.arange(len(self.positions))
+        cells = numpy.indices(shape).reshape(3, -1).T + low
+        keys = self._cell_keys(cells)
+        starts = numpy.searchsorted(self._keys, keys, side="left")
+        ends = numpy.searchsorted(self._keys, keys, side="right")
+        occupied = ends > starts
+        starts = starts[occupied]
+        lengths = ends[occupied] - starts
+        if not len(starts):
+            return numpy.zeros(0, dtype=numpy.int64)
+        # indices of all slots from start to end of every occupied cell
+        slots = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths) + numpy.arange(lengths.sum())
+        return self._order[slots]
@@ -3,9 +3,261 @@ Created on 20.11.2015
 
 :author: Rene Hollander
 """
+import ctypes
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
 import pyglet
 from pyglet.gl import *
+from pyglet.gl import gl_info
 from util import auto_str
+from util.texturecache import CachedImage
+
+# texture and texture matrix region that are bound, see bind_texture
+_bound_texture = None
+_bound_region = None
+
+
+def decode_image(filename):
+    """
+    Decodes the image without OpenGL, so it can be done on any thread
+
+    :param filename: Filename of the image (Loads from pyglet resource loader)
+    :type filename: str
+    :return: Decoded image
+    :rtype: :class:`pyglet.image.ImageData`
+    """
+
+    with pyglet.resource.file(filename) as file:
+        return pyglet.image.load(filename, file=file)
+
+
+def texture_memory(width, height, levels, bytes_per_texel=4):
+    """
+    Estimates the GPU memory used by a texture. Drivers store RGB textures with 4 bytes per texel as well.
+
+    :param width: Width of the first level
+    :type width: int
+    :param height: Height of the first level
+    :type height: int
+    :param levels: Number of mipmap levels
+    :type levels: int
+    :param bytes_per_texel: Bytes per texel
+    :type bytes_per_texel: int
+    :return: Memory in bytes
+    :rtype: int
+    """
+
+    memory = 0
+    for level in range(levels):
+        memory += max(1, width >> level) * max(1, height >> level) * bytes_per_texel
+    return memory
+
+
+def bind_texture(target, texture_id, region=None):
+    """
+    Binds a texture and sets the texture matrix so the texture coordinates 0 to 1 map to the given region of it.
+    Nothing is changed if the texture and the region are bound already.
+
+    :param target: Target of the texture (GL_TEXTURE_2D)
+    :type target: int
+    :param texture_id: Name of the texture
+    :type texture_id: int
+    :param region: Region as (u, v, width, height) in texture coordinates, None for the whole texture
+    :type region: tuple, None
+    """
+
+    global _bound_texture, _bound_region
+    if _bound_texture != (target, texture_id):
+        glBindTexture(target, texture_id)
+        _bound_texture = (target, texture_id)
+    if _bound_region != region:
+        glMatrixMode(GL_TEXTURE)
+        glLoadIdentity()
+        if region is not None:
+            u, v, width, height = region
+            glTranslatef(u, v, 0.0)
+            glScalef(width, height, 1.0)
+        glMatrixMode(GL_MODELVIEW)
+        _bound_region = region
+
+
+def reset_texture_binding():
+    """
+    Resets the texture matrix and forgets which texture is bound. Has to be called after drawing with bind_texture,
+    before anything else binds textures or uses the texture matrix (e.g. pyglet labels).
+    """
+
+    global _bound_texture, _bound_region
+    if _bound_region is not None:
+        glMatrixMode(GL_TEXTURE)
+        glLoadIdentity()
+        glMatrixMode(GL_MODELVIEW)
+    _bound_texture = None
+    _bound_region = None
+
+
+@auto_str
+class TextureManager(object):
+    """
+    Keeps track of the GPU memory used by all uploaded textures and of the filtering they are set up with.
+    Textures are only referenced weakly, textures that are garbage collected are not counted anymore.
+
+    :var max_anisotropy: Maximum anisotropy of the texture filtering, limited to what the hardware supports
+    :type max_anisotropy: float
+    :var initial_size: Cached textures are uploaded with only the mipmap levels up to this size at first,
+                       None to upload all levels
+    :type initial_size: int, None
+    """
+
+    def __init__(self, max_anisotropy=16.0, initial_size=None):
+        """
+        Creates a new manager without textures
+
+        :param max_anisotropy: Maximum anisotropy of the texture filtering, 1 to disable anisotropic filtering
+        :type max_anisotropy: float
+        :param initial_size: Cached textures are uploaded with only the mipmap levels up to this size at first,
+                             None to upload all levels
+        :type initial_size: int, None
+        """
+
+        self.max_anisotropy = max_anisotropy
+        self.initial_size = initial_size
+        self._anisotropy = None
+        self._textures = weakref.WeakKeyDictionary()
+
+    def add(self, texture):
+        """
+        Counts the memory of an uploaded texture
+
+        :param texture: Uploaded texture
+        :type texture: :class:`Texture`
+        """
+
+        self._textures[texture] = texture.memory
+
+    def remove(self, texture):
+        """
+        Stops counting the memory of a texture
+
+        :param texture: Texture that was deleted
+        :type texture: :class:`Texture`
+        """
+
+        self._textures.pop(texture, None)
+
+    @property
+    def textures(self):
+        """
+        All uploaded textures
+
+        :rtype: list
+        """
+
+        return list(self._textures.keys())
+
+    @property
+    def memory(self):
+        """
+        GPU memory used by all uploaded textures in bytes
+
+        :rtype: int
+        """
+
+        return sum(self._textures.values())
+
+    def anisotropy(self):
+        """
+        Get the anisotropy textures are filtered with, the hardware limit is queried the first time
+
+        :return: Anisotropy, 1 if anisotropic filtering is not supported
+        :rtype: float
+        """
+
+        if self._anisotropy is None:
+            self._anisotropy = 1.0
+            if gl_info.have_extension("GL_EXT_texture_filter_anisotropic"):
+                limit = GLfloat()
+                glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT, ctypes.byref(limit))
+                self._anisotropy = max(1.0, min(self.max_anisotropy, limit.value))
+        return self._anisotropy
+
+
+# manager of all textures that are not given another one
+texture_manager = TextureManager()
+
+
+@auto_str
+class TextureLoader(object):
+    """
+    Decodes textures on a pool of background threads. The decoded textures are uploaded to the GPU by update on
+    the main thread, only as many per frame as fit into the time budget.
+
+    :var budget: Time in seconds update may spend uploading textures, at least one texture is uploaded per update
+    :type budget: float
+    :var cache: Cache of decoded images on disk, None to decode every image
+    :type cache: :class:`util.texturecache.TextureCache`, None
+    """
+
+    def __init__(self, workers=None, budget=0.004, cache=None):
+        """
+        Creates a new loader, the threads are started when the first texture is loaded
+
+        :param workers: Number of decoding threads, None for the default of ThreadPoolExecutor
+        :type workers: int, None
+        :param budget: Time in seconds update may spend uploading textures
+        :type budget: float
+        :param cache: Cache of decoded images on disk, None to decode every image
+        :type cache: :class:`util.texturecache.TextureCache`, None
+        """
+
+        self.budget = budget
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = []
+
+    @property
+    def pending(self):
+        """
+        Number of textures that are not uploaded yet
+
+        :rtype: int
+        """
+
+        return len(self._pending)
+
+    def load(self, texture):
+        """
+        Starts decoding the image of the texture
+
+        :param texture: Texture to load
+        :type texture: :class:`Texture`
+        """
+
+        if self.cache is None:
+            future = self._executor.submit(decode_image, texture.filename)
+        else:
+            future = self._executor.submit(lambda: self.cache.load(texture.filename).load(texture.manager.initial_size))
+        self._pending.append((texture, future))
+
+    def update(self):
+        """
+        Uploads decoded textures until the time budget is used up, has to be called on the main thread
+
+        :raise Exception: An image could not be decoded
+        """
+
+        start = time.perf_counter()
+        for entry in list(self._pending):
+            texture, future = entry
+            if not future.done():
+                continue
+            self._pending.remove(entry)
+            texture.upload(future.result())
+            if time.perf_counter() - start >= self.budget:
+                break
 
 
 @auto_str
@@ -14,37 +266,176 @@ class Texture(object):
     A wrapper for the pyglet Image for easier use
     """
 
-    def __init__(self, filename, mipmaps=False):
+    def __init__(self, filename, mipmaps=True, loader=None, manager=None):
         """
         Loads and uploads the given texture to the GPU
 
         :param filename: Filename of the texture (Loads from pyglet resource loader)
         :type filename: str
-        :param mipmaps: Enable Mipmaps (default False)
+        :param mipmaps: Enable Mipmaps and anisotropic filtering (default True)
         :type mipmaps: bool
+        :param loader: Loader to decode the texture in the background, None to load it right away
+        :type loader: :class:`TextureLoader`, None
+        :param manager: Manager that counts the memory of the texture, None for texture_manager
+        :type manager: :class:`TextureManager`, None
         """
         print("Loading Texture " + filename)
 
         self.mipmaps = mipmaps
         self.filename = filename
+        self.manager = manager if manager is not None else texture_manager
+        self.image = None
+        self.texture = None
+        self.memory = 0
+        self.base_level = 0
+        self.ready = False
+
+        if loader is None:
+            self.upload(pyglet.resource.image(self.filename))
+        else:
+            loader.load(self)
+
+    def upload(self, image):
+        """
+        Uploads the decoded image to the GPU, after that the texture is ready to be drawn
+
+        :param image: Decoded image
+        :type image: :class:`pyglet.image.AbstractImage`, :class:`util.texturecache.CachedImage`
+        """
 
-        self.image = pyglet.resource.image(self.filename)
-        self.texture = self.image.texture
+        self.image = image
+        if isinstance(image, CachedImage):
+            self.texture = self._upload_levels(image)
+            levels = len(image.levels) - self.base_level if self.mipmaps else 1
+        else:
+            self.texture = self.image.get_texture()
+            bind_texture(self.texture.target, self.texture.id)
+            levels = 1
+            if self.mipmaps:
+                glGenerateMipmap(self.texture.target)
+                levels = max(self.texture.width, self.texture.height).bit_length()
         self._verify('width')
         self._verify('height')
 
-        if self.mipmaps:
-            glGenerateMipmap(self.texture.target)
+        # filtering is part of the texture object, it only has to be set once
+        glTexParameteri(self.texture.target, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR if self.mipmaps else GL_LINEAR)
+        glTexParameteri(self.texture.target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        if self.mipmaps and self.manager.anisotropy() > 1.0:
+            glTexParameterf(self.texture.target, GL_TEXTURE_MAX_ANISOTROPY_EXT, self.manager.anisotropy())
+
+        self.memory = texture_memory(self.texture.width >> self.base_level, self.texture.height >> self.base_level, levels)
+        self.manager.add(self)
+        self.ready = True
+
+    @property
+    def streamable(self):
+        """
+        True if the resident mipmap levels can be changed with set_base_level
+
+        :rtype: bool
+        """
+
+        return self.ready and self.mipmaps and isinstance(self.image, CachedImage)
+
+    @property
+    def levels(self):
+        """
+        Number of mipmap levels of the image
+
+        :rtype: int
+        """
+
+        return len(self.image.levels) if self.streamable else 1
+
+    def set_base_level(self, level):
+        """
+        Changes the finest mipmap level that is resident on the GPU. Finer levels are released,
+        missing levels up to it are uploaded. Only possible if the texture is streamable.
+
+        :param level: Index of the finest level
+        :type level: int
+        """
+
+        level = max(0, min(level, len(self.image.levels) - 1))
+        if level == self.base_level:
+            return
+        texel_format = GL_RGBA if self.image.components == 4 else GL_RGB
+        bind_texture(GL_TEXTURE_2D, self.texture.id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        while self.base_level > level:
+            self.base_level -= 1
+            self._upload_level(self.base_level, texel_format)
+        while self.base_level < level:
+            # a level without texels does not use any memory
+            glTexImage2D(GL_TEXTURE_2D, self.base_level, texel_format, 0, 0, 0, texel_format, GL_UNSIGNED_BYTE, None)
+            self.base_level += 1
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, self.base_level)
+
+        self.memory = texture_memory(self.image.width >> self.base_level, self.image.height >> self.base_level,
+                                     len(self.image.levels) - self.base_level)
+        self.manager.add(self)
+
+    def delete(self):
+        """
+        Releases the texture on the GPU, it is not ready anymore afterwards
+        """
+
+        self.manager.remove(self)
+        self.image = None
+        self.texture = None
+        self.memory = 0
+        self.ready = False
+
+    def _upload_levels(self, image):
+        """
+        Uploads the texels of a cached image, with all of its mipmap levels if mipmaps are enabled
+
+        :param image: Cached image
+        :type image: :class:`util.texturecache.CachedImage`
+        :return: The created texture
+        :rtype: :class:`pyglet.image.Texture`
+        """
+
+        # with an initial size only the coarse levels are uploaded at first, see set_base_level
+        last = len(image.levels) - 1 if self.mipmaps else 0
+        self.base_level = min(image.level_for_size(self.manager.initial_size), last) if self.mipmaps else 0
+        texel_format = GL_RGBA if image.components == 4 else GL_RGB
+
+        texture_id = GLuint()
+        glGenTextures(1, ctypes.byref(texture_id))
+        texture = pyglet.image.Texture(image.width, image.height, GL_TEXTURE_2D, texture_id.value)
+        bind_texture(GL_TEXTURE_2D, texture.id)
+        # rows of small RGB levels are not aligned to 4 bytes
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for level in range(self.base_level, last + 1):
+            self._upload_level(level, texel_format)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, self.base_level)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, last)
+        return texture
+
+    def _upload_level(self, level, texel_format):
+        """
+        Uploads one mipmap level of the cached image to the bound texture
+
+        :param level: Index of the level
+        :type level: int
+        :param texel_format: GL_RGB or GL_RGBA
+        :type texel_format: int
+        """
+
+        texels = numpy.ascontiguousarray(self.image.levels[level])
+        glTexImage2D(GL_TEXTURE_2D, level, texel_format, texels.shape[1], texels.shape[0], 0,
+                     texel_format, GL_UNSIGNED_BYTE, texels.ctypes.data)
 
     def draw(self):
         """
-        Enable and bind the texture
+        Enable and bind the texture, it has to be ready
         """
 
         glEnable(self.texture.target)
-        glBindTexture(self.texture.target, self.texture.id)
-        if self.mipmaps:
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        bind_texture(self.texture.target, self.texture.id)
 
     def _verify(self, dimension):
         """
@@ -0,0 +1,267 @@
+"""
+Created on 18.10.2026
+
+:author: Rene Hollander
+"""
+
+import hashlib
+import io
+import json
+import os
+
+import numpy
+import pyglet
+from util import auto_str
+
+
+def next_power_of_two(value):
+    """
+    Get the smallest power of two that is not smaller than the value
+
+    :param value: Value to round up
+    :type value: int
+    :return: Power of two
+    :rtype: int
+    """
+
+    power = 1
+    while power < value:
+        power *= 2
+    return power
+
+
+def resize_power_of_two(texels):
+    """
+    Resizes the texels to power of two dimensions by repeating texels, images that already have them are returned as they are
+
+    :param texels: Texels as (height, width, components) array
+    :type texels: :class:`numpy.ndarray`
+    :return: Texels with power of two width and height
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    height, width = texels.shape[:2]
+    new_height = next_power_of_two(height)
+    new_width = next_power_of_two(width)
+    if (new_height, new_width) == (height, width):
+        return texels
+    rows = numpy.arange(new_height) * height // new_height
+    columns = numpy.arange(new_width) * width // new_width
+    return texels[rows][:, columns]
+
+
+def downsample(texels):
+    """
+    Calculates the next mipmap level by averaging 2x2 texels
+
+    :param texels: Texels with power of two dimensions as (height, width, components) array
+    :type texels: :class:`numpy.ndarray`
+    :return: Texels with half the width and height, dimensions that are 1 already stay 1
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    height, width = texels.shape[:2]
+    data = texels.astype(numpy.uint16)
+    divisor = 1
+    if height > 1:
+        data = data[0::2] + data[1::2]
+        divisor *= 2
+    if width > 1:
+        data = data[:, 0::2] + data[:, 1::2]
+        divisor *= 2
+    return ((data + divisor // 2) // divisor).astype(numpy.uint8)
+
+
+def mipmap_chain(texels):
+    """
+    Calculates all mipmap levels down to 1x1
+
+    :param texels: Texels with power of two dimensions as (height, width, components) array
+    :type texels: :class:`numpy.ndarray`
+    :return: Levels from the full size down to 1x1
+    :rtype: list
+    """
+
+    levels = [texels]
+    while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+        levels.append(downsample(levels[-1]))
+    return levels
+
+
+@auto_str
+class CachedImage(object):
+    """
+    Decoded texels of an image with all mipmap levels, rows are stored bottom to top like OpenGL expects them
+
+    :var width: Width of the first level
+    :type width: int
+    :var height: Height of the first level
+    :type height: int
+    :var components: Number of components per texel, 3 for RGB and 4 for RGBA
+    :type components: int
+    :var levels: Texels of every mipmap level as (height, width, components) array
+    :type levels: list
+    """
+
+    def __init__(self, levels):
+        """
+        Creates a new image from the given levels
+
+        :param levels: Texels of every mipmap level as (height, width, components) array
+        :type levels: list
+        """
+
+        self.levels = levels
+        self.height, self.width, self.components = levels[0].shape
+
+    def level_for_size(self, max_size=None):
+        """
+        Get the finest level that is not larger than the given size
+
+        :param max_size: Maximum width and height, None for the first level
+        :type max_size: int, None
+        :return: Index of the level
+        :rtype: int
+        """
+
+        if max_size is None:
+            return 0
+        for level, texels in enumerate(self.levels):
+            if max(texels.shape[0], texels.shape[1]) <= max_size:
+                return level
+        return len(self.levels) - 1
+
+    def load(self, max_size=None):
+        """
+        Reads memory-mapped levels into memory, so uploading them does not wait for the disk.
+        Larger levels stay memory-mapped and are only read when they are needed.
+
+        :param max_size: Only read the levels up to this width and height, None to read all of them
+        :type max_size: int, None
+        :return: This image
+        :rtype: :class:`CachedImage`
+        """
+
+        first = self.level_for_size(max_size)
+        self.levels = self.levels[:first] + [numpy.array(level) for level in self.levels[first:]]
+        return self
+
+
+@auto_str
+class TextureCache(object):
+    """
+    Cache of decoded and mipmapped images on disk. Every image is stored as one memory-mappable .npy file with all
+    levels after each other and a .json file describing the levels. Both are named by the SHA-1 hash of the source
+    file, so changed images are decoded again and renamed images are not.
+
+    :var directory: Directory the cached images are stored in
+    :type directory: str
+    """
+
+    def __init__(self, directory="cache/texture"):
+        """
+        Creates a cache in the given directory, the directory is created when the first image is stored
+
+        :param directory: Directory the cached images are stored in
+        :type directory: str
+        """
+
+        self.directory = directory
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def get(self, key):
+        """
+        Get a cached image
+
+        :param key: Hash of the source file
+        :type key: str
+        :return: Image with memory-mapped levels, None if it is not cached
+        :rtype: :class:`CachedImage`, None
+        """
+
+        try:
+            with open(self._path(key, ".json")) as index_file:
+                index = json.load(index_file)
+        except FileNotFoundError:
+            return None
+        data = numpy.load(self._path(key, ".npy"), mmap_mode="r")
+        components = index["components"]
+        levels = []
+        for width, height, offset in index["levels"]:
+            levels.append(data[offset:offset + width * height * components].reshape(height, width, components))
+        return CachedImage(levels)
+
+    def put(self, key, source, levels):
+        """
+        Stores an image in the cache
+
+        :param key: Hash of the source file
+        :type key: str
+        :param source: Name of the source file, only stored for reference
+        :type source: str
+        :param levels: Texels of every mipmap level as (height, width, components) array
+        :type levels: list
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        offsets = numpy.cumsum([0] + [level.size for level in levels]).tolist()
+        numpy.save(self._path(key, ".npy"), numpy.concatenate([level.ravel() for level in levels]))
+        index = {"source": source, "components": levels[0].shape[2],
+                 "levels": [[level.shape[1], level.shape[0], offset] for level, offset in zip(levels, offsets)]}
+        # the index is written last, an image without index is not in the cache
+        temporary = self._path(key, ".json.tmp")
+        with open(temporary, "w") as index_file:
+            json.dump(index, index_file, indent=2)
+        os.replace(temporary, self._path(key, ".json"))
+
+    def load(self, filename):
+        """
+        Get the image from the cache, it is decoded and stored in the cache if it is not cached yet
+
+        :param filename: Filename of the image (Loads from pyglet resource loader)
+        :type filename: str
+        :return: Image with all mipmap levels
+        :rtype: :class:`CachedImage`
+        """
+
+        with pyglet.resource.file(filename) as file:
+            source = file.read()
+        key = hashlib.sha1(source).hexdigest()
+        image = self.get(key)
+        if image is None:
+            levels = mipmap_chain(resize_power_of_two(decode_texels(filename, source)))
+            self.put(key, filename, levels)
+            image = CachedImage(levels)
+        return image
+
+
+def decode_texels(filename, source):
+    """
+    Decodes an image into texels
+
+    :param filename: Filename of the image, used to choose the decoder
+    :type filename: str
+    :param source: Content of the image file
+    :type source: bytes
+    :return: Texels as (height, width, components) array with the rows from bottom to top
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    return image_texels(pyglet.image.load(filename, file=io.BytesIO(source)))
+
+
+def image_texels(image):
+    """
+    Get the texels of a decoded image
+
+    :param image: Decoded image
+    :type image: :class:`pyglet.image.ImageData`
+    :return: Texels as (height, width, components) array with the rows from bottom to top
+    :rtype: :class:`numpy.ndarray`
+    """
+
+    texel_format = "RGBA" if "A" in image.format else "RGB"
+    data = image.get_data(texel_format, image.width * len(texel_format))
+    return numpy.frombuffer(data, dtype=numpy.uint8).reshape(image.height, image.width, len(texel_format)).copy()